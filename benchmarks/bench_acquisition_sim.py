@@ -0,0 +1,90 @@
+"""
+bench_acquisition_sim.py  –  acquisition stack against the simulated spectrometer
+
+Runs the SpectrometerController callback path and the CSV row formatting used
+by the continuous logger at several integration times, using the software
+AvaSpec backend (drivers/avaspec_sim.py). Needs no hardware or libavs, so it
+can run in CI:
+
+    python benchmarks/bench_acquisition_sim.py [--seconds 2] [--int-ms 1 10 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ["AVASPEC_BACKEND"] = "sim"
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np  # noqa: E402
+from PyQt5.QtCore import QTimer  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from controllers.spectrometer_controller import SpectrometerController  # noqa: E402
+import avaspec_sim  # noqa: E402  (on sys.path once drivers.spectrometer is imported)
+
+
+def run_controller(app, ctrl, int_ms, seconds):
+    ctrl.integration_time_ms = int_ms
+    cb_times = []
+    original_cb = ctrl._cb
+
+    def timed_cb(p_data, p_user):
+        t = time.perf_counter()
+        original_cb(p_data, p_user)
+        cb_times.append(time.perf_counter() - t)
+
+    ctrl._cb = timed_cb
+    head0 = ctrl.ring.head
+    ctrl.start()
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+    ctrl.stop()
+    while ctrl.measure_active:
+        app.processEvents()
+    ctrl._cb = original_cb
+    scans = ctrl.ring.head - head0
+    nominal = seconds * 1000.0 / (int_ms + avaspec_sim.SIM_CONFIG["readout_ms"])
+    cb_us = np.array(cb_times) * 1e6 if cb_times else np.zeros(1)
+    print(f"  int {int_ms:7.2f} ms: {scans / seconds:8.1f} scans/s "
+          f"({100.0 * scans / nominal:5.1f}% of nominal), callback mean {cb_us.mean():7.1f} us, "
+          f"p99 {np.percentile(cb_us, 99):7.1f} us")
+
+
+def run_logger_rows(ctrl, rows):
+    spectrum = ctrl.intens
+    telemetry = [0.0] * 29
+    t = time.perf_counter()
+    for _ in range(rows):
+        row = ["2025-01-01 00:00:00.000"] + [f"{v:.2f}" for v in telemetry]
+        row.extend([f"{val:.4f}" for val in spectrum])
+        ",".join(row)
+    dt = (time.perf_counter() - t) / rows
+    print(f"  CSV row formatting ({spectrum.size} px): {dt * 1e3:.3f} ms/row, "
+          f"max {1.0 / dt:.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--int-ms", type=float, nargs="+", default=[1.0, 10.0, 50.0])
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    ctrl = SpectrometerController()
+    ctrl.plot_timer.stop()
+    ctrl.connect()
+    if not ctrl.is_ready():
+        sys.exit("Simulated spectrometer did not connect")
+    print("SpectrometerController callback path:")
+    for int_ms in args.int_ms:
+        run_controller(app, ctrl, int_ms, args.seconds)
+    print("Logger:")
+    run_logger_rows(ctrl, args.rows)
+
+
+if __name__ == "__main__":
+    main()
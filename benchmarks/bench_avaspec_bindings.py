@@ -0,0 +1,82 @@
+"""
+bench_avaspec_bindings.py  –  per-call cost of the libavs wrappers
+
+Compares the old wrapper pattern (build a prototype, resolve the symbol and let
+ctypes allocate a fresh 4096-element output array on every call) with the
+cached binding table and the caller-owned ScopeBuffer.
+
+Run from the repository root:
+
+    python benchmarks/bench_avaspec_bindings.py [--calls 20000]
+
+If a spectrometer is attached it is activated and measured against; otherwise
+the calls go to an invalid handle, which still exercises the full binding path
+and returns immediately from the library.
+"""
+
+import argparse
+import ctypes
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "drivers"))
+import avaspec  # noqa: E402
+
+
+def old_get_scope_data(handle):
+    prototype = avaspec.func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_double * 4096))
+    paramflags = (1, "handle",), (2, "timelabel",), (2, "spectrum",),
+    AVS_GetScopeData = prototype(("AVS_GetScopeData", avaspec.lib), paramflags)
+    return AVS_GetScopeData(handle)
+
+
+def old_poll_scan(handle):
+    prototype = avaspec.func(ctypes.c_bool, ctypes.c_int)
+    paramflags = (1, "handle",),
+    AVS_PollScan = prototype(("AVS_PollScan", avaspec.lib), paramflags)
+    return AVS_PollScan(handle)
+
+
+def open_handle():
+    if avaspec.AVS_Init(0) > 0 and avaspec.AVS_UpdateUSBDevices() > 0:
+        ids = avaspec.AVS_GetList(1)
+        if ids:
+            return avaspec.AVS_Activate(ids[0]), True
+    return avaspec.INVALID_AVS_HANDLE_VALUE, False
+
+
+def report(name, seconds, calls, baseline=None):
+    per_call_us = seconds / calls * 1e6
+    line = f"{name:<32} {per_call_us:9.2f} us/call"
+    if baseline:
+        line += f"   x{baseline / seconds:5.1f} faster"
+    print(line)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    handle, real = open_handle()
+    print(f"handle={handle} ({'device' if real else 'no device, invalid handle'}), {args.calls} calls each\n")
+    buf = avaspec.ScopeBuffer()
+    try:
+        t_old = report("GetScopeData (per-call prototype)",
+                       timeit.timeit(lambda: old_get_scope_data(handle), number=args.calls), args.calls)
+        report("GetScopeData (cached binding)",
+               timeit.timeit(lambda: avaspec.AVS_GetScopeData(handle), number=args.calls), args.calls, t_old)
+        report("GetScopeDataInto (ScopeBuffer)",
+               timeit.timeit(lambda: avaspec.AVS_GetScopeDataInto(handle, buf), number=args.calls), args.calls, t_old)
+        t_old = report("PollScan (per-call prototype)",
+                       timeit.timeit(lambda: old_poll_scan(handle), number=args.calls), args.calls)
+        report("PollScan (cached binding)",
+               timeit.timeit(lambda: avaspec.AVS_PollScan(handle), number=args.calls), args.calls, t_old)
+    finally:
+        avaspec.AVS_Done()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+bench_engines_sim.py  –  callback vs polling acquisition engine latency
+
+Measures scan-ready to data-available latency (drivers/latency.py) for the
+library callback engine and every PollingAcquisition strategy at several
+integration times, plus the CPU time each engine burns, using the simulated
+AvaSpec backend. All runs share one LatencyReference, calibrated on the
+first run, so the latencies are comparable between engines:
+
+    python benchmarks/bench_engines_sim.py [--seconds 2] [--int-ms 1 10 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ["AVASPEC_BACKEND"] = "sim"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from drivers.spectrometer import (  # noqa: E402
+    connect_spectrometer,
+    prepare_measurement,
+    AVS_MeasureCallback,
+    AVS_MeasureCallbackFunc,
+    AVS_GetScopeDataInto,
+    AVS_StopMeasure,
+    ScopeBuffer,
+)
+from drivers.spectrum_ring import SpectrumRingBuffer  # noqa: E402
+from drivers.poll_acquisition import PollingAcquisition, POLL_STRATEGIES  # noqa: E402
+from drivers.latency import LatencyMeter, LatencyReference  # noqa: E402
+
+
+def run_callback(handle, ring, int_ms, seconds, reference):
+    meter = LatencyMeter(reference=reference)
+    scope = ScopeBuffer()
+
+    def _cb(p_data, p_user):
+        if p_user[0] != 0 or AVS_GetScopeDataInto(handle, scope) != 0:
+            return
+        ring.push(scope.spectrum, scope.timelabel, int_ms)
+        meter.record(scope.timelabel, time.perf_counter())
+
+    cb = AVS_MeasureCallbackFunc(_cb)
+    cpu0 = time.process_time()
+    AVS_MeasureCallback(handle, cb, -1)
+    time.sleep(seconds)
+    AVS_StopMeasure(handle)
+    return meter.stats(), time.process_time() - cpu0
+
+
+def run_polling(handle, ring, int_ms, seconds, strategy, reference):
+    poller = PollingAcquisition(handle, ring, int_ms, strategy=strategy,
+                                latency=LatencyMeter(reference=reference))
+    cpu0 = time.process_time()
+    poller.start()
+    time.sleep(seconds)
+    poller.stop()
+    return poller.latency.stats(), time.process_time() - cpu0
+
+
+def report(name, stats, cpu_s, seconds):
+    if not stats:
+        print(f"    {name:16s} no scans")
+        return
+    print(f"    {name:16s} {stats['samples']:6d} scans  p50 {stats['p50_us']:8.1f} us  "
+          f"p99 {stats['p99_us']:8.1f} us  max {stats['max_us']:8.1f} us  "
+          f"CPU {100.0 * cpu_s / seconds:5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--int-ms", type=float, nargs="+", default=[1.0, 10.0, 50.0])
+    args = parser.parse_args()
+
+    handle, _, npix, serial = connect_spectrometer()
+    ring = SpectrumRingBuffer(256, npix)
+    reference = LatencyReference()
+    print(f"Simulated spectrometer {serial}, {npix} px")
+    for int_ms in args.int_ms:
+        print(f"  int {int_ms:.2f} ms:")
+        prepare_measurement(handle, npix, integration_time_ms=int_ms)
+        report("callback", *run_callback(handle, ring, int_ms, args.seconds, reference), args.seconds)
+        for strategy in POLL_STRATEGIES:
+            prepare_measurement(handle, npix, integration_time_ms=int_ms)
+            report(f"poll/{strategy}",
+                   *run_polling(handle, ring, int_ms, args.seconds, strategy, reference), args.seconds)
+
+
+if __name__ == "__main__":
+    main()
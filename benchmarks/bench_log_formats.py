@@ -0,0 +1,86 @@
+"""
+bench_log_formats.py  –  legacy CSV rows vs the columnar binary log
+
+Writes the same synthetic records (30 telemetry values + one spectrum) as
+legacy CSV rows and through storage.columnar_log.ColumnarLogWriter, then
+reports CPU time per record, bytes per record and read-back time:
+
+    python benchmarks/bench_log_formats.py [--rows 600] [--npix 2048]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np  # noqa: E402
+
+from storage.columnar_log import ColumnarLogWriter, ColumnarLogReader, export_csv, TIME_FMT  # noqa: E402
+
+
+def make_records(rows, npix, seed=0):
+    rng = np.random.default_rng(seed)
+    base = 1000.0 + 30000.0 * np.exp(-0.5 * ((np.arange(npix) - npix / 2) / (npix / 10)) ** 2)
+    spectra = base + rng.normal(0.0, 15.0, size=(rows, npix))
+    telemetry = rng.normal(0.0, 100.0, size=(rows, 29))
+    return telemetry, spectra
+
+
+def write_csv(path, telemetry, spectra):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for t, spectrum in zip(telemetry, spectra):
+            row = ["2025-01-01 00:00:00.000"] + [f"{v:.2f}" for v in t]
+            row.extend([f"{val:.4f}" for val in spectrum])
+            f.write(",".join(row) + "\n")
+
+
+def write_columnar(path, telemetry, spectra, chunk_rows):
+    columns = [("Timestamp", TIME_FMT)] + [(f"T{i}", ".2f") for i in range(telemetry.shape[1])]
+    wls = np.linspace(280.0, 550.0, spectra.shape[1])
+    with ColumnarLogWriter(path, columns, wls, chunk_rows=chunk_rows) as log:
+        now = time.time()
+        for i, (t, spectrum) in enumerate(zip(telemetry, spectra)):
+            log.append([now + i] + t.tolist(), spectrum)
+
+
+def timed(fn, *args):
+    t = time.process_time()
+    result = fn(*args)
+    return time.process_time() - t, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--rows", type=int, default=600)
+    parser.add_argument("--npix", type=int, default=2048)
+    parser.add_argument("--chunk-rows", type=int, default=30)
+    args = parser.parse_args()
+
+    telemetry, spectra = make_records(args.rows, args.npix)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "log.csv")
+        sgl_path = os.path.join(tmp, "log.sgl")
+        csv_s, _ = timed(write_csv, csv_path, telemetry, spectra)
+        sgl_s, _ = timed(write_columnar, sgl_path, telemetry, spectra, args.chunk_rows)
+        csv_b = os.path.getsize(csv_path)
+        sgl_b = os.path.getsize(sgl_path)
+        print(f"{args.rows} records x {args.npix} px")
+        print(f"  CSV       write {1e3 * csv_s / args.rows:7.3f} ms/record  {csv_b / args.rows / 1024:8.1f} KiB/record")
+        print(f"  columnar  write {1e3 * sgl_s / args.rows:7.3f} ms/record  {sgl_b / args.rows / 1024:8.1f} KiB/record")
+        print(f"  ratio     CPU {csv_s / max(sgl_s, 1e-9):5.1f}x   size {csv_b / sgl_b:5.1f}x")
+
+        t = time.perf_counter()
+        with ColumnarLogReader(sgl_path) as log:
+            pixels = log.pixels()
+            peak = float(pixels.max())
+        print(f"  columnar  read all spectra {1e3 * (time.perf_counter() - t):7.2f} ms (peak {peak:.0f})")
+        t = time.perf_counter()
+        export_csv(sgl_path, os.path.join(tmp, "export.csv"))
+        print(f"  CSV export {1e3 * (time.perf_counter() - t) / args.rows:7.3f} ms/record")
+
+
+if __name__ == "__main__":
+    main()
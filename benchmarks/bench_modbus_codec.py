@@ -0,0 +1,118 @@
+"""
+bench_modbus_codec.py  –  Modbus CRC and move-frame construction cost
+
+Compares, per call in microseconds:
+
+  CRC of a move frame   the bit-loop fallback utils used before, the
+                        256-entry table (drivers.modbus_codec.crc16), the
+                        table continued from a cached prefix CRC, and
+                        libscrc when it is installed
+  move frame            the frame assembled from constant pieces with the
+                        bit-loop CRC (the old send_move_command), the same
+                        with the table CRC, drivers.modbus.build_frame, and
+                        the cached FrameTemplate that only patches the
+                        position (drivers.motor.move_template)
+
+Every variant is checked to produce the same bytes for a sweep of target
+positions:
+
+    python benchmarks/bench_modbus_codec.py [--moves 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from drivers.modbus import WRITE_MULTIPLE_REGISTERS, build_frame, write_registers_payload  # noqa: E402
+from drivers.modbus_codec import crc16  # noqa: E402
+from drivers.motor import (DIRECT_DATA_ADDR, MOVE_POSITION_OFFSET, SlaveID, TrackerCurrent,  # noqa: E402
+                           TrackerSpeed, move_registers, move_template)
+
+try:
+    import libscrc
+except ImportError:
+    libscrc = None
+
+
+def crc_bitloop(data):
+    # utils.modbus_crc16 without libscrc, before the table
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc & 0xFFFF
+
+
+def legacy_move_frame(angle, crc=crc_bitloop):
+    # The frame as send_move_command assembled it on every move
+    base_cmd = bytes([SlaveID, 0x10, 0x00, 0x58, 0x00, 0x12, 0x24,
+                      0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01])
+    angle_bytes = angle.to_bytes(4, 'big', signed=True)
+    speed_bytes = TrackerSpeed.to_bytes(4, 'big', signed=True)
+    current_bytes = TrackerCurrent.to_bytes(4, 'big', signed=True)
+    mid_bytes = bytes([0x00, 0x00, 0x1F, 0x40, 0x00, 0x00, 0x1F, 0x40])
+    end_bytes = bytes([0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01])
+    full_cmd = base_cmd + angle_bytes + speed_bytes + mid_bytes + current_bytes + end_bytes
+    return full_cmd + crc(full_cmd).to_bytes(2, 'little')
+
+
+def uncached_build_frame(angle):
+    return build_frame.__wrapped__(SlaveID, WRITE_MULTIPLE_REGISTERS,
+                                   write_registers_payload(DIRECT_DATA_ADDR, move_registers(angle)))
+
+
+def bench(label, fn, args, reference=None):
+    t = time.perf_counter()
+    for a in args:
+        fn(a)
+    us = (time.perf_counter() - t) / len(args) * 1e6
+    line = f"  {label:<34} {us:8.2f} us"
+    if reference is not None:
+        line += f"   {reference / us:6.1f}x"
+    print(line)
+    return us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--moves", type=int, default=20000)
+    args = parser.parse_args()
+
+    positions = [(i * 7919) % 720000 - 360000 for i in range(args.moves)]
+    template = move_template(SlaveID)
+    for p in positions[:2000] + [0, -1, 0x7FFFFFFF, -0x80000000]:
+        expected = legacy_move_frame(p)
+        assert uncached_build_frame(p) == expected
+        assert template.render(p) == expected
+        assert legacy_move_frame(p, crc16) == expected
+    frames = [legacy_move_frame(p)[:-2] for p in positions]
+    prefix = frames[0][:MOVE_POSITION_OFFSET]
+    prefix_crc = crc16(prefix)
+    print(f"{args.moves} moves, {len(frames[0]) + 2}-byte frames; all variants byte-identical")
+
+    print("CRC of a move frame")
+    ref = bench("bit loop (old fallback)", crc_bitloop, frames)
+    bench("table", crc16, frames, ref)
+    bench("table from cached prefix CRC", lambda f: crc16(f[MOVE_POSITION_OFFSET:], prefix_crc), frames, ref)
+    if libscrc is not None:
+        bench("libscrc", libscrc.modbus, frames, ref)
+    else:
+        print("  libscrc                            not installed")
+
+    print("Move frame, CRC included")
+    ref = bench("pieces + bit loop (old)", legacy_move_frame, positions)
+    bench("pieces + table", lambda p: legacy_move_frame(p, crc16), positions, ref)
+    bench("build_frame", uncached_build_frame, positions, ref)
+    bench("FrameTemplate.render", template.render, positions, ref)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
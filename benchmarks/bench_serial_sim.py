@@ -0,0 +1,133 @@
+"""
+bench_serial_sim.py  –  serial drivers against the pty device simulators
+
+Runs the real drivers over Linux ptys (simulators/) and reports, with the
+configured link latency and fault rates:
+
+  motor       discovery (cold, then from the link cache), move command and
+              monitor poll round-trips, failures after retries
+  IMU         frames published per second by drivers.imu.read_from_imu at
+              the requested output rate
+  TC-36-25    temperature read (one request sent byte by byte)
+  THP         one read_thp_sensor_data call (includes the driver's 1 s settle)
+
+    python benchmarks/bench_serial_sim.py [--latency-ms 1] [--drop 0.02] [--corrupt 0.02] [--imu-rate 100]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import serial  # noqa: E402
+
+from drivers.imu import read_from_imu  # noqa: E402
+from drivers.modbus import ModbusError  # noqa: E402
+from drivers.motor import MotorStatusPoller, discover_motor, send_move_command  # noqa: E402
+from drivers.tc36_25_driver import TC36_25  # noqa: E402
+from drivers.telemetry import TelemetryStore  # noqa: E402
+from drivers.thp_sensor import read_thp_sensor_data  # noqa: E402
+from simulators.run import start_all  # noqa: E402
+
+
+def timed(fn, n):
+    """Per-call times (ms) of the calls that succeeded, and the failure count."""
+    times, failed = [], 0
+    for i in range(n):
+        t = time.perf_counter()
+        try:
+            ok = fn(i)
+        except (ModbusError, OSError, ValueError, RuntimeError):
+            ok = False
+        if ok is False:
+            failed += 1
+        else:
+            times.append((time.perf_counter() - t) * 1e3)
+    return times, failed
+
+
+def report(label, times, failed=0):
+    if not times:
+        print(f"  {label:<28} all {failed} failed")
+        return
+    line = (f"  {label:<28} median {statistics.median(times):7.2f} ms   max {max(times):7.2f} ms"
+            f"   n={len(times)}")
+    if failed:
+        line += f"   failed={failed}"
+    print(line)
+
+
+def bench_motor(port, n):
+    cache = os.path.join(tempfile.mkdtemp(prefix="bench_sim_"), "motor_link.json")
+    for label in ("discovery, cold", "discovery, cached"):
+        t = time.perf_counter()
+        client, _, baud = discover_motor([port], cache_path=cache)
+        report(f"{label} ({baud})", [(time.perf_counter() - t) * 1e3] if client else [], 0 if client else 1)
+        if client is None:
+            return
+        if label.endswith("cold"):
+            client.close(close_port=True)
+    report("move command", *timed(lambda i: send_move_command(client, (i * 37) % 360), n))
+    poller = MotorStatusPoller(client, TelemetryStore())
+    report("monitor poll", *timed(lambda i: poller.poll_once() or False, n))
+    print(f"  client: {client.metrics()}")
+    client.close(close_port=True)
+
+
+def bench_imu(device, seconds):
+    ser = serial.Serial(device.port, device.baud, timeout=0.1)
+    store = TelemetryStore()
+    stop = threading.Event()
+    thread = threading.Thread(target=read_from_imu, args=(ser, store, stop), daemon=True)
+    sent0 = device.frames
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    ser.close()
+    sent = device.frames - sent0
+    published = store.snapshot().version  # one publish per parsed frame
+    print(f"  {sent / seconds:8.1f} frames/s sent, {published / seconds:8.1f} published"
+          f" ({published / max(sent, 1):.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--corrupt", type=float, default=0.0)
+    parser.add_argument("--imu-rate", type=float, default=100.0)
+    parser.add_argument("--count", type=int, default=200, help="motor and TC-36 transactions")
+    parser.add_argument("--seconds", type=float, default=2.0, help="IMU streaming time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    faults = {"latency_s": args.latency_ms / 1000.0, "jitter_s": args.jitter_ms / 1000.0,
+              "drop_rate": args.drop, "corrupt_rate": args.corrupt}
+    devices = start_all(faults=faults, imu_rate_hz=args.imu_rate, seed=args.seed)
+    print(f"latency {args.latency_ms} ms (+{args.jitter_ms}), drop {args.drop}, corrupt {args.corrupt}")
+    try:
+        print("Motor (Modbus RTU, 115200 8E1)")
+        bench_motor(devices["motor"].port, args.count)
+        print(f"IMU ({args.imu_rate:g} Hz x {len(devices['imu'].packets)} packet types, {devices['imu'].baud} baud)")
+        bench_imu(devices["imu"], args.seconds)
+        print("TC-36-25")
+        tc = TC36_25(devices["temp_controller"].port)
+        report("get_temperature", *timed(lambda i: tc.get_temperature(), args.count // 4))
+        tc.close()
+        print("THP sensor")
+        report("read_thp_sensor_data", *timed(lambda i: read_thp_sensor_data(devices["thp_sensor"].port) or False, 2))
+    finally:
+        for device in devices.values():
+            device.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+bench_spectrum_codec.py  –  delta-coded spectra vs CSV rows and raw floats
+
+Encodes the same synthetic integer-count spectra (optionally averaged over
+N scans, so values are multiples of 1/N) as legacy CSV pixel text, raw
+float32/float64 arrays and storage.spectrum_codec blocks in each delta mode,
+and reports bytes per spectrum and encode/decode throughput (MB/s of float64
+input). Every codec result is checked for an exact round trip:
+
+    python benchmarks/bench_spectrum_codec.py [--scans 600] [--npix 2048] [--chunk 30] [--average 1]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np  # noqa: E402
+
+from storage import spectrum_codec  # noqa: E402
+
+
+def make_spectra(scans, npix, average, seed=0):
+    rng = np.random.default_rng(seed)
+    base = 1000.0 + 30000.0 * np.exp(-0.5 * ((np.arange(npix) - npix / 2) / (npix / 10)) ** 2)
+    drift = 1.0 + 0.05 * np.sin(np.linspace(0.0, 6.0, scans))[:, np.newaxis]
+    counts = rng.poisson(np.repeat((base * drift)[np.newaxis], average, axis=0)).astype(np.float64)
+    return counts.mean(axis=0) if average > 1 else counts[0]
+
+
+def csv_bytes(spectra):
+    return sum(len(",".join(f"{v:.4f}" for v in row)) + 1 for row in spectra.tolist())
+
+
+def bench(label, spectra, chunk, encode, decode):
+    blocks = [spectra[i:i + chunk] for i in range(0, len(spectra), chunk)]
+    t = time.perf_counter()
+    encoded = [encode(b) for b in blocks]
+    enc_s = time.perf_counter() - t
+    t = time.perf_counter()
+    decoded = [decode(e) for e in encoded]
+    dec_s = time.perf_counter() - t
+    exact = all(np.array_equal(d, b) for d, b in zip(decoded, blocks))
+    size = sum(len(e) for e in encoded)
+    mb = spectra.nbytes / 1e6
+    print(f"  {label:<18} {size / len(spectra) / 1024:8.2f} KiB/spectrum  "
+          f"encode {mb / max(enc_s, 1e-9):8.1f} MB/s  decode {mb / max(dec_s, 1e-9):8.1f} MB/s  "
+          f"{'exact' if exact else 'LOSSY'}")
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument("--scans", type=int, default=600)
+    parser.add_argument("--npix", type=int, default=2048)
+    parser.add_argument("--chunk", type=int, default=30, help="spectra per encoded block (log chunk rows)")
+    parser.add_argument("--average", type=int, default=1, help="scans averaged per spectrum")
+    args = parser.parse_args()
+
+    spectra = make_spectra(args.scans, args.npix, args.average)
+    print(f"{args.scans} spectra x {args.npix} px, {args.average} scan(s) averaged, blocks of {args.chunk}")
+
+    t = time.perf_counter()
+    csv_b = csv_bytes(spectra)
+    csv_s = time.perf_counter() - t
+    print(f"  {'CSV rows (.4f)':<18} {csv_b / args.scans / 1024:8.2f} KiB/spectrum  "
+          f"encode {spectra.nbytes / 1e6 / csv_s:8.1f} MB/s")
+
+    def raw(dtype):
+        return (lambda b: b.astype(dtype).tobytes(),
+                lambda e: np.frombuffer(e, dtype=dtype).reshape(-1, args.npix).astype(np.float64))
+
+    bench("raw float64", spectra, args.chunk, *raw(np.float64))
+    bench("raw float32", spectra, args.chunk, *raw(np.float32))
+    modes = [("pixel", spectrum_codec.MODE_PIXEL), ("scan", spectrum_codec.MODE_SCAN),
+             ("both", spectrum_codec.MODE_BOTH), ("auto", None)]
+    for compress in (False, True):
+        for name, mode in modes:
+            label = f"delta {name}" + (" +zlib" if compress else "")
+            size = bench(label, spectra, args.chunk,
+                         lambda b, m=mode, c=compress: spectrum_codec.encode(b, mode=m, compress=c),
+                         spectrum_codec.decode)
+        print(f"  {'':<18} auto{' +zlib' if compress else ''} is {csv_b / size:5.1f}x smaller than CSV")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from PyQt5.QtCore import QObject, pyqtSignal
 from PyQt5.QtWidgets import QGroupBox, QHBoxLayout, QLabel, QComboBox, QLineEdit, QPushButton
 
 from drivers.filterwheel import FilterWheelConnectThread, FilterWheelCommandThread
+from drivers.telemetry import telemetry_store
 
 class FilterWheelController(QObject):
     status_signal = pyqtSignal(str)
@@ -80,19 +81,16 @@ class FilterWheelController(QObject):
 
         if self.last:
             if self.last == "F1r":
-                self.pos_label.setText("1")
+                pos = 1
             elif self.last.startswith("F1") and len(self.last) == 3 and self.last[2].isdigit():
-                self.pos_label.setText(self.last[2])
-            else:
-                if pos is not None:
-                    self.pos_label.setText(str(pos))
+                pos = int(self.last[2])
+            if pos is not None:
+                self.pos_label.setText(str(pos))
+                telemetry_store.publish({"FilterPos": pos})
         self.last = None
 
     def get_position(self):
-        try:
-            return int(self.pos_label.text())
-        except:
-            return 0
+        return int(telemetry_store.snapshot().get("FilterPos"))
 
     def is_connected(self):
         return self._connected
@@ -7,6 +7,7 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.pyplot as plt
 
 from drivers.imu import start_imu_read_thread
+from drivers.telemetry import telemetry_store
 import utils
 
 class IMUController(QObject):
@@ -60,13 +61,6 @@ class IMUController(QObject):
 
         self._connected = False
         self.serial = None
-        self.latest = {
-            'rpy': (0, 0, 0),
-            'latitude': 0,
-            'longitude': 0,
-            'temperature': 0,
-            'pressure': 0
-        }
 
         # Auto-select config port if provided
         if parent is not None and hasattr(parent, 'config'):
@@ -90,7 +84,7 @@ class IMUController(QObject):
             return self.status_signal.emit(f"Fail: {e}")
         self._connected = True
         self.status_signal.emit(f"IMU on {port}@{baud}")
-        self.stop_evt = start_imu_read_thread(self.serial, self.latest)
+        self.stop_evt = start_imu_read_thread(self.serial, telemetry_store)
         self.update_timer = QTimer(self)
         self.update_timer.timeout.connect(self._refresh)
         self.update_timer.start(100)
@@ -105,11 +99,8 @@ class IMUController(QObject):
                 self.cam_label.setPixmap(QPixmap.fromImage(img))
 
     def _refresh(self):
-        r, p, y = self.latest['rpy']
-        lat = self.latest['latitude']
-        lon = self.latest['longitude']
-        t = self.latest['temperature']
-        pres = self.latest['pressure']
+        r, p, y, lat, lon, t, pres = telemetry_store.row(
+            ("Roll_deg", "Pitch_deg", "Yaw_deg", "Latitude_deg", "Longitude_deg", "Temperature_C", "Pressure_hPa"))
         self.data_label.setText(f"R={r:.1f}°, P={p:.1f}°, Y={y:.1f}°\n"
                                 f"T={t:.1f}°C, P={pres:.1f}hPa\n"
                                 f"Lat={lat:.5f}, Lon={lon:.5f}")
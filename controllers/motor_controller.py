@@ -2,10 +2,12 @@ from PyQt5.QtCore import QObject, pyqtSignal
 from PyQt5.QtWidgets import QGroupBox, QLabel, QComboBox, QPushButton, QLineEdit, QGridLayout
 from serial.tools import list_ports
 
-from drivers.motor import MotorConnectThread, send_move_command
+from drivers.motor import MotorConnectThread, MotorStatusPoller, submit_move_command
+from drivers.telemetry import telemetry_store
 
 class MotorController(QObject):
     status_signal = pyqtSignal(str)
+    _move_done = pyqtSignal(bool)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -34,7 +36,20 @@ class MotorController(QObject):
 
         self.groupbox.setLayout(layout)
         self._connected = False
-        self.serial = None
+        self.client = None
+        self.poller = None
+        self._move_done.connect(self._on_move_done)
+
+        # Status poll rates (seconds) while idle and while moving
+        config = parent.config if parent is not None and hasattr(parent, 'config') else {}
+        self.poll_idle_s = float(config.get("motor_poll_idle_s", 1.0))
+        self.poll_moving_s = float(config.get("motor_poll_moving_s", 0.1))
+        # Opt-in: also probe the other serial ports if the motor is not on the selected
+        # one (skipping those configured for other instruments). The probe is a read,
+        # but it still puts Modbus frames at several baud rates on unrelated devices.
+        self.scan_ports = bool(config.get("motor_scan_ports", False))
+        self.other_device_ports = {config.get(k) for k in ("filterwheel", "imu", "spectrometer",
+                                                           "temp_controller", "thp_sensor")}
 
         # If configured port is provided, select and auto-connect
         if parent is not None and hasattr(parent, 'config'):
@@ -46,15 +61,26 @@ class MotorController(QObject):
     def connect(self):
         port = self.port_combo.currentText().strip()
         self.connect_btn.setEnabled(False)
-        thread = MotorConnectThread(port, parent=self)
+        others = []
+        if self.scan_ports:
+            others = [p.device for p in list_ports.comports()
+                      if p.device != port and p.device not in self.other_device_ports]
+        thread = MotorConnectThread(port, parent=self, other_ports=others)
         thread.result_signal.connect(self._on_connect)
         thread.start()
 
-    def _on_connect(self, ser, baud, msg):
+    def _on_connect(self, client, baud, msg):
         self.connect_btn.setEnabled(True)
         self.status_signal.emit(msg)
-        if ser:
-            self.serial = ser
+        if client:
+            if self.poller is not None:
+                self.poller.stop()
+            if self.client is not None and self.client is not client:
+                self.client.close(close_port=True)
+            self.client = client
+            self.port_combo.setCurrentText(client.serial.port)
+            self.poller = MotorStatusPoller(client, telemetry_store, self.poll_idle_s, self.poll_moving_s)
+            self.poller.start()
             self._connected = True
             self.move_btn.setEnabled(True)
         else:
@@ -67,10 +93,37 @@ class MotorController(QObject):
         except ValueError:
             self.status_signal.emit("Invalid angle")
             return
-        ok = False
-        if self.serial:
-            ok = send_move_command(self.serial, angle)
+        if not self.client:
+            self.status_signal.emit("No ACK")
+            return
+        # Queued on the port worker; the reply is reported from there through _move_done
+        future = submit_move_command(self.client, angle)
+        future.add_done_callback(lambda f: self._move_done.emit(f.exception() is None))
+        if self.poller is not None:
+            self.poller.notify_move()
+
+    def _on_move_done(self, ok):
         self.status_signal.emit("Moved" if ok else "No ACK")
 
+    @property
+    def current_angle(self):
+        return telemetry_store.snapshot().get("MotorAngle_deg")
+
+    @property
+    def current_speed(self):
+        return telemetry_store.snapshot().get("MotorSpeed_steps_s")
+
+    @property
+    def current_percent(self):
+        return telemetry_store.snapshot().get("MotorCurrent_pct")
+
+    @property
+    def alarm_code(self):
+        return telemetry_store.snapshot().get("MotorAlarmCode")
+
+    @property
+    def temperature(self):
+        return telemetry_store.snapshot().get("MotorTemp_C")
+
     def is_connected(self):
         return self._connected
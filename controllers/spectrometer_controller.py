@@ -1,21 +1,39 @@
 import os
+import time
 import numpy as np
 from PyQt5.QtCore import QObject, pyqtSignal, QTimer
-from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QHBoxLayout, QPushButton, QTabWidget, QWidget, QVBoxLayout as QVBoxLayout2
+from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, QComboBox, QTabWidget, QWidget, QVBoxLayout as QVBoxLayout2
 import pyqtgraph as pg
 
 from drivers.spectrometer import (
-    connect_spectrometer,
+    connect_spectrometers,
+    set_device_cache,
     prepare_measurement,
     AVS_MeasureCallback,
     AVS_MeasureCallbackFunc,
-    AVS_GetScopeData,
+    AVS_GetScopeDataInto,
+    AVS_GetSaturatedPixelsInto,
+    AVS_UseHighResAdc,
+    ScopeBuffer,
     StopMeasureThread
 )
+from drivers.dstr import DstrAcquisition
+from drivers.auto_exposure import AutoExposure
+from drivers.multi_spectrometer import SpectrometerDevice, MultiSpectrometerAcquisition
+from drivers.poll_acquisition import PollingAcquisition, POLL_HYBRID
+from drivers.latency import LatencyMeter, LatencyReference
+from drivers.scan_health import ScanHealth
+
+ENGINE_CALLBACK = "callback"
+ENGINE_POLLING = "polling"
+ENGINE_DSTR = "dstr"
 
 
 class SpectrometerController(QObject):
     status_signal = pyqtSignal(str)
+    # Emitted from the library callback thread; delivered on the GUI thread
+    _rearm_signal = pyqtSignal(float)
+    _first_scan_signal = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -50,6 +68,18 @@ class SpectrometerController(QObject):
         self.save_btn.setEnabled(False)
         self.save_btn.clicked.connect(self.save)
         ctrl_layout.addWidget(self.save_btn)
+        # Dynamic StoreToRam burst mode (device-side buffering)
+        self.burst_chk = QCheckBox("Burst (DSTR)")
+        ctrl_layout.addWidget(self.burst_chk)
+        # Closed-loop integration time control
+        self.auto_exp_chk = QCheckBox("Auto exposure")
+        self.auto_exp_chk.toggled.connect(self._on_auto_exposure_toggled)
+        ctrl_layout.addWidget(self.auto_exp_chk)
+        # Acquisition engine for single-device continuous measurements
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("Callback", ENGINE_CALLBACK)
+        self.engine_combo.addItem("Polling", ENGINE_POLLING)
+        ctrl_layout.addWidget(self.engine_combo)
         main_layout.addLayout(ctrl_layout)
 
         # Spectral plots in tabs
@@ -84,8 +114,55 @@ class SpectrometerController(QObject):
         self._ready = False
         self.handle = None
         self.wls = []
-        self.intens = []
         self.npix = 0
+        self.integration_time_ms = 50.0
+        self.averages = 1
+        # Reused for every scan so the callback does not allocate ctypes arrays
+        self._scope = ScopeBuffer()
+        # Last N spectra; allocated on connect once the pixel count is known
+        self.ring = None
+        self.ring_capacity = 256
+        self.dstr = None
+        # All activated spectrometers; devices[0] drives the plots, logging and auto exposure
+        self.devices = []
+        self.multi = None
+        self.sync_mode = False
+        self.poller = None
+        self.poll_strategy = POLL_HYBRID
+        # Scan-ready to stored latency per (engine, integration time in ms), all measured
+        # against one offset reference of the primary device so the engines can be compared
+        self.latency = {}
+        self.latency_reference = LatencyReference()
+        self._latency = None
+        # Missed/duplicated scans, scan rate and jitter of the primary device
+        self.health = ScanHealth()
+        self._health_missed = 0
+        health_report_s = 10.0
+        # Called as fn(ring, seq) on the acquisition thread for every stored scan of the primary device
+        self.scan_listeners = []
+        # Called as fn(rings, seqs) on a callback thread for every aligned record of a multi-device run
+        self.record_listeners = []
+        ae_cfg = {}
+        # 16-bit ADC readout; off keeps the device's 14-bit count scale of existing archives
+        self.high_res_adc = False
+        if parent is not None and hasattr(parent, 'config'):
+            self.ring_capacity = int(parent.config.get("spectrum_buffer_scans", self.ring_capacity))
+            self.sync_mode = bool(parent.config.get("spectrometer_sync", False))
+            self.high_res_adc = bool(parent.config.get("spectrometer_high_res_adc", False))
+            ae_cfg = parent.config.get("auto_exposure", {})
+            engine = parent.config.get("spectrometer_engine", ENGINE_CALLBACK)
+            self.engine_combo.setCurrentIndex(max(self.engine_combo.findData(engine), 0))
+            self.poll_strategy = parent.config.get("poll_strategy", self.poll_strategy)
+            health_report_s = float(parent.config.get("health_report_s", health_report_s))
+            if "device_cache_dir" in parent.config:
+                set_device_cache(parent.config["device_cache_dir"])
+        self.auto_exposure = AutoExposure(**ae_cfg)
+        self._rearm_pending = False
+        self._rearm_ms = None
+        # Copy of auto_exp_chk for the acquisition threads, which must not read widgets
+        self._auto_exp_on = self.auto_exp_chk.isChecked()
+        self._rearm_signal.connect(self._rearm)
+        self._first_scan_signal.connect(self._enable_save)
 
         # Ensure parent MainWindow's toggle_data_saving is used if parent exists
         if parent is not None:
@@ -99,80 +176,394 @@ class SpectrometerController(QObject):
         self.csv_dir = "data"
         os.makedirs(self.csv_dir, exist_ok=True)
 
-        # Timer for updating plot
+        # Plot state: only the visible tab is drawn, and only when there is a new scan
+        # or the view changed. (seq, tab index) of the last drawn frame:
+        self._drawn = None
+        self._pixel_x = np.empty(0)
+        # Per plot: (key, bin starts, decimated x, y buffer), rebuilt when range or width change
+        self._decim = {}
+        self.tab_widget.currentChanged.connect(self._invalidate_plot)
+        for plot in (self.plot_wl, self.plot_px):
+            plot.getViewBox().sigXRangeChanged.connect(self._invalidate_plot)
+            plot.getViewBox().sigResized.connect(self._invalidate_plot)
+
+        # Timer for updating plot; caps the redraw rate, idle ticks cost nothing
         self.plot_timer = QTimer(self)
         self.plot_timer.timeout.connect(self._update_plot)
         self.plot_timer.start(200)  # update plot at 5 Hz
+        # Periodic acquisition health report while measuring
+        self.health_timer = QTimer(self)
+        self.health_timer.setInterval(int(health_report_s * 1000))
+        self.health_timer.timeout.connect(self._report_health)
 
     def connect(self):
         # Emit status for feedback
         self.status_signal.emit("Connecting to spectrometer...")
         try:
-            handle, wavelengths, num_pixels, serial_str = connect_spectrometer()
+            found = connect_spectrometers()
         except Exception as e:
             self.status_signal.emit(f"Connection failed: {e}")
             return
-        self.handle = handle
+        self.devices = [SpectrometerDevice(*dev, ring_capacity=self.ring_capacity) for dev in found]
+        primary = self.devices[0]
+        self.handle = primary.handle
         # Store wavelength calibration and number of pixels
-        self.wls = wavelengths.tolist() if isinstance(wavelengths, np.ndarray) else wavelengths
-        self.npix = num_pixels
+        self.wls = primary.wls
+        self.npix = primary.npix
+        self.ring = primary.ring
+        self.latency = {}
+        self.latency_reference = LatencyReference()
+        self._pixel_x = np.arange(self.npix, dtype=np.float64)
+        self._decim.clear()
+        self._drawn = None
+        # Auto exposure targets a fraction of the primary device's ADC range
+        self.auto_exposure.full_scale = 16383.0
+        if self.high_res_adc:
+            for dev in self.devices:
+                if AVS_UseHighResAdc(dev.handle, True) == 0 and dev is primary:
+                    self.auto_exposure.full_scale = 65535.0
         self._ready = True
         # Enable measurement start once connected
         self.start_btn.setEnabled(True)
-        self.status_signal.emit(f"Spectrometer ready (SN={serial_str})")
+        serials = ", ".join(dev.serial for dev in self.devices)
+        self.status_signal.emit(f"Spectrometer ready (SN={serials})")
 
     def start(self):
         if not self._ready:
             self.status_signal.emit("Spectrometer not ready.")
             return
-        code = prepare_measurement(self.handle, self.npix, integration_time_ms=50.0, averages=1)
+        self.health.reset()
+        self._health_missed = 0
+        if not self._arm(burst=self.burst_chk.isChecked()):
+            return
+        self.health_timer.start()
+        self.start_btn.setEnabled(False)
+        self.burst_chk.setEnabled(False)
+        self.engine_combo.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        if self.dstr:
+            self.status_signal.emit("Burst measurement started")
+        elif self.poller:
+            self.status_signal.emit(f"Measurement started (polling, {self.poller.strategy})")
+        elif self.multi:
+            mode = "synchronised" if self.multi.sync else "free-running"
+            self.status_signal.emit(f"Measurement started on {len(self.devices)} spectrometers ({mode})")
+        else:
+            self.status_signal.emit("Measurement started")
+
+    def _arm(self, burst=False):
+        """Prepare and start a measurement with the current integration time."""
+        if len(self.devices) > 1 and not burst:
+            return self._arm_all()
+        # Auto exposure needs the saturation flags; it is not used in burst mode
+        sat_detect = 1 if (self._auto_exp_on and not burst) else 0
+        code = prepare_measurement(self.handle, self.npix, integration_time_ms=self.integration_time_ms,
+                                   averages=self.averages, saturation_detection=sat_detect)
         if code != 0:
             self.status_signal.emit(f"Prepare error: {code}")
-            return
+            return False
         self.measure_active = True
-        self.cb = AVS_MeasureCallbackFunc(self._cb)
-        err = AVS_MeasureCallback(self.handle, self.cb, -1)
+        if burst:
+            self.dstr = DstrAcquisition(self.handle, self.ring, self.integration_time_ms, self.averages,
+                                        on_scan=self._on_scan_stored, on_event=self.status_signal.emit,
+                                        latency=self._latency_meter(ENGINE_DSTR))
+            err = self.dstr.start()
+        elif self.engine_combo.currentData() == ENGINE_POLLING:
+            self.poller = PollingAcquisition(self.handle, self.ring, self.integration_time_ms, self.averages,
+                                             strategy=self.poll_strategy, on_scan=self._on_polled_scan,
+                                             latency=self._latency_meter(ENGINE_POLLING))
+            err = self.poller.start()
+        else:
+            self._latency = self._latency_meter(ENGINE_CALLBACK)
+            self.cb = AVS_MeasureCallbackFunc(self._cb)
+            err = AVS_MeasureCallback(self.handle, self.cb, -1)
         if err != 0:
             self.status_signal.emit(f"Callback error: {err}")
             self.measure_active = False
+            self.dstr = None
+            self.poller = None
+            return False
+        return True
+
+    def _latency_meter(self, engine):
+        key = (engine, round(self.integration_time_ms, 3))
+        if key not in self.latency:
+            self.latency[key] = LatencyMeter(reference=self.latency_reference)
+        return self.latency[key]
+
+    def _arm_all(self):
+        # Every detector on its own callback; auto exposure and burst mode are single-device only
+        self.multi = MultiSpectrometerAcquisition(self.devices, self.integration_time_ms, self.averages,
+                                                  sync=self.sync_mode, on_scan=self._on_device_scan,
+                                                  on_record=self._on_record)
+        err = self.multi.start()
+        if err != 0:
+            self.status_signal.emit(f"Callback error: {err}")
+            self.multi = None
+            return False
+        self.measure_active = True
+        return True
+
+    def _on_device_scan(self, index, seq):
+        # Plots, health and scan listeners follow the primary device
+        if index == 0:
+            self._on_scan_stored(seq)
+
+    def _on_record(self, record):
+        if not self.record_listeners:
             return
-        self.start_btn.setEnabled(False)
-        self.stop_btn.setEnabled(True)
-        self.status_signal.emit("Measurement started")
+        rings = [dev.ring for dev in self.devices]
+        for listener in self.record_listeners:
+            listener(rings, record.seqs)
 
     def _cb(self, p_data, p_user):
         # Spectrometer driver callback (on new scan)
         status_code = p_user[0]
         if status_code == 0:
-            _, data = AVS_GetScopeData(self.handle)
-            # Ensure intensities list has correct length
-            full = [0.0] * self.npix
-            full[:len(data)] = data
-            self.intens = full
-            # Enable snapshot save and continuous save after first data received
-            self.save_btn.setEnabled(True)
-            self.toggle_btn.setEnabled(True)
+            if AVS_GetScopeDataInto(self.handle, self._scope) != 0:
+                self.health.record_error()
+                return
+            seq = self.ring.push(self._scope.spectrum, self._scope.timelabel,
+                                 self.integration_time_ms, self.averages)
+            self._latency.record(self._scope.timelabel, time.perf_counter())
+            self._on_scan_stored(seq)
+            if self._auto_exp_on and not self._rearm_pending:
+                self._auto_expose(seq)
         else:
+            self.health.record_error()
             self.status_signal.emit(f"Spectrometer error code {status_code}")
 
+    def _on_polled_scan(self, seq):
+        # Polling worker thread
+        self._on_scan_stored(seq)
+        if self._auto_exp_on and not self._rearm_pending:
+            self._auto_expose(seq)
+
+    def _on_scan_stored(self, seq):
+        self.health.record_scan(self.ring.timelabel(seq))
+        for listener in self.scan_listeners:
+            listener(self.ring, seq)
+        if seq == 0:
+            # Acquisition threads must not touch widgets; enable saving on the GUI thread
+            self._first_scan_signal.emit()
+
+    def _enable_save(self):
+        # Enable snapshot save and continuous save after first data received
+        self.save_btn.setEnabled(True)
+        self.toggle_btn.setEnabled(True)
+
+    def _auto_expose(self, seq):
+        if AVS_GetSaturatedPixelsInto(self.handle, self._scope) != 0:
+            return
+        n_sat = int(np.count_nonzero(self._scope.saturated[:self.npix]))
+        new_ms = self.auto_exposure.update(self.ring.get(seq), n_sat, self.integration_time_ms)
+        if new_ms is not None:
+            self._rearm_pending = True
+            self._rearm_signal.emit(new_ms)
+
+    def _on_auto_exposure_toggled(self, checked):
+        self._auto_exp_on = checked
+        # Saturation detection is set when the measurement is prepared; re-arm to turn it on
+        if (checked and getattr(self, 'measure_active', False) and self.multi is None
+                and self.dstr is None and not self._rearm_pending):
+            self._rearm_pending = True
+            self._rearm(self.integration_time_ms)
+
+    def _rearm(self, new_ms):
+        # Runs on the GUI thread: the measurement cannot be restarted from inside its own callback
+        if not getattr(self, 'measure_active', False) or not self.stop_btn.isEnabled():
+            # Stopped (or stopping) in the meantime
+            self._rearm_pending = False
+            return
+        # AVS_StopMeasure blocks; re-arm once it has returned
+        self._rearm_ms = new_ms
+        stopper = StopMeasureThread(self.handle, parent=self)
+        stopper.finished_signal.connect(self._on_rearm_stopped)
+        stopper.start()
+
+    def _on_rearm_stopped(self):
+        new_ms = self._rearm_ms
+        if not getattr(self, 'measure_active', False) or not self.stop_btn.isEnabled():
+            # Stop was pressed while the measurement was being stopped for the re-arm
+            self._rearm_pending = False
+            return
+        if self.poller is not None:
+            self.poller.shutdown()
+            self.poller = None
+        old_ms = self.integration_time_ms
+        self.integration_time_ms = new_ms
+        # The scan period changes; keep the totals but not the interval statistics
+        self.health.new_run()
+        if self._arm():
+            if new_ms != old_ms:
+                self.status_signal.emit(f"Integration time {old_ms:.2f} -> {new_ms:.2f} ms "
+                                        f"(peak {self.auto_exposure.last_peak:.0f})")
+            else:
+                self.status_signal.emit("Auto exposure on")
+        else:
+            self.start_btn.setEnabled(True)
+            self.burst_chk.setEnabled(True)
+            self.engine_combo.setEnabled(True)
+            self.stop_btn.setEnabled(False)
+        self._rearm_pending = False
+
+    def add_scan_listener(self, listener):
+        # Replace rather than mutate: acquisition threads iterate the list without a lock
+        self.scan_listeners = self.scan_listeners + [listener]
+
+    def remove_scan_listener(self, listener):
+        self.scan_listeners = [fn for fn in self.scan_listeners if fn != listener]
+
+    def add_record_listener(self, listener):
+        self.record_listeners = self.record_listeners + [listener]
+
+    def remove_record_listener(self, listener):
+        self.record_listeners = [fn for fn in self.record_listeners if fn != listener]
+
+    def health_metrics(self):
+        """Live acquisition health of the primary device, including engine-side read errors."""
+        m = self.health.metrics()
+        if self.poller is not None:
+            m["errors"] += self.poller.read_errors
+        elif self.dstr is not None:
+            m["errors"] += self.dstr.scan_errors + self.dstr.read_errors
+        elif self.multi is not None:
+            m["errors"] += self.devices[0].errors
+        return m
+
+    def _report_health(self):
+        m = self.health_metrics()
+        new_missed = m["missed"] - self._health_missed
+        self._health_missed = m["missed"]
+        msg = (f"Scans {m['scans']} ({m['scan_rate_hz']:.1f}/s, jitter {m['jitter_us']:.0f} us), "
+               f"missed {m['missed']}, duplicates {m['duplicates']}, errors {m['errors']}")
+        if new_missed > 0:
+            msg = f"Host not keeping up, {new_missed} scans missed. " + msg
+        self.status_signal.emit(msg)
+
+    def latest(self):
+        """(seq, read-only spectrum view, acquisition metadata) of the newest scan."""
+        if self.ring is None:
+            return -1, np.empty(0), None
+        seq, spectrum = self.ring.latest()
+        if spectrum is None:
+            return -1, np.empty(0), None
+        return seq, spectrum, self.ring.meta(seq)
+
+    @property
+    def intens(self):
+        """Read-only view of the newest spectrum (empty before the first scan)."""
+        if self.ring is None:
+            return np.empty(0)
+        _, spectrum = self.ring.latest()
+        return spectrum if spectrum is not None else np.empty(0)
+
+    def _invalidate_plot(self, *args):
+        self._drawn = None
+
     def _update_plot(self):
-        if not self.intens:
+        if self.ring is None or self.ring.head < 0:
+            return
+        seq = self.ring.head
+        tab = self.tab_widget.currentIndex()
+        if (seq, tab) == self._drawn:
             return
-        # Update both plots
-        self.curve_wl.setData(self.wls, self.intens)
-        self.curve_px.setData(list(range(len(self.intens))), self.intens)
+        spectrum = self.ring.get(seq)
+        if spectrum is None:
+            return
+        if tab == 0:
+            x, y = self._decimate(self.plot_wl, self.wls, spectrum)
+            self.curve_wl.setData(x, y)
+        else:
+            x, y = self._decimate(self.plot_px, self._pixel_x, spectrum)
+            self.curve_px.setData(x, y)
+        self._drawn = (seq, tab)
+
+    def _decimate(self, plot, x, y):
+        """
+        Min/max envelope of the visible part of `y`, two points per screen pixel
+        column. Returns (x, y) arrays owned by the controller, so the plot never
+        holds a view into the ring buffer.
+        """
+        vb = plot.getViewBox()
+        n = min(len(x), y.size)
+        lo, hi = 0, n
+        if not vb.autoRangeEnabled()[0]:
+            x0, x1 = vb.viewRange()[0]
+            lo = max(int(np.searchsorted(x[:n], x0)) - 1, 0)
+            hi = min(int(np.searchsorted(x[:n], x1)) + 1, n)
+        # The view box has no size until it is shown
+        width = max(int(vb.width()), 256)
+        bins = min(width, (hi - lo) // 2)
+        key = (id(x), lo, hi, bins)
+        cached = self._decim.get(id(plot))
+        if cached is None or cached[0] != key:
+            if bins < width:
+                # Fewer than two pixels per column: draw every pixel
+                starts = None
+                x_out = x[lo:hi].copy()
+                y_buf = np.empty(hi - lo)
+            else:
+                starts = (np.arange(bins) * (hi - lo)) // bins
+                ends = np.append(starts[1:], hi - lo) - 1
+                x_out = np.empty(2 * bins)
+                x_out[0::2] = x[lo + starts]
+                x_out[1::2] = x[lo + ends]
+                y_buf = np.empty(2 * bins)
+            cached = (key, starts, x_out, y_buf)
+            self._decim[id(plot)] = cached
+        _, starts, x_out, y_buf = cached
+        if starts is None:
+            y_buf[:] = y[lo:hi]
+        else:
+            visible = y[lo:hi]
+            np.minimum.reduceat(visible, starts, out=y_buf[0::2])
+            np.maximum.reduceat(visible, starts, out=y_buf[1::2])
+        return x_out, y_buf
 
     def stop(self):
         if not getattr(self, 'measure_active', False):
             return
         self.stop_btn.setEnabled(False)
-        stopper = StopMeasureThread(self.handle, parent=self)
+        handles = self.multi.handles() if self.multi else self.handle
+        stopper = StopMeasureThread(handles, parent=self)
         stopper.finished_signal.connect(self._on_stopped)
         stopper.start()
 
     def _on_stopped(self):
         self.measure_active = False
+        self.health_timer.stop()
+        self._report_health()
         self.start_btn.setEnabled(True)
+        self.burst_chk.setEnabled(True)
+        self.engine_combo.setEnabled(True)
+        if self.multi is not None:
+            self.multi.finish()
+            unmatched = self.multi.aligner.unmatched
+            records = self.multi.aligner.count
+            self.multi = None
+            self.status_signal.emit(f"Measurement stopped ({records} aligned records, {unmatched} unmatched scans)")
+            return
+        if self.dstr is not None:
+            self.dstr.shutdown()
+            st = self.dstr.stats()
+            self.dstr = None
+            lat = f", latency p50 {st['p50_us']:.0f} us" if "p50_us" in st else ""
+            self.status_signal.emit(
+                f"Burst stopped: {st['scans_received']} scans, "
+                f"FOE {st['overflow_events']}, IERR {st['internal_errors']}{lat}")
+            return
+        if self.poller is not None:
+            self.poller.shutdown()
+            meter = self.poller.latency
+            self.poller = None
+        else:
+            meter = self._latency
+        lat = meter.stats() if meter is not None else {}
+        if lat:
+            self.status_signal.emit(f"Measurement stopped (latency p50 {lat['p50_us']:.0f} us, "
+                                    f"p99 {lat['p99_us']:.0f} us)")
+            return
         self.status_signal.emit("Measurement stopped")
 
     def save(self):
@@ -2,6 +2,7 @@ from PyQt5.QtCore import QObject, pyqtSignal, QTimer
 from PyQt5.QtWidgets import QGroupBox, QGridLayout, QLabel, QLineEdit, QPushButton
 
 from drivers.tc36_25_driver import TC36_25
+from drivers.telemetry import telemetry_store
 
 class TempController(QObject):
     status_signal = pyqtSignal(str)
@@ -55,6 +56,7 @@ class TempController(QObject):
             return
         try:
             self.tc.set_setpoint(t)  # ← FIXED LINE
+            telemetry_store.publish({"TempCtrl_set": t})
             self.status_signal.emit(f"SP={t:.1f}°C")
         except Exception as e:
             self.status_signal.emit(f"Set fail: {e}")
@@ -63,6 +65,7 @@ class TempController(QObject):
     def _upd(self):
         try:
             current = self.tc.get_temperature()
+            telemetry_store.publish({"TempCtrl_curr": current})
             self.cur_lbl.setText(f"{current:.2f} °C")
         except Exception as e:
             self.cur_lbl.setText("-- °C")
@@ -70,19 +73,13 @@ class TempController(QObject):
 
     @property
     def current_temp(self):
-        # Current temperature reading from controller
-        try:
-            return float(self.cur_lbl.text().split()[0])
-        except:
-            return 0.0
+        # Last temperature read from the controller
+        return telemetry_store.snapshot().get("TempCtrl_curr")
 
     @property
     def setpoint(self):
-        # Last set temperature (if known)
-        try:
-            return float(self.set_input.text().strip())
-        except:
-            return 0.0
+        # Last setpoint sent to the controller
+        return telemetry_store.snapshot().get("TempCtrl_set")
 
     def is_connected(self):
         # If initialization succeeded, assume always connected
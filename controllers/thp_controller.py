@@ -1,6 +1,7 @@
 from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 from PyQt5.QtWidgets import QGroupBox, QLabel, QVBoxLayout
 from drivers.thp_sensor import read_thp_sensor_data
+from drivers.telemetry import telemetry_store
 
 class THPController(QObject):
     status_signal = pyqtSignal(str)
@@ -35,6 +36,8 @@ class THPController(QObject):
         data = read_thp_sensor_data(self.port)
         if data:
             self.latest = data
+            telemetry_store.publish({"THP_Temp_C": data["temperature"], "THP_Humidity_pct": data["humidity"],
+                                     "THP_Pressure_hPa": data["pressure"]})
             self.temp_lbl.setText(f"Temp: {data['temperature']:.1f} °C")
             self.hum_lbl.setText(f"Humidity: {data['humidity']:.1f} %")
             self.pres_lbl.setText(f"Pressure: {data['pressure']:.1f} hPa")
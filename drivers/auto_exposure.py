@@ -0,0 +1,50 @@
+class AutoExposure(object):
+    """
+    Closed-loop integration time control.
+
+    Detector counts are modelled as baseline + rate * integration_time, so one
+    unsaturated scan is enough to predict the integration time that puts the
+    peak at `target_fraction` of full scale. A saturated scan carries no usable
+    rate information, so the time is cut by `saturated_factor` and the next
+    scan is used for the prediction. A new time is only proposed when it
+    differs from the current one by more than `deadband` (relative), which
+    keeps the measurement from being re-armed for small fluctuations.
+    """
+
+    def __init__(self, full_scale=65535.0, target_fraction=0.75, min_ms=1.0, max_ms=4000.0,
+                 deadband=0.2, saturated_factor=0.25):
+        self.full_scale = float(full_scale)
+        self.target_fraction = float(target_fraction)
+        self.min_ms = float(min_ms)
+        self.max_ms = float(max_ms)
+        self.deadband = float(deadband)
+        self.saturated_factor = float(saturated_factor)
+        self.last_peak = 0.0
+        self.last_saturated = 0
+
+    def predict(self, spectrum, saturated_pixels, integration_ms):
+        """Integration time (ms) that should bring the peak to the target, clamped to limits."""
+        peak = float(spectrum.max())
+        self.last_peak = peak
+        self.last_saturated = int(saturated_pixels)
+        if saturated_pixels > 0 or peak >= self.full_scale:
+            new_ms = integration_ms * self.saturated_factor
+        else:
+            baseline = float(spectrum.min())
+            signal = peak - baseline
+            if signal < 1.0:
+                # No measurable light above the baseline: go to the longest exposure
+                new_ms = self.max_ms
+            else:
+                new_ms = integration_ms * (self.target_fraction * self.full_scale - baseline) / signal
+        return min(max(new_ms, self.min_ms), self.max_ms)
+
+    def update(self, spectrum, saturated_pixels, integration_ms):
+        """
+        Returns the new integration time in ms if the measurement should be
+        re-armed, otherwise None.
+        """
+        new_ms = self.predict(spectrum, saturated_pixels, integration_ms)
+        if abs(new_ms - integration_ms) <= self.deadband * integration_ms:
+            return None
+        return new_ms
@@ -1,7 +1,9 @@
+import os
 import sys
 import inspect
 import ctypes
 import struct
+import numpy as np
 import globals
 
 AVS_SERIAL_LEN = 10
@@ -27,8 +29,19 @@ CLIENT_ID_SIZE = 32
 DSTR_STATUS_DSS_MASK = 0x01   # DSTR Sequence Stop (DSS) bit of MEASUREMENT_DSTR_STATUS->DMS
 DSTR_STATUS_FOE_MASK = 0x02   # FIFO Overflow Error (FOE) bit of MEASUREMENT_DSTR_STATUS->DMS
 DSTR_STATUS_IERR_MASK = 0x04  # Internal Error (IERR) bit of MEASUREMENT_DSTR_STATUS->DMS
+TRIGGER_SOFTWARE = 0          # MeasConfigType.m_Trigger_m_Mode: scans start on the Measure call
+TRIGGER_HARDWARE = 1          # MeasConfigType.m_Trigger_m_Mode: scans start on a trigger input
+TRIGGER_SOURCE_EXTERNAL = 0   # MeasConfigType.m_Trigger_m_Source: external trigger input
+TRIGGER_SOURCE_SYNC = 1       # MeasConfigType.m_Trigger_m_Source: sync input, driven by the sync master
 
-if 'linux' in sys.platform: # Linux will have 'linux' or 'linux2'
+# AVASPEC_BACKEND=sim swaps the vendor library for the software spectrometer in
+# avaspec_sim, so the acquisition stack runs without libavs or hardware.
+BACKEND = os.environ.get("AVASPEC_BACKEND", "libavs").lower()
+
+if BACKEND == "sim":
+    lib = None
+    func = ctypes.CFUNCTYPE
+elif 'linux' in sys.platform: # Linux will have 'linux' or 'linux2'
     lib = ctypes.CDLL("/usr/local/lib/libavs.so.0")
     func = ctypes.CFUNCTYPE
 elif 'darwin' in sys.platform: # macOS will have 'darwin'
@@ -163,6 +176,58 @@ class DstrStatusType(ctypes.Structure):
               ("m_IsInternalErrorEvent", ctypes.c_uint8),
               ("m_Reserved", ctypes.c_uint8)]
 
+# Output array types used by the per-scan calls
+SpectrumArrayType = ctypes.c_double * MAX_NR_PIXELS
+SaturatedArrayType = ctypes.c_uint8 * MAX_NR_PIXELS
+
+# Binding table: every entry point is turned into a ctypes function object once
+# and reused. Creating the prototype and resolving the symbol from lib costs
+# far more than the call itself, which matters when it happens on every scan.
+_bindings = {}
+
+def _bind(name, restype, *argtypes, paramflags=None):
+    """
+    Returns the cached ctypes function for an exported library symbol, creating
+    it on first use.
+    
+    :param name: name of the exported function, e.g. "AVS_GetScopeData"
+    :param restype: ctypes return type
+    :param argtypes: ctypes argument types
+    :param paramflags: optional ctypes paramflags (use 2 for output parameters)
+    :return: callable ctypes function object
+    """
+    key = (name, restype, argtypes, paramflags)
+    bound = _bindings.get(key)
+    if bound is None:
+        if lib is None:
+            raise OSError(f"{name} is not available with the '{BACKEND}' backend")
+        prototype = func(restype, *argtypes)
+        if paramflags is None:
+            bound = prototype((name, lib))
+        else:
+            bound = prototype((name, lib), paramflags)
+        _bindings[key] = bound
+    return bound
+
+class ScopeBuffer(object):
+    """
+    Caller-owned output buffers for AVS_GetScopeDataInto and
+    AVS_GetSaturatedPixelsInto. Allocate one per device and reuse it for every
+    scan; `spectrum` and `saturated` are NumPy views on the ctypes arrays, so
+    they see new data without a copy.
+    """
+    def __init__(self):
+        self.c_spectrum = SpectrumArrayType()
+        self.c_saturated = SaturatedArrayType()
+        self.c_timelabel = ctypes.c_uint32()
+        self.spectrum = np.ctypeslib.as_array(self.c_spectrum)
+        self.saturated = np.ctypeslib.as_array(self.c_saturated)
+
+    @property
+    def timelabel(self):
+        """Timelabel of the last scan read into this buffer, in 10 us ticks."""
+        return self.c_timelabel.value
+
 def AVS_Init(a_Port = 0):
     """
     Initializes the communication interface with the spectrometers.
@@ -173,9 +238,8 @@ def AVS_Init(a_Port = 0):
     :return: Number of connected and/or found devices; ERR_CONNECTION_FAILURE,
     ERR_ETHCONN_REUSE
     """    
-    prototype = func(ctypes.c_int, ctypes.c_int)
     paramflags = (1, "port",),
-    AVS_Init = prototype(("AVS_Init", lib), paramflags)
+    AVS_Init = _bind("AVS_Init", ctypes.c_int, ctypes.c_int, paramflags=paramflags)
     ret = AVS_Init(a_Port) 
     return ret 
 
@@ -185,8 +249,7 @@ def AVS_Done():
     
     :return: SUCCESS = 0
     """
-    prototype = func(ctypes.c_int)
-    AVS_Done = prototype(("AVS_Done",lib),)
+    AVS_Done = _bind("AVS_Done", ctypes.c_int)
     ret = AVS_Done()
     return ret  
 
@@ -197,8 +260,7 @@ def AVS_GetNrOfDevices():
     
     :return: Number of devices found.
     """
-    prototype = func(ctypes.c_int)
-    AVS_GetNrOfDevices = prototype(("AVS_GetNrOfDevices", lib),)
+    AVS_GetNrOfDevices = _bind("AVS_GetNrOfDevices", ctypes.c_int)
     ret = AVS_GetNrOfDevices()
     return ret
 
@@ -210,8 +272,7 @@ def AVS_UpdateUSBDevices():
     
     :return: Number of devices found.    
     """
-    prototype = func(ctypes.c_int)
-    AVS_UpdateUSBDevices = prototype(("AVS_UpdateUSBDevices", lib),)
+    AVS_UpdateUSBDevices = _bind("AVS_UpdateUSBDevices", ctypes.c_int)
     ret = AVS_UpdateUSBDevices()
     return ret
 
@@ -223,9 +284,8 @@ def AVS_UpdateETHDevices(spectrometers = 1):
     default value of 1, and automatically corrects.
     :return: Tuple containing BroadcastAnswerType for each found device.
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(BroadcastAnswerType*spectrometers))
     paramflags = (1, "listsize",), (2, "requiredsize",), (2, "ETHlist",),
-    PT_AVS_UpdateETHDevices = prototype(("AVS_UpdateETHDevices", lib), paramflags)
+    PT_AVS_UpdateETHDevices = _bind("AVS_UpdateETHDevices", ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(BroadcastAnswerType*spectrometers), paramflags=paramflags)
     reqBufferSize, ETHlist = PT_AVS_UpdateETHDevices(spectrometers*26)
     if reqBufferSize != spectrometers*26:
         ETHlist = AVS_UpdateETHDevices(reqBufferSize//26)
@@ -242,9 +302,8 @@ def AVS_GetList(spectrometers = 1):
     :return: Tuple containing AvsIdentityType for each found device. Devices 
     are sorted by UserFriendlyName
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(AvsIdentityType*spectrometers))
     paramflags = (1, "listsize",), (2, "requiredsize",), (2, "IDlist",),
-    PT_GetList = prototype(("AVS_GetList", lib), paramflags)
+    PT_GetList = _bind("AVS_GetList", ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(AvsIdentityType*spectrometers), paramflags=paramflags)
     reqBufferSize, spectrometerList = PT_GetList(spectrometers*75)
     if reqBufferSize != spectrometers*75:
         spectrometerList = AVS_GetList(reqBufferSize//75)
@@ -259,9 +318,8 @@ def AVS_GetHandleFromSerial(deviceSerial):
     :type deviceSerial: str, bytes
     :return: AvsHandle, handle to be used in subsequent function calls
     """
-    prototype = func(ctypes.c_int, ctypes.c_char_p)
     paramflags = (1, "deviceSerial",),
-    AVS_Activate = prototype(("AVS_Activate", lib), paramflags)
+    AVS_Activate = _bind("AVS_Activate", ctypes.c_int, ctypes.c_char_p, paramflags=paramflags)
     if type(deviceSerial) is str:
         deviceSerial = deviceSerial.encode("utf-8")
     ret = AVS_Activate(deviceSerial)
@@ -287,9 +345,8 @@ def AVS_Activate(deviceId):
         temp[x] = 0
         x += 1
     temp[74] = int.from_bytes(deviceId.Status, byteorder='big')  #  cannot assign directly here
-    prototype = func(ctypes.c_int, ctypes.c_byte * 75)
     paramflags = (1, "deviceId",),
-    AVS_Activate = prototype(("AVS_Activate", lib), paramflags)
+    AVS_Activate = _bind("AVS_Activate", ctypes.c_int, ctypes.c_byte * 75, paramflags=paramflags)
     ret = AVS_Activate(temp)
     return ret
 
@@ -300,10 +357,8 @@ def AVS_Deactivate(handle):
     :param handle: AvsHandle of the spectrometer
     :return: True when device successfully closed, False when handle not found
     """
-    prototype = func(ctypes.c_bool, ctypes.c_int)
-    prototype.restype = ctypes.c_bool
     paramflags = (1, "handle",),
-    AVS_Deactivate = prototype(("AVS_Deactivate", lib), paramflags)
+    AVS_Deactivate = _bind("AVS_Deactivate", ctypes.c_bool, ctypes.c_int, paramflags=paramflags)
     ret = AVS_Deactivate(handle)
     return ret 
 
@@ -316,9 +371,8 @@ def AVS_UseHighResAdc(handle, enable):
     false uses 14 bit resolution (16383 max value)
     :return: SUCCESS = 0 or FAILURE <> 0
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_bool)
     paramflags = (1, "handle",), (1, "enable",),
-    AVS_UseHighResAdc = prototype(("AVS_UseHighResAdc", lib), paramflags)
+    AVS_UseHighResAdc = _bind("AVS_UseHighResAdc", ctypes.c_int, ctypes.c_int, ctypes.c_bool, paramflags=paramflags)
     ret = AVS_UseHighResAdc(handle, enable)
     return ret
 
@@ -330,9 +384,8 @@ def AVS_GetVersionInfo(handle):
     :return: tuple of the three requested versionstrings (FPGA, FW and Library), 
     encoded in c_char
     """       
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_char * VERSION_LEN, ctypes.c_char * VERSION_LEN, ctypes.c_char * VERSION_LEN)
     paramflags = (1, "handle",), (2, "FPGAversion",), (2, "FWversion",), (2, "DLLversion",),
-    AVS_GetVersionInfo = prototype(("AVS_GetVersionInfo", lib), paramflags) 
+    AVS_GetVersionInfo = _bind("AVS_GetVersionInfo", ctypes.c_int, ctypes.c_int, ctypes.c_char * VERSION_LEN, ctypes.c_char * VERSION_LEN, ctypes.c_char * VERSION_LEN, paramflags=paramflags)
     ret = AVS_GetVersionInfo(handle)
     return ret    
 
@@ -343,9 +396,8 @@ def AVS_PrepareMeasure(handle, measconf):
     :param measconf: MeasConfigType containing measurement configuration.
     :return: SUCCESS = 0 or FAILURE <> 0
     """    
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(MeasConfigType))
-    paramflags = (1, "handle",), (1, "measconf",),  
-    AVS_PrepareMeasure = prototype(("AVS_PrepareMeasure", lib), paramflags)
+    paramflags = (1, "handle",), (1, "measconf",),
+    AVS_PrepareMeasure = _bind("AVS_PrepareMeasure", ctypes.c_int, ctypes.c_int, ctypes.POINTER(MeasConfigType), paramflags=paramflags)
     ret = AVS_PrepareMeasure(handle, measconf)
     return ret
 
@@ -364,11 +416,11 @@ def AVS_Measure(handle, windowhandle, nummeas):
     :return: SUCCESS = 0 or FAILURE <> 0
     """
     if not (('linux' in sys.platform) or ('darwin' in sys.platform)):
-        prototype = func(ctypes.c_int, ctypes.c_int, ctypes.wintypes.HWND, ctypes.c_uint16)
+        windowtype = ctypes.wintypes.HWND
     else:
-        prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_uint16)
+        windowtype = ctypes.c_int
     paramflags = (1, "handle",), (1, "windowhandle",), (1, "nummeas"),
-    AVS_Measure = prototype(("AVS_Measure", lib), paramflags)
+    AVS_Measure = _bind("AVS_Measure", ctypes.c_int, ctypes.c_int, windowtype, ctypes.c_uint16, paramflags=paramflags)
     ret = AVS_Measure(handle, windowhandle, nummeas) 
     return ret
 
@@ -388,9 +440,8 @@ def AVS_MeasureCallback(handle, cb, nummeas):
     start Dynamic StoreToRam
     :return: SUCCESS = 0 or FAILURE <> 0
     """    
-    prototype = func(ctypes.c_int, ctypes.c_int, cb.prototype, ctypes.c_uint16)
     paramflags = (1, "handle",), (1, "adres",), (1, "nummeas"),
-    AVS_MeasureCallback = prototype(("AVS_MeasureCallback", lib), paramflags)
+    AVS_MeasureCallback = _bind("AVS_MeasureCallback", ctypes.c_int, ctypes.c_int, cb.prototype, ctypes.c_uint16, paramflags=paramflags)
     ret = AVS_MeasureCallback(handle, cb.callback, nummeas)
     return ret
 
@@ -409,9 +460,8 @@ def AVS_SetDstrStatusCallback(handle, cb):
     program, and will be called by the library
     :return: SUCCESS = 0 or FAILURE <> 0
     """    
-    prototype = func(ctypes.c_int, ctypes.c_int, cb.prototype)
-    paramflags = (1, "handle",), (1, "adres",), 
-    AVS_SetDstrStatusCallback = prototype(("AVS_SetDstrStatusCallback", lib), paramflags)
+    paramflags = (1, "handle",), (1, "adres",),
+    AVS_SetDstrStatusCallback = _bind("AVS_SetDstrStatusCallback", ctypes.c_int, ctypes.c_int, cb.prototype, paramflags=paramflags)
     ret = AVS_SetDstrStatusCallback(handle, cb.callback)
     return ret
 
@@ -422,9 +472,8 @@ def AVS_GetDstrStatus(handle):
     :param handle: AvsHandle of the spectrometer
     :return: DstrStatusType
     """      
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(DstrStatusType))
     paramflags = (1, "handle",), (2, "dstrstatus",),
-    AVS_GetDstrStatus = prototype(("AVS_GetDstrStatus", lib), paramflags)
+    AVS_GetDstrStatus = _bind("AVS_GetDstrStatus", ctypes.c_int, ctypes.c_int, ctypes.POINTER(DstrStatusType), paramflags=paramflags)
     ret = AVS_GetDstrStatus(handle)
     return ret
 
@@ -435,9 +484,8 @@ def AVS_StopMeasure(handle):
     :param handle: AvsHandle of the spectrometer
     :return: SUCCESS = 0 or FAILURE <> 0
     """      
-    prototype = func(ctypes.c_int, ctypes.c_int)
     paramflags = (1, "handle",),
-    AVS_StopMeasure = prototype(("AVS_StopMeasure", lib), paramflags)
+    AVS_StopMeasure = _bind("AVS_StopMeasure", ctypes.c_int, ctypes.c_int, paramflags=paramflags)
     ret = AVS_StopMeasure(handle)
     return ret
 
@@ -448,9 +496,8 @@ def AVS_PollScan(handle):
     :param handle: AvsHandle of the spectrometer
     :return: 0 = no data available or 1 = data available
     """  
-    prototype = func(ctypes.c_bool, ctypes.c_int)
     paramflags = (1, "handle",),
-    AVS_PollScan = prototype(("AVS_PollScan", lib), paramflags)
+    AVS_PollScan = _bind("AVS_PollScan", ctypes.c_bool, ctypes.c_int, paramflags=paramflags)
     ret = AVS_PollScan(handle)
     return ret
     
@@ -464,9 +511,8 @@ def AVS_GetScopeData(handle):
     microcontroller ticks in 10 microsecond units since spectrometer started
     :return spectrum: 4096 element array of doubles, pixels values of spectrometer
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_double * 4096))
     paramflags = (1, "handle",), (2, "timelabel",), (2, "spectrum",),
-    AVS_GetScopeData = prototype(("AVS_GetScopeData", lib), paramflags)
+    AVS_GetScopeData = _bind("AVS_GetScopeData", ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(SpectrumArrayType), paramflags=paramflags)
     timestamp, spectrum = AVS_GetScopeData(handle)
     return timestamp, spectrum
 
@@ -478,12 +524,37 @@ def AVS_GetSaturatedPixels(handle):
     :param handle: the AvsHandle of the spectrometer
     :return saturated: 4096 element array of bytes, 1 = saturated and 0 = not saturated
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_uint8 * 4096))    
     paramflags = (1, "handle",), (2, "saturated",),
-    AVS_GetSaturatedPixels = prototype(("AVS_GetSaturatedPixels", lib), paramflags)
+    AVS_GetSaturatedPixels = _bind("AVS_GetSaturatedPixels", ctypes.c_int, ctypes.c_int, ctypes.POINTER(SaturatedArrayType), paramflags=paramflags)
     saturated = AVS_GetSaturatedPixels(handle)
     return saturated 
 
+def AVS_GetScopeDataInto(handle, buf):
+    """
+    Same as AVS_GetScopeData, but fills a caller-owned ScopeBuffer in place
+    instead of allocating a new 4096 element array for every scan.
+    
+    :param handle: the AvsHandle of the spectrometer
+    :param buf: ScopeBuffer receiving the pixel values and timelabel
+    :return: SUCCESS = 0 or FAILURE <> 0
+    """
+    AVS_GetScopeData = _bind("AVS_GetScopeData", ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(SpectrumArrayType))
+    ret = AVS_GetScopeData(handle, ctypes.byref(buf.c_timelabel), ctypes.byref(buf.c_spectrum))
+    return ret
+
+def AVS_GetSaturatedPixelsInto(handle, buf):
+    """
+    Same as AVS_GetSaturatedPixels, but fills buf.saturated in place. Should be
+    called after AVS_GetScopeDataInto.
+    
+    :param handle: the AvsHandle of the spectrometer
+    :param buf: ScopeBuffer receiving the saturation flags
+    :return: SUCCESS = 0 or FAILURE <> 0
+    """
+    AVS_GetSaturatedPixels = _bind("AVS_GetSaturatedPixels", ctypes.c_int, ctypes.c_int, ctypes.POINTER(SaturatedArrayType))
+    ret = AVS_GetSaturatedPixels(handle, ctypes.byref(buf.c_saturated))
+    return ret
+
 def AVS_GetLambda(handle):
     """
     Returns the wavelength values corresponding to the pixels if available. 
@@ -493,12 +564,23 @@ def AVS_GetLambda(handle):
     :return: 4096 element array of wavelength values for pixels. If the detector
     is less than 4096 pixels, zeros are returned for extra pixels.
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_double * 4096))
     paramflags = (1, "handle",), (2, "wavelength",),
-    AVS_GetLambda = prototype(("AVS_GetLambda", lib), paramflags)
+    AVS_GetLambda = _bind("AVS_GetLambda", ctypes.c_int, ctypes.c_int, ctypes.POINTER(SpectrumArrayType), paramflags=paramflags)
     ret = AVS_GetLambda(handle)
     return ret
 
+def AVS_GetLambdaInto(handle, wavelength):
+    """
+    Same as AVS_GetLambda, but fills a caller-owned SpectrumArrayType.
+    
+    :param handle: the AvsHandle of the spectrometer
+    :param wavelength: SpectrumArrayType receiving the wavelength values
+    :return: SUCCESS = 0 or FAILURE <> 0
+    """
+    AVS_GetLambda = _bind("AVS_GetLambda", ctypes.c_int, ctypes.c_int, ctypes.POINTER(SpectrumArrayType))
+    ret = AVS_GetLambda(handle, ctypes.byref(wavelength))
+    return ret
+
 def AVS_GetNumPixels(handle):
     """
     Returns the number of pixels of a spectrometer. This information is stored 
@@ -507,9 +589,8 @@ def AVS_GetNumPixels(handle):
     :param handle: the AvsHandle of the spectrometer
     :return: unsigned integer, number of pixels in spectrometer
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_short))
     paramflags = (1, "handle",), (2, "numPixels",),
-    AVS_GetNumPixels = prototype(("AVS_GetNumPixels",lib), paramflags)
+    AVS_GetNumPixels = _bind("AVS_GetNumPixels", ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_short), paramflags=paramflags)
     ret = AVS_GetNumPixels(handle)
     return ret    
 
@@ -521,9 +602,8 @@ def AVS_GetDigIn(handle, portId):
     :param portId: the identifier of the digital input 
     :return: the value of the digital input, 0 = low and 1 = high
     """    
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.POINTER(ctypes.c_uint8))
     paramflags = (1, "handle",), (1, "portId",), (2, "value",),
-    AVS_GetDigIn = prototype(("AVS_GetDigIn", lib), paramflags)
+    AVS_GetDigIn = _bind("AVS_GetDigIn", ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.POINTER(ctypes.c_uint8), paramflags=paramflags)
     ret = AVS_GetDigIn(handle, portId) 
     return ret
 
@@ -536,9 +616,8 @@ def AVS_SetDigOut(handle, portId, value):
     :param value: the value of the digital output, 0 = low and 1 = high 
     :return: SUCCESS = 0 or FAILURE <> 0 
     """       
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.c_uint8)
     paramflags = (1, "handle",), (1, "portId",), (1, "value",),
-    AVS_SetDigOut = prototype(("AVS_SetDigOut", lib), paramflags)
+    AVS_SetDigOut = _bind("AVS_SetDigOut", ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.c_uint8, paramflags=paramflags)
     ret = AVS_SetDigOut(handle, portId, value)
     return ret
 
@@ -552,9 +631,8 @@ def AVS_SetPwmOut(handle, portId, frequency, dutycycle):
     :param dutycycle: the percentage high time in one cycle (0-100)
     :return: SUCCESS = 0 or FAILURE <> 0 
     """       
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint8)
     paramflags = (1, "handle",), (1, "portId",), (1, "frequency",), (1, "dutycycle",),
-    AVS_SetPwmOut = prototype(("AVS_SetPwmOut", lib), paramflags)
+    AVS_SetPwmOut = _bind("AVS_SetPwmOut", ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint8, paramflags=paramflags)
     ret = AVS_SetPwmOut(handle, portId, frequency, dutycycle)
     return ret    
 
@@ -566,9 +644,8 @@ def AVS_GetAnalogIn(handle, portId):
     :param portId: the identifier of the analog input 
     :return: the value of the analog input, in Volts (or degrees Celsius)
     """      
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.POINTER(ctypes.c_float))
     paramflags = (1, "handle",), (1, "portId",), (2, "value",),
-    AVS_GetAnalogIn = prototype(("AVS_GetAnalogIn", lib), paramflags)
+    AVS_GetAnalogIn = _bind("AVS_GetAnalogIn", ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.POINTER(ctypes.c_float), paramflags=paramflags)
     ret = AVS_GetAnalogIn(handle, portId)
     return ret
 
@@ -581,9 +658,8 @@ def AVS_SetAnalogOut(handle, portId, value):
     :param value: the value of the analog output in Volts (0 - 5.0V) 
     :return: SUCCESS = 0 or FAILURE <> 0 
     """      
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.c_float)
     paramflags = (1, "handle",), (1, "portId",), (1, "value",),
-    AVS_SetAnalogOut = prototype(("AVS_SetAnalogOut", lib), paramflags)
+    AVS_SetAnalogOut = _bind("AVS_SetAnalogOut", ctypes.c_int, ctypes.c_int, ctypes.c_uint8, ctypes.c_float, paramflags=paramflags)
     ret = AVS_SetAnalogOut(handle, portId, value)
     return ret
 
@@ -595,12 +671,11 @@ def AVS_GetParameter(handle, size = 63484):
     :param size: size in bytes allocated to store DeviceConfigType
     :return: DeviceConfigType structure containing spectrometer configuration data
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(DeviceConfigType))
     paramflags = (1, "handle",), (1, "size",), (2, "reqsize",), (2, "deviceconfig",),
-    AVS_GetParameter = prototype(("AVS_GetParameter", lib), paramflags)
+    AVS_GetParameter = _bind("AVS_GetParameter", ctypes.c_int, ctypes.c_int, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(DeviceConfigType), paramflags=paramflags)
     ret = AVS_GetParameter(handle, size)
     if ret[0] != size:
-        ret = AVS_GetParameter(ret[0])
+        ret = AVS_GetParameter(handle, ret[0])
     return ret[1]
 
 def AVS_SetParameter(handle, deviceconfig):
@@ -612,9 +687,8 @@ def AVS_SetParameter(handle, deviceconfig):
     :param deviceconfig: the DeviceConfigType structure that will be sent to the spectrometer
     :return: SUCCESS = 0 or FAILURE <> 0 
     """   
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(DeviceConfigType))
-    paramflags = (1, "handle",), (1, "deviceconfig",),  
-    AVS_SetParameter = prototype(("AVS_SetParameter", lib), paramflags)
+    paramflags = (1, "handle",), (1, "deviceconfig",),
+    AVS_SetParameter = _bind("AVS_SetParameter", ctypes.c_int, ctypes.c_int, ctypes.POINTER(DeviceConfigType), paramflags=paramflags)
     ret = AVS_SetParameter(handle, deviceconfig)
     return ret
 
@@ -626,9 +700,8 @@ def AVS_ResetParameter(handle):
     :param handle: the AvsHandle of the spectrometer
     :return: SUCCESS = 0 or FAILURE <> 0 
     """       
-    prototype = func(ctypes.c_int, ctypes.c_int)
     paramflags = (1, "handle",),
-    AVS_ResetParameter = prototype(("AVS_ResetParameter", lib), paramflags)
+    AVS_ResetParameter = _bind("AVS_ResetParameter", ctypes.c_int, ctypes.c_int, paramflags=paramflags)
     ret = AVS_ResetParameter(handle)
     return ret 
 
@@ -644,9 +717,8 @@ def AVS_SetSyncMode(handle, enable):
     :param enable: Boolean, 0 disables sync mode, 1 enables sync mode
     :return: SUCCESS = 0 or FAILURE <> 0 
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_bool)
     paramflags = (1, "handle",), (1, "enable",),
-    AVS_SetSyncMode = prototype(("AVS_SetSyncMode", lib), paramflags)
+    AVS_SetSyncMode = _bind("AVS_SetSyncMode", ctypes.c_int, ctypes.c_int, ctypes.c_bool, paramflags=paramflags)
     ret = AVS_SetSyncMode(handle, enable)
     return ret
 
@@ -657,9 +729,8 @@ def AVS_GetDeviceType(handle):
     :param handle: the AvsHandle of the spectrometer
     :return: integer value, 0=unknown, 1=AS5216, 2=ASMINI, 3=AS7010
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_byte))
     paramflags = (1, "handle",), (2, "devicetype",),
-    AVS_GetDeviceType = prototype(("AVS_GetDeviceType",lib), paramflags)
+    AVS_GetDeviceType = _bind("AVS_GetDeviceType", ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_byte), paramflags=paramflags)
     ret = AVS_GetDeviceType(handle)
     return ret 
 
@@ -671,9 +742,8 @@ def AVS_GetDetectorName(handle, SensorType):
     :param Sensortype: byte value that defines the detector type, part of the Device Configuration
     :return: Detector name, encoded in c_char, a null terminated string
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_byte, ctypes.c_char * DETECTOR_NAME_LEN)
-    paramflags = (1, "handle",), (1, "SensorType",), (2, "SensorName",), 
-    AVS_GetDetectorName = prototype(("AVS_GetDetectorName", lib), paramflags) 
+    paramflags = (1, "handle",), (1, "SensorType",), (2, "SensorName",),
+    AVS_GetDetectorName = _bind("AVS_GetDetectorName", ctypes.c_int, ctypes.c_int, ctypes.c_byte, ctypes.c_char * DETECTOR_NAME_LEN, paramflags=paramflags)
     ret = AVS_GetDetectorName(handle, SensorType)
     return ret 
 
@@ -684,9 +754,8 @@ def AVS_SetSensitivityMode(handle, enable):
     :param handle: AvsHandle of the spectrometer.
     :param enable: unsigned integer, 0 sets LowNoise mode, 1 sets HighSensitivity mode 
     """
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_uint32)
     paramflags = (1, "handle",), (1, "enable",),
-    AVS_SetSensitivityMode = prototype(("AVS_SetSensitivityMode", lib), paramflags)
+    AVS_SetSensitivityMode = _bind("AVS_SetSensitivityMode", ctypes.c_int, ctypes.c_int, ctypes.c_uint32, paramflags=paramflags)
     ret = AVS_SetSensitivityMode(handle, enable)
     return ret
 
@@ -697,9 +766,8 @@ def AVS_SetPrescanMode(handle, enable):
     :param handle: AvsHandle of the spectrometer.
     :param enable: boolean, 0 sets ClearBuffer mode, 1 sets PreScan mode (default mode)
     """    
-    prototype = func(ctypes.c_int, ctypes.c_int, ctypes.c_bool)
     paramflags = (1, "handle",), (1, "enable",),
-    AVS_SetPrescanMode = prototype(("AVS_SetPrescanMode", lib), paramflags)
+    AVS_SetPrescanMode = _bind("AVS_SetPrescanMode", ctypes.c_int, ctypes.c_int, ctypes.c_bool, paramflags=paramflags)
     ret = AVS_SetPrescanMode(handle, enable)
     return ret
 
@@ -710,9 +778,8 @@ def AVS_ResetDevice(handle):
     :param handle: AvsHandle of the spectrometer.
     :return: SUCCESS = 0 or FAILURE <> 0
     """     
-    prototype = func(ctypes.c_int, ctypes.c_int)
     paramflags = (1, "handle",),
-    AVS_ResetDevice = prototype(("AVS_ResetDevice", lib), paramflags)
+    AVS_ResetDevice = _bind("AVS_ResetDevice", ctypes.c_int, ctypes.c_int, paramflags=paramflags)
     ret = AVS_ResetDevice(handle)
     return ret
 
@@ -724,8 +791,10 @@ def AVS_EnableLogging(enable):
     :param enable: Boolean, True enables logging, False disables logging
     :return: True = 1
     """    
-    prototype = func(ctypes.c_int, ctypes.c_bool)
     paramflags = (1, "enable",),
-    AVS_EnableLogging = prototype(("AVS_EnableLogging", lib), paramflags)
+    AVS_EnableLogging = _bind("AVS_EnableLogging", ctypes.c_int, ctypes.c_bool, paramflags=paramflags)
     ret = AVS_EnableLogging(enable)    
-    return ret    
\ No newline at end of file
+    return ret
+
+if BACKEND == "sim":
+    from avaspec_sim import *
@@ -0,0 +1,493 @@
+"""
+avaspec_sim.py  –  software-emulated AvaSpec spectrometer(s)
+
+Implements the AVS_* functions used by this application on top of simulated
+devices, so the acquisition stack can be imported, profiled and load-tested
+without libavs or an instrument. Enabled with AVASPEC_BACKEND=sim, in which
+case avaspec.py re-exports everything below in place of the library wrappers.
+
+Spectra are a solar-like continuum with absorption lines, scaled linearly with
+integration time on top of a dark offset, with shot and read noise, averaging
+quantisation and saturation at ADC full scale. Scans are produced on a worker
+thread at integration_time * averages + readout_ms, and errors, lost scans and
+DSTR FIFO overflows can be injected. Call configure() before AVS_Init().
+"""
+
+import ctypes
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from avaspec import (
+    AvsIdentityType,
+    DeviceConfigType,
+    DstrStatusType,
+    SpectrumArrayType,
+    SaturatedArrayType,
+    AVS_SERIAL_LEN,
+    MAX_NR_PIXELS,
+    INVALID_AVS_HANDLE_VALUE,
+    DSTR_STATUS_DSS_MASK,
+    DSTR_STATUS_FOE_MASK,
+    TRIGGER_HARDWARE,
+    TRIGGER_SOURCE_SYNC,
+)
+
+__all__ = [
+    "configure", "SIM_CONFIG", "sim_device",
+    "AVS_Init", "AVS_Done", "AVS_GetNrOfDevices", "AVS_UpdateUSBDevices", "AVS_GetList",
+    "AVS_Activate", "AVS_GetHandleFromSerial", "AVS_Deactivate", "AVS_UseHighResAdc",
+    "AVS_GetVersionInfo", "AVS_PrepareMeasure", "AVS_Measure", "AVS_MeasureCallback",
+    "AVS_SetDstrStatusCallback", "AVS_GetDstrStatus", "AVS_StopMeasure", "AVS_PollScan",
+    "AVS_GetScopeData", "AVS_GetScopeDataInto", "AVS_GetSaturatedPixels",
+    "AVS_GetSaturatedPixelsInto", "AVS_GetLambda", "AVS_GetLambdaInto", "AVS_GetNumPixels",
+    "AVS_GetParameter", "AVS_SetSyncMode",
+]
+
+ERR_SUCCESS = 0
+ERR_INVALID_PARAMETER = -1
+ERR_INVALID_DEVICE_ID = -4
+ERR_INVALID_MEAS_DATA = -8
+ERR_NO_SPECTRA_IN_RAM = -17
+ERR_INVALID_STATE = -21
+
+SIM_CONFIG = {
+    "devices": 1,               # number of spectrometers reported by AVS_UpdateUSBDevices
+    "npix": 2048,
+    "serial_prefix": "SIM",
+    "wl_fit": (280.0, 0.135, -5.0e-6, 0.0, 0.0),  # wavelength = sum(fit[i] * pixel**i)
+    "peak_rate": 40.0,          # counts per ms at the brightest pixel
+    "dark_counts": 600.0,
+    "read_noise": 4.0,          # counts rms per raw scan
+    "variability": 0.0,         # relative amplitude of a slow intensity modulation
+    "variability_period_s": 30.0,
+    "readout_ms": 1.2,          # dead time per scan on top of integration * averages
+    "max_scan_rate_hz": 0.0,    # 0 = limited only by integration and readout
+    "error_rate": 0.0,          # probability a scan is announced with ERR_INVALID_MEAS_DATA
+    "drop_rate": 0.0,           # probability a scan never reaches the host
+    "dstr_fifo_scans": 1000,    # device RAM capacity in DSTR mode
+    "seed": None,
+}
+
+_devices = []
+
+
+def configure(**kwargs):
+    """Update SIM_CONFIG; takes effect at the next AVS_Init()."""
+    for key in kwargs:
+        if key not in SIM_CONFIG:
+            raise ValueError(f"Unknown simulator option: {key}")
+    SIM_CONFIG.update(kwargs)
+
+
+class _SimDevice(object):
+    def __init__(self, index, cfg, rng):
+        self.index = index
+        self.handle = index + 1
+        self.serial = f"{cfg['serial_prefix']}{index:06d}"[:AVS_SERIAL_LEN - 1]
+        self.cfg = cfg
+        self.rng = rng
+        self.npix = int(cfg["npix"])
+        self.full_scale = 16383.0
+        self.active = False
+        self.sync_master = False
+        # Prepared to start scans on the sync input (hardware trigger, sync source)
+        self.sync_trigger = False
+
+        px = np.arange(self.npix, dtype=np.float64)
+        self.wavelengths = np.zeros(MAX_NR_PIXELS, dtype=np.float64)
+        self.wavelengths[:self.npix] = sum(c * px ** i for i, c in enumerate(cfg["wl_fit"]))
+        self.shape = self._solar_shape(self.wavelengths[:self.npix])
+
+        self.integration_ms = None
+        self.averages = 1
+        self.start_pixel = 0
+        self.stop_pixel = self.npix - 1
+
+        # Scan produced most recently (non-DSTR) and the DSTR FIFO
+        self._lock = threading.Lock()
+        self._spectrum = np.zeros(MAX_NR_PIXELS, dtype=np.float64)
+        self._saturated = np.zeros(MAX_NR_PIXELS, dtype=np.uint8)
+        self._timelabel = 0
+        self._new_data = False
+        self._fifo = deque()
+        self._fifo_overflow = False
+        # Scratch arrays reused for every scan
+        self._mean = np.empty(self.npix, dtype=np.float64)
+        self._noise = np.empty(self.npix, dtype=np.float64)
+        self._gauss = np.empty(self.npix, dtype=np.float64)
+        self._sat = np.empty(self.npix, dtype=bool)
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._started = threading.Event()
+        self._t0 = 0.0
+        self._period = 0.0
+        self._t_power_on = time.perf_counter()
+        self._cb = None
+        self._dstr_cb = None
+        self._dstr = False
+        self._p_handle = ctypes.pointer(ctypes.c_int(self.handle))
+        self._p_status = ctypes.pointer(ctypes.c_int(0))
+        self._p_dstr_status = ctypes.pointer(ctypes.c_uint(0))
+
+    @staticmethod
+    def _solar_shape(wl):
+        # Planck curve at 5800 K times a few Fraunhofer lines and a detector response
+        h, c, k = 6.626e-34, 2.998e8, 1.381e-23
+        lam = np.clip(wl, 1.0, None) * 1e-9
+        planck = 1.0 / (lam ** 5 * (np.exp(h * c / (lam * k * 5800.0)) - 1.0))
+        for center, depth, width in ((393.4, 0.8, 1.2), (396.8, 0.75, 1.2), (430.8, 0.4, 0.8),
+                                     (486.1, 0.5, 0.6), (518.4, 0.3, 0.6), (527.0, 0.25, 0.5)):
+            planck *= 1.0 - depth * np.exp(-0.5 * ((wl - center) / width) ** 2)
+        response = np.exp(-0.5 * ((wl - 450.0) / 120.0) ** 2)
+        shape = planck * response
+        return shape / shape.max()
+
+    # -- measurement -------------------------------------------------------
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, cb, nummeas, master=None):
+        if self.integration_ms is None:
+            return ERR_INVALID_STATE
+        if self.running():
+            return ERR_INVALID_STATE
+        self._cb = cb
+        self._dstr = (nummeas == -2)
+        self._stop.clear()
+        self._started.clear()
+        with self._lock:
+            self._fifo.clear()
+            self._fifo_overflow = False
+            self._new_data = False
+        self._thread = threading.Thread(target=self._run, args=(nummeas, master), daemon=True)
+        self._thread.start()
+        return ERR_SUCCESS
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(2.0)
+        self._thread = None
+        # Slaves started before the next run must wait for its clock, not this one's
+        self._started.clear()
+        return ERR_SUCCESS
+
+    def _run(self, nummeas, master):
+        period = (self.integration_ms * self.averages + self.cfg["readout_ms"]) / 1000.0
+        if self.cfg["max_scan_rate_hz"]:
+            period = max(period, 1.0 / self.cfg["max_scan_rate_hz"])
+        if master is not None:
+            # Slave in sync mode: scans are triggered by the master's clock
+            while not master._started.wait(0.05):
+                if self._stop.is_set():
+                    return
+            t0, period = master._t0, master._period
+        else:
+            t0 = time.perf_counter()
+        self._t0, self._period = t0, period
+        self._started.set()
+        remaining = nummeas if nummeas > 0 else -1
+        k = 0
+        while not self._stop.is_set() and remaining != 0:
+            k += 1
+            deadline = t0 + k * period
+            delay = deadline - time.perf_counter()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            if remaining > 0:
+                remaining -= 1
+            timelabel = int((deadline - self._t_power_on) * 1e5) & 0xFFFFFFFF
+            if self.rng.random() < self.cfg["drop_rate"]:
+                continue
+            if self.rng.random() < self.cfg["error_rate"]:
+                self._announce(ERR_INVALID_MEAS_DATA)
+                continue
+            self._produce(deadline, timelabel)
+        if self._dstr:
+            self._dstr_event(DSTR_STATUS_DSS_MASK)
+
+    def _produce(self, t, timelabel):
+        cfg = self.cfg
+        level = 1.0
+        if cfg["variability"]:
+            level += cfg["variability"] * np.sin(2.0 * np.pi * t / cfg["variability_period_s"])
+        n = self.averages
+        mean, noise = self._mean, self._noise
+        # counts = dark + rate * t_int, shot noise on the signal plus read noise
+        np.multiply(self.shape, cfg["peak_rate"] * level * self.integration_ms, out=mean)
+        np.add(mean, cfg["read_noise"] ** 2, out=noise)
+        np.sqrt(noise, out=noise)
+        mean += cfg["dark_counts"]
+        self.rng.standard_normal(out=self._gauss)
+        noise *= self._gauss
+        noise /= np.sqrt(n)
+        noise += mean
+        # Average of n integer-valued raw scans, clipped at ADC full scale
+        noise *= n
+        np.rint(noise, out=noise)
+        noise /= n
+        np.greater_equal(noise, self.full_scale, out=self._sat)
+        np.clip(noise, 0.0, self.full_scale, out=noise)
+        if self._dstr:
+            with self._lock:
+                if len(self._fifo) >= cfg["dstr_fifo_scans"]:
+                    overflow = not self._fifo_overflow
+                    self._fifo_overflow = True
+                else:
+                    overflow = False
+                    self._fifo.append((timelabel, noise.copy(), self._sat.copy()))
+            if overflow:
+                self._dstr_event(DSTR_STATUS_FOE_MASK)
+                return
+        else:
+            with self._lock:
+                self._spectrum[:self.npix] = noise
+                self._saturated[:self.npix] = self._sat
+                self._timelabel = timelabel
+                self._new_data = True
+        self._announce(ERR_SUCCESS)
+
+    def _announce(self, status):
+        if self._cb is None:
+            return
+        self._p_status[0] = status
+        self._cb.callback(self._p_handle, self._p_status)
+
+    def _dstr_event(self, flags):
+        if self._dstr_cb is None:
+            return
+        self._p_dstr_status[0] = flags
+        self._dstr_cb.callback(self._p_handle, self._p_dstr_status)
+
+    # -- host reads ----------------------------------------------------------
+
+    def read_scan(self, spectrum, saturated=None):
+        """Copy the next scan into the given arrays; returns (error, timelabel)."""
+        with self._lock:
+            if self._dstr:
+                if not self._fifo:
+                    return ERR_NO_SPECTRA_IN_RAM, 0
+                timelabel, data, sat = self._fifo.popleft()
+                self._fifo_overflow = False
+                spectrum[:self.npix] = data
+                self._saturated[:self.npix] = sat
+            else:
+                timelabel = self._timelabel
+                spectrum[:self.npix] = self._spectrum[:self.npix]
+                self._new_data = False
+        return ERR_SUCCESS, timelabel
+
+    def poll(self):
+        with self._lock:
+            return bool(self._fifo) if self._dstr else self._new_data
+
+
+def _device(handle):
+    if 1 <= handle <= len(_devices) and _devices[handle - 1].active:
+        return _devices[handle - 1]
+    return None
+
+
+def sim_device(handle):
+    """Simulator object behind an activated handle (for tests and benchmarks), or None."""
+    return _device(handle)
+
+
+def AVS_Init(a_Port = 0):
+    AVS_Done()
+    rng = np.random.default_rng(SIM_CONFIG["seed"])
+    cfg = dict(SIM_CONFIG)
+    for i in range(int(cfg["devices"])):
+        _devices.append(_SimDevice(i, cfg, np.random.default_rng(rng.integers(1 << 32))))
+    return len(_devices)
+
+def AVS_Done():
+    for dev in _devices:
+        dev.stop()
+    del _devices[:]
+    return ERR_SUCCESS
+
+def AVS_GetNrOfDevices():
+    return len(_devices)
+
+def AVS_UpdateUSBDevices():
+    return len(_devices)
+
+def AVS_GetList(spectrometers = 1):
+    id_list = (AvsIdentityType * len(_devices))()
+    for ident, dev in zip(id_list, _devices):
+        ident.SerialNumber = dev.serial.encode()
+        ident.UserFriendlyName = f"Simulated {dev.index}".encode()
+        ident.Status = b'\x02' if dev.active else b'\x01'
+    return id_list
+
+def AVS_Activate(deviceId):
+    serial = bytes(deviceId.SerialNumber).split(b"\x00")[0].decode()
+    return AVS_GetHandleFromSerial(serial)
+
+def AVS_GetHandleFromSerial(deviceSerial):
+    if isinstance(deviceSerial, bytes):
+        deviceSerial = deviceSerial.decode()
+    for dev in _devices:
+        if dev.serial == deviceSerial.strip():
+            dev.active = True
+            return dev.handle
+    return INVALID_AVS_HANDLE_VALUE
+
+def AVS_Deactivate(handle):
+    dev = _device(handle)
+    if dev is None:
+        return False
+    dev.stop()
+    dev.active = False
+    return True
+
+def AVS_UseHighResAdc(handle, enable):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    dev.full_scale = 65535.0 if enable else 16383.0
+    return ERR_SUCCESS
+
+def AVS_GetVersionInfo(handle):
+    return b"SIM-FPGA", b"SIM-FW", b"SIM-DLL"
+
+def AVS_PrepareMeasure(handle, measconf):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    if measconf.m_IntegrationTime <= 0 or measconf.m_NrAverages < 1:
+        return ERR_INVALID_PARAMETER
+    if measconf.m_StopPixel >= dev.npix or measconf.m_StartPixel > measconf.m_StopPixel:
+        return ERR_INVALID_PARAMETER
+    dev.integration_ms = float(measconf.m_IntegrationTime)
+    dev.averages = int(measconf.m_NrAverages)
+    dev.start_pixel = measconf.m_StartPixel
+    dev.stop_pixel = measconf.m_StopPixel
+    dev.sync_trigger = (measconf.m_Trigger_m_Mode == TRIGGER_HARDWARE
+                        and measconf.m_Trigger_m_Source == TRIGGER_SOURCE_SYNC)
+    return ERR_SUCCESS
+
+def _sync_master_for(dev):
+    # Only a device waiting on its sync input follows the master; others free-run
+    if not dev.sync_trigger:
+        return None
+    for other in _devices:
+        if other is not dev and other.active and other.sync_master:
+            return other
+    return None
+
+def AVS_Measure(handle, windowhandle, nummeas):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    return dev.start(None, nummeas, _sync_master_for(dev))
+
+def AVS_MeasureCallback(handle, cb, nummeas):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    return dev.start(cb, nummeas, _sync_master_for(dev))
+
+def AVS_SetDstrStatusCallback(handle, cb):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    dev._dstr_cb = cb
+    return ERR_SUCCESS
+
+def AVS_GetDstrStatus(handle):
+    status = DstrStatusType()
+    dev = _device(handle)
+    if dev is not None:
+        with dev._lock:
+            status.m_TotalScans = int(dev.cfg["dstr_fifo_scans"])
+            status.m_UsedScans = len(dev._fifo)
+            status.m_IsOverflowEvent = int(dev._fifo_overflow)
+    return status
+
+def AVS_StopMeasure(handle):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    return dev.stop()
+
+def AVS_PollScan(handle):
+    dev = _device(handle)
+    return dev is not None and dev.poll()
+
+def AVS_GetScopeData(handle):
+    spectrum = SpectrumArrayType()
+    dev = _device(handle)
+    if dev is None:
+        return 0, spectrum
+    _, timelabel = dev.read_scan(np.ctypeslib.as_array(spectrum))
+    return timelabel, spectrum
+
+def AVS_GetScopeDataInto(handle, buf):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    err, timelabel = dev.read_scan(buf.spectrum)
+    buf.c_timelabel.value = timelabel
+    return err
+
+def AVS_GetSaturatedPixels(handle):
+    saturated = SaturatedArrayType()
+    dev = _device(handle)
+    if dev is not None:
+        with dev._lock:
+            ctypes.memmove(saturated, dev._saturated.ctypes.data, MAX_NR_PIXELS)
+    return saturated
+
+def AVS_GetSaturatedPixelsInto(handle, buf):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    with dev._lock:
+        buf.saturated[:] = dev._saturated
+    return ERR_SUCCESS
+
+def AVS_GetLambda(handle):
+    wavelength = SpectrumArrayType()
+    dev = _device(handle)
+    if dev is not None:
+        np.ctypeslib.as_array(wavelength)[:] = dev.wavelengths
+    return wavelength
+
+def AVS_GetLambdaInto(handle, wavelength):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    np.ctypeslib.as_array(wavelength)[:] = dev.wavelengths
+    return ERR_SUCCESS
+
+def AVS_GetNumPixels(handle):
+    dev = _device(handle)
+    return dev.npix if dev is not None else 0
+
+def AVS_GetParameter(handle, size = 63484):
+    dev = _device(handle)
+    if dev is None:
+        return None
+    cfg = DeviceConfigType()
+    cfg.m_Len = ctypes.sizeof(DeviceConfigType)
+    cfg.m_aUserFriendlyId = f"Simulated {dev.index}".encode()
+    cfg.m_Detector_m_NrPixels = dev.npix
+    for i, c in enumerate(dev.cfg["wl_fit"][:5]):
+        cfg.m_Detector_m_aFit[i] = c
+    cfg.m_StandAlone_m_Meas_m_StartPixel = 0
+    cfg.m_StandAlone_m_Meas_m_StopPixel = dev.npix - 1
+    return cfg
+
+def AVS_SetSyncMode(handle, enable):
+    dev = _device(handle)
+    if dev is None:
+        return ERR_INVALID_DEVICE_ID
+    dev.sync_master = bool(enable)
+    return ERR_SUCCESS
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join("data", "device_cache")
+
+
+def config_hash(raw_config):
+    """Short digest of the raw DeviceConfigType bytes; changes whenever the EEPROM does."""
+    return hashlib.sha1(bytes(raw_config)).hexdigest()[:16]
+
+
+class DeviceCalibration(object):
+    """
+    Cached parameters and wavelength axis of one spectrometer configuration.
+
+    `wavelengths` and `raw_config` are read-only memory maps of the cache files,
+    so opening a calibration costs no parsing and no copy.
+    """
+
+    def __init__(self, serial, digest, wavelengths, raw_config, meta):
+        self.serial = serial
+        self.config_hash = digest
+        self.wavelengths = wavelengths
+        self.raw_config = raw_config
+        self.num_pixels = int(meta["num_pixels"])
+        self.start_pixel = int(meta.get("start_pixel", 0))
+        self.stop_pixel = int(meta.get("stop_pixel", self.num_pixels - 1))
+        self.created = meta.get("created")
+
+    def device_config(self):
+        """The cached DeviceConfigType, parsed on demand."""
+        from drivers.spectrometer import DeviceConfigType
+        return DeviceConfigType.from_buffer_copy(self.raw_config)
+
+
+class DeviceCache(object):
+    """
+    On-disk store of DeviceCalibrations, one directory per serial number and
+    configuration hash:
+
+        <root>/<serial>/<hash>/wavelengths.npy     float64, num_pixels values
+        <root>/<serial>/<hash>/device_config.bin   raw DeviceConfigType
+        <root>/<serial>/<hash>/meta.json
+        <root>/<serial>/latest                     hash of the newest entry
+
+    latest() lets other tools read a wavelength axis without the hardware.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+
+    def _entry_dir(self, serial, digest):
+        return os.path.join(self.root, serial, digest)
+
+    def lookup(self, serial, digest):
+        """The calibration stored for this serial and configuration hash, or None."""
+        path = self._entry_dir(serial, digest)
+        try:
+            with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            wavelengths = np.load(os.path.join(path, "wavelengths.npy"), mmap_mode="r")
+            raw_config = np.memmap(os.path.join(path, "device_config.bin"), dtype=np.uint8, mode="r")
+        except (OSError, ValueError):
+            return None
+        if wavelengths.shape[0] != meta.get("num_pixels"):
+            return None
+        return DeviceCalibration(serial, digest, wavelengths, raw_config, meta)
+
+    def latest(self, serial):
+        """The most recently stored calibration of `serial`, or None."""
+        try:
+            with open(os.path.join(self.root, serial, "latest"), "r", encoding="utf-8") as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+        return self.lookup(serial, digest)
+
+    def store(self, serial, digest, raw_config, wavelengths, num_pixels, start_pixel=0, stop_pixel=None):
+        """Write a calibration and return it memory-mapped from the cache."""
+        path = self._entry_dir(serial, digest)
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            "serial": serial,
+            "config_hash": digest,
+            "num_pixels": int(num_pixels),
+            "start_pixel": int(start_pixel),
+            "stop_pixel": int(num_pixels - 1 if stop_pixel is None else stop_pixel),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        wls = np.asarray(wavelengths, dtype=np.float64)[:num_pixels]
+        # Data files first and meta.json last, each via rename, so a half-written
+        # entry is never picked up
+        self._write_atomic(os.path.join(path, "wavelengths.npy"), lambda f: np.save(f, wls))
+        self._write_atomic(os.path.join(path, "device_config.bin"), lambda f: f.write(bytes(raw_config)))
+        self._write_atomic(os.path.join(path, "meta.json"),
+                           lambda f: f.write(json.dumps(meta, indent=2).encode("utf-8")))
+        self._write_atomic(os.path.join(self.root, serial, "latest"), lambda f: f.write(digest.encode()))
+        return self.lookup(serial, digest)
+
+    @staticmethod
+    def _write_atomic(path, write):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
@@ -0,0 +1,165 @@
+import threading
+import time
+
+from drivers.spectrometer import (
+    AVS_MeasureCallback,
+    AVS_MeasureCallbackFunc,
+    AVS_SetDstrStatusCallback,
+    AVS_DstrCallbackFunc,
+    AVS_GetDstrStatus,
+    AVS_GetScopeDataInto,
+    AVS_StopMeasure,
+    ScopeBuffer,
+    DSTR_STATUS_DSS_MASK,
+    DSTR_STATUS_FOE_MASK,
+    DSTR_STATUS_IERR_MASK,
+)
+from drivers.latency import LatencyMeter
+
+DSTR_NUM_MEAS = -2  # nummeas value that starts Dynamic StoreToRam
+
+
+class DstrAcquisition(object):
+    """
+    High-rate acquisition using Dynamic StoreToRam.
+
+    The device buffers scans in its own RAM and the library hands them over in
+    order. The measurement callback only counts announced scans; a worker
+    thread drains them in bulk with AVS_GetScopeDataInto into the ring buffer,
+    so the library thread never waits on Python-side processing.
+
+    FIFO overflow (FOE) and internal error (IERR) events reported through the
+    DSTR status callback are counted in `overflow_events` and `internal_errors`.
+    Latency from scan-ready (device timelabel) to stored is tracked in
+    `latency`; it includes the time a scan waited in the device FIFO.
+    """
+
+    def __init__(self, handle, ring, integration_ms, averages=1, on_scan=None, on_event=None, latency=None):
+        self.handle = handle
+        self.ring = ring
+        self.integration_ms = integration_ms
+        self.averages = averages
+        self.on_scan = on_scan      # called with the sequence number of each stored scan
+        self.on_event = on_event    # called with a short message on FOE/IERR/stop events
+        self.latency = latency if latency is not None else LatencyMeter()
+        self._scope = ScopeBuffer()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        # Keep references to the ctypes callbacks for as long as the library may call them
+        self._measure_cb = None
+        self._status_cb = None
+
+        self.scans_received = 0
+        self.scan_errors = 0
+        self.read_errors = 0
+        self.overflow_events = 0
+        self.internal_errors = 0
+        self.stop_events = 0
+        self.max_pending = 0
+        self.device_used_scans = 0
+
+    def start(self):
+        """Register callbacks, start the drain worker and start DSTR. Returns the AVS error code."""
+        self._stop.clear()
+        self._status_cb = AVS_DstrCallbackFunc(self._on_status)
+        err = AVS_SetDstrStatusCallback(self.handle, self._status_cb)
+        if err != 0:
+            return err
+        self._worker = threading.Thread(target=self._drain, daemon=True)
+        self._worker.start()
+        self._measure_cb = AVS_MeasureCallbackFunc(self._on_measure)
+        err = AVS_MeasureCallback(self.handle, self._measure_cb, DSTR_NUM_MEAS)
+        if err != 0:
+            self.shutdown()
+        return err
+
+    def stop(self):
+        """Stop the measurement on the device and drain what is left."""
+        AVS_StopMeasure(self.handle)
+        self.shutdown()
+
+    def shutdown(self, timeout=2.0):
+        """Stop the worker once all announced scans have been read."""
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+
+    def stats(self):
+        st = {
+            "scans_received": self.scans_received,
+            "scan_errors": self.scan_errors,
+            "read_errors": self.read_errors,
+            "overflow_events": self.overflow_events,
+            "internal_errors": self.internal_errors,
+            "stop_events": self.stop_events,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "device_used_scans": self.device_used_scans,
+        }
+        st.update(self.latency.stats())
+        return st
+
+    # -- library threads --------------------------------------------------
+
+    def _on_measure(self, p_data, p_user):
+        if p_user[0] != 0:
+            self.scan_errors += 1
+            return
+        with self._pending_lock:
+            self._pending += 1
+            if self._pending > self.max_pending:
+                self.max_pending = self._pending
+        self._wake.set()
+
+    def _on_status(self, p_data, p_status):
+        flags = p_status[0]
+        if flags & DSTR_STATUS_FOE_MASK:
+            self.overflow_events += 1
+            self._notify("DSTR FIFO overflow, scans were lost")
+        if flags & DSTR_STATUS_IERR_MASK:
+            self.internal_errors += 1
+            self._notify("DSTR internal error")
+        if flags & DSTR_STATUS_DSS_MASK:
+            self.stop_events += 1
+            self._wake.set()
+
+    # -- worker thread ----------------------------------------------------
+
+    def _drain(self):
+        while True:
+            self._wake.wait(0.1)
+            self._wake.clear()
+            with self._pending_lock:
+                batch = self._pending
+            for _ in range(batch):
+                if AVS_GetScopeDataInto(self.handle, self._scope) != 0:
+                    self.read_errors += 1
+                    continue
+                seq = self.ring.push(self._scope.spectrum, self._scope.timelabel,
+                                     self.integration_ms, self.averages)
+                self.latency.record(self._scope.timelabel, time.perf_counter())
+                self.scans_received += 1
+                if self.on_scan is not None:
+                    self.on_scan(seq)
+            if batch:
+                with self._pending_lock:
+                    self._pending -= batch
+                self._sample_device_fill()
+            elif self._stop.is_set():
+                return
+
+    def _sample_device_fill(self):
+        try:
+            status = AVS_GetDstrStatus(self.handle)
+            self.device_used_scans = status.m_UsedScans
+        except Exception:
+            pass
+
+    def _notify(self, msg):
+        if self.on_event is not None:
+            self.on_event(msg)
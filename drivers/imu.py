@@ -1,6 +1,12 @@
+import math
 import struct
 import threading
 
+def _ddmm_to_degrees(raw):
+    """WitMotion position field (ddmm.mmmmm x 1e5) to decimal degrees."""
+    deg, minutes = divmod(abs(raw), 10000000)
+    return math.copysign(deg + minutes / 1e5 / 60.0, raw)
+
 def parse_imu_packet(packet: bytes):
     """Parse an 11-byte WitMotion IMU packet."""
     data_bytes = packet[2:10]
@@ -12,17 +18,18 @@ def parse_imu_packet(packet: bytes):
         yaw = yaw_raw / 32768.0 * 180.0
         return ("Angle", roll, pitch, yaw)
     elif packet_id == 0x56:
-        p_raw, t_raw, _, _ = struct.unpack('<hhHH', data_bytes)
-        return ("Pressure", p_raw / 100.0, t_raw / 100.0)
+        # Pressure (Pa) and altitude (cm), both int32
+        p_raw, _h_raw = struct.unpack('<ii', data_bytes)
+        return ("Pressure", p_raw / 100.0)
     elif packet_id == 0x57:
         try:
             lon_raw, lat_raw = struct.unpack('<ii', data_bytes)
-            return ("GPS", lat_raw / 1e7, lon_raw / 1e7)
+            return ("GPS", _ddmm_to_degrees(lat_raw), _ddmm_to_degrees(lon_raw))
         except:
             return ("GPS", None, None)
     elif packet_id == 0x51:
-        ax, ay, az, _ = struct.unpack('<hhhH', data_bytes)
-        return ("Accel", ax / 32768.0 * 16.0, ay / 32768.0 * 16.0, az / 32768.0 * 16.0)
+        ax, ay, az, t_raw = struct.unpack('<hhhh', data_bytes)
+        return ("Accel", ax / 32768.0 * 16.0, ay / 32768.0 * 16.0, az / 32768.0 * 16.0, t_raw / 100.0)
     elif packet_id == 0x52:
         gx, gy, gz, _ = struct.unpack('<hhhH', data_bytes)
         return ("Gyro", gx / 32768.0 * 2000.0, gy / 32768.0 * 2000.0, gz / 32768.0 * 2000.0)
@@ -31,7 +38,18 @@ def parse_imu_packet(packet: bytes):
         return ("Mag", mx / 32768.0 * 1000.0, my / 32768.0 * 1000.0, mz / 32768.0 * 1000.0)
     return ("Unknown", None)
 
-def read_from_imu(serial_obj, data_dict: dict, stop_event: threading.Event):
+# Telemetry channels published for each packet type, in value order
+IMU_CHANNELS = {
+    "Angle": ("Roll_deg", "Pitch_deg", "Yaw_deg"),
+    "Pressure": ("Pressure_hPa",),
+    "GPS": ("Latitude_deg", "Longitude_deg"),
+    "Accel": ("AccelX_g", "AccelY_g", "AccelZ_g", "Temperature_C"),
+    "Gyro": ("GyroX_dps", "GyroY_dps", "GyroZ_dps"),
+    "Mag": ("MagX_uT", "MagY_uT", "MagZ_uT"),
+}
+
+def read_from_imu(serial_obj, store, stop_event: threading.Event):
+    """Parse packets until stopped; each packet's values are published to `store` together."""
     buffer = []
     while serial_obj.is_open and not stop_event.is_set():
         byte = serial_obj.read()
@@ -43,23 +61,14 @@ def read_from_imu(serial_obj, data_dict: dict, stop_event: threading.Event):
                 packet = bytes(buffer[:11])
                 buffer = buffer[11:]
                 label, *vals = parse_imu_packet(packet)
-                if label == "Angle":
-                    data_dict["rpy"] = tuple(vals)
-                elif label == "Pressure":
-                    data_dict["pressure"], data_dict["temperature"] = vals
-                elif label == "GPS" and vals[0] is not None:
-                    data_dict["latitude"], data_dict["longitude"] = vals
-                elif label == "Accel":
-                    data_dict["accel"] = tuple(vals)
-                elif label == "Gyro":
-                    data_dict["gyro"] = tuple(vals)
-                elif label == "Mag":
-                    data_dict["mag"] = tuple(vals)
+                channels = IMU_CHANNELS.get(label)
+                if channels and vals[0] is not None:
+                    store.publish(dict(zip(channels, vals)))
             else:
                 buffer.pop(0)
 
-def start_imu_read_thread(serial_obj, data_dict: dict):
+def start_imu_read_thread(serial_obj, store):
     stop_event = threading.Event()
-    thread = threading.Thread(target=read_from_imu, args=(serial_obj, data_dict, stop_event), daemon=True)
+    thread = threading.Thread(target=read_from_imu, args=(serial_obj, store, stop_event), daemon=True)
     thread.start()
     return stop_event
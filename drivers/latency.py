@@ -0,0 +1,117 @@
+import numpy as np
+
+TIMELABEL_TICK_S = 1e-5    # AvaSpec timelabels count 10 us ticks
+TIMELABEL_WRAP = 1 << 32
+
+
+class LatencyReference(object):
+    """
+    Host-minus-device clock offset of one spectrometer, the zero point that
+    every engine's LatencyMeter is measured against.
+
+    host_time - device_time of a scan is the clock offset plus the time the
+    scan took to reach the host. The first `calibration_scans` scans recorded
+    through any meter sharing this reference calibrate it once: the lower
+    envelope of those offsets, fitted as a straight line so clock drift is
+    followed, is taken as the fastest possible hand-over. After that it is
+    fixed, so an engine's fixed overhead shows up in its latency instead of
+    cancelling out, and the engines can be compared. Until calibration is
+    complete the line is fitted to the scans seen so far.
+    """
+
+    def __init__(self, calibration_scans=512):
+        self.calibration_scans = calibration_scans
+        self._t = []
+        self._offsets = []
+        self._line = None       # (t0, offset at t0, drift in s/s)
+        self._last_timelabel = None
+        self._wraps = 0
+
+    @property
+    def calibrated(self):
+        return self._line is not None
+
+    def device_time(self, timelabel):
+        """Timelabel in seconds, unwrapped across every engine that used this device."""
+        if self._last_timelabel is not None and timelabel < self._last_timelabel - TIMELABEL_WRAP // 2:
+            self._wraps += 1
+        self._last_timelabel = timelabel
+        return (timelabel + self._wraps * TIMELABEL_WRAP) * TIMELABEL_TICK_S
+
+    def observe(self, t_host, offset):
+        if self._line is not None:
+            return
+        self._t.append(t_host)
+        self._offsets.append(offset)
+        if len(self._t) >= self.calibration_scans:
+            self._line = self._fit(self._t, self._offsets)
+            self._t, self._offsets = [], []
+
+    def offset_at(self, t_host):
+        """Reference offset at host time(s) `t_host`; None before the first scan."""
+        line = self._line if self._line is not None else self._fit(self._t, self._offsets)
+        if line is None:
+            return None
+        t0, offset0, drift = line
+        return offset0 + drift * (np.asarray(t_host) - t0)
+
+    @staticmethod
+    def _fit(t, offsets):
+        n = min(len(t), len(offsets))
+        if n == 0:
+            return None
+        t = np.asarray(t[:n], dtype=np.float64)
+        offsets = np.asarray(offsets[:n], dtype=np.float64)
+        # Slope through the minima of the two halves, then lowered onto the lowest sample
+        half = n // 2
+        drift = 0.0
+        if half >= 2:
+            a = int(np.argmin(offsets[:half]))
+            b = half + int(np.argmin(offsets[half:]))
+            if t[b] > t[a]:
+                drift = (offsets[b] - offsets[a]) / (t[b] - t[a])
+        t0 = t[0]
+        return t0, float((offsets - drift * (t - t0)).min()), drift
+
+
+class LatencyMeter(object):
+    """
+    Scan-ready to data-available latency of one engine, from device timelabels.
+
+    Every sample stores host_time - device_time; latency is its distance
+    above the device's LatencyReference. Meters of different engines (or
+    integration times) on the same device must share one reference for
+    their latencies to be comparable; a meter without one gets its own,
+    calibrated from its first scans. Statistics cover the last `capacity`
+    scans.
+    """
+
+    def __init__(self, capacity=4096, reference=None):
+        self.reference = reference if reference is not None else LatencyReference()
+        self._offsets = np.zeros(capacity, dtype=np.float64)
+        self._t_host = np.zeros(capacity, dtype=np.float64)
+        self._capacity = capacity
+        self.count = 0
+
+    def record(self, timelabel, t_host):
+        """Add one scan: its device timelabel and the host perf_counter() when it became available."""
+        offset = t_host - self.reference.device_time(timelabel)
+        i = self.count % self._capacity
+        self._offsets[i] = offset
+        self._t_host[i] = t_host
+        self.count += 1
+        self.reference.observe(t_host, offset)
+
+    def stats(self):
+        """Latency summary in microseconds over the current window (empty dict if no samples)."""
+        n = min(self.count, self._capacity)
+        if n == 0:
+            return {}
+        lat_us = (self._offsets[:n] - self.reference.offset_at(self._t_host[:n])) * 1e6
+        return {
+            "samples": n,
+            "mean_us": float(lat_us.mean()),
+            "p50_us": float(np.percentile(lat_us, 50)),
+            "p99_us": float(np.percentile(lat_us, 99)),
+            "max_us": float(lat_us.max()),
+        }
@@ -0,0 +1,373 @@
+import functools
+import queue
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import serial
+
+import utils
+
+READ_COILS = 0x01
+READ_DISCRETE_INPUTS = 0x02
+READ_HOLDING_REGISTERS = 0x03
+READ_INPUT_REGISTERS = 0x04
+WRITE_SINGLE_COIL = 0x05
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_COILS = 0x0F
+WRITE_MULTIPLE_REGISTERS = 0x10
+READ_WRITE_REGISTERS = 0x17
+
+EXCEPTION_CODES = {
+    0x01: "illegal function",
+    0x02: "illegal data address",
+    0x03: "illegal data value",
+    0x04: "slave device failure",
+    0x05: "acknowledge",
+    0x06: "slave device busy",
+    0x08: "memory parity error",
+    0x0A: "gateway path unavailable",
+    0x0B: "gateway target failed to respond",
+}
+
+# Port read timeout used by ModbusClient: the longest one read blocks, so
+# reply deadlines are kept to within this
+READ_SLICE_S = 0.005
+
+
+class ModbusError(OSError):
+    """A transaction failed: no reply, a corrupted reply or an exception response."""
+
+
+class ModbusTimeout(ModbusError):
+    """No complete reply within the response timeout."""
+
+
+class ModbusFrameError(ModbusError):
+    """Reply with a bad CRC, or one that does not answer the request."""
+
+
+class ModbusExceptionResponse(ModbusError):
+    """The slave answered with an exception code."""
+
+    def __init__(self, slave, function, code):
+        self.slave = slave
+        self.function = function
+        self.code = code
+        name = EXCEPTION_CODES.get(code, "unknown exception")
+        super().__init__(f"slave {slave} function 0x{function:02X}: exception {code} ({name})")
+
+
+def crc_bytes(data):
+    """Modbus CRC16 of `data` as the two bytes that end an RTU frame."""
+    return utils.modbus_crc16(data).to_bytes(2, "little")
+
+
+@functools.lru_cache(maxsize=256)
+def build_frame(slave, function, payload=b""):
+    """Complete RTU frame: address, function, payload and CRC (repeated requests are cached)."""
+    adu = bytes((slave, function)) + bytes(payload)
+    return adu + crc_bytes(adu)
+
+
+def check_crc(frame):
+    return len(frame) >= 4 and crc_bytes(frame[:-2]) == frame[-2:]
+
+
+def expected_length(function, payload):
+    """Length of the normal reply to a request, CRC included (an exception reply is 5 bytes)."""
+    if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+        return 5 + 2 * struct.unpack_from(">H", payload, 2)[0]
+    if function in (READ_COILS, READ_DISCRETE_INPUTS):
+        return 5 + (struct.unpack_from(">H", payload, 2)[0] + 7) // 8
+    if function in (WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER, WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS):
+        return 8
+    if function == READ_WRITE_REGISTERS:
+        return 5 + 2 * struct.unpack_from(">H", payload, 2)[0]
+    raise ValueError(f"reply length of function 0x{function:02X} is not known")
+
+
+def char_bits(serial_obj):
+    """Bits on the wire per character: start, data, parity and stop bits."""
+    parity = 0 if getattr(serial_obj, "parity", serial.PARITY_EVEN) == serial.PARITY_NONE else 1
+    return 1 + int(getattr(serial_obj, "bytesize", 8)) + parity + float(getattr(serial_obj, "stopbits", 1))
+
+
+def frame_gap(baudrate, bits=11):
+    """
+    Silent interval that delimits RTU frames: 3.5 character times, fixed at
+    1.75 ms above 19200 baud as the Modbus serial line specification says.
+    """
+    if baudrate > 19200:
+        return 0.00175
+    return 3.5 * bits / baudrate
+
+
+def write_registers_payload(address, values):
+    """Payload of a Write Multiple Registers (0x10) request."""
+    n = len(values)
+    return struct.pack(f">HHB{n}H", address, n, 2 * n, *[v & 0xFFFF for v in values])
+
+
+def int32_to_registers(values):
+    """Signed 32-bit values as register pairs, upper word first (AZ series order)."""
+    return list(struct.unpack(f">{2 * len(values)}H", struct.pack(f">{len(values)}i", *values)))
+
+
+def registers_to_int32(registers):
+    n = len(registers) // 2
+    return list(struct.unpack(f">{n}i", struct.pack(f">{2 * n}H", *registers[:2 * n])))
+
+
+def plan_reads(fields, max_gap=4, max_count=125):
+    """
+    Cover (address, words) fields with as few Read Holding Registers blocks
+    as possible. Fields closer than `max_gap` unused registers share a block
+    (reading a few spare words is cheaper than another round trip); a block
+    never exceeds `max_count` registers. Returns sorted (start, count) pairs.
+    """
+    blocks = []
+    for address, words in sorted(set(fields)):
+        if blocks:
+            start, count = blocks[-1]
+            end = max(start + count, address + words)
+            if address - (start + count) <= max_gap and end - start <= max_count:
+                blocks[-1] = (start, end - start)
+                continue
+        blocks.append((address, words))
+    return blocks
+
+
+class ModbusClient(object):
+    """
+    Modbus RTU master on one serial port.
+
+    All traffic goes through one worker thread that owns the port. submit()
+    queues a request and returns a concurrent.futures.Future, so several
+    callers (or one caller with several requests) never interleave frames,
+    and queued requests go out back to back separated only by the
+    inter-frame gap. The helpers (read_holding_registers, write_registers,
+    ...) submit and wait.
+
+    A reply is read frame-exactly: the first two bytes, then the rest of the
+    frame, whose length follows from the function code (5 bytes for an
+    exception). A good reply therefore returns as soon as its last byte
+    arrives. The reply must start within `timeout` of the end of the
+    request and be complete within `timeout` plus its transmit time at the
+    current baud rate, so long replies on slow links are not cut short; a
+    missing reply costs `timeout`. The port timeout is only the read slice
+    (READ_SLICE_S, set once if the port was opened with a longer one): reads
+    are repeated until the deadline, which therefore holds to within a
+    slice. Every request waits for the 3.5-character inter-frame gap after
+    the previous reply. Timeouts and
+    bad frames are retried `retries` times (after `latency_s` for late bytes
+    to arrive and be dropped); exception responses are raised as
+    ModbusExceptionResponse.
+    """
+
+    def __init__(self, serial_obj, slave=1, timeout=0.1, retries=1, latency_s=0.02, name="modbus"):
+        self.serial = serial_obj
+        self.slave = slave
+        self.timeout = timeout
+        self.retries = retries
+        self.latency_s = latency_s
+        self._bits = char_bits(serial_obj)
+        self._queue = queue.Queue()
+        self._idle_at = 0.0
+        self._closed = False
+        self._metrics_lock = threading.Lock()
+        self.transactions = 0
+        self.timeouts = 0
+        self.frame_errors = 0
+        self.exceptions = 0
+        self.retried = 0
+        self.last_rtt_s = 0.0
+        self.max_rtt_s = 0.0
+        read_slice = min(timeout, READ_SLICE_S)
+        if serial_obj.timeout is None or serial_obj.timeout > read_slice:
+            # Set once: pyserial reconfigures the port on every timeout change
+            serial_obj.timeout = read_slice
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    @property
+    def baudrate(self):
+        return self.serial.baudrate
+
+    def char_time(self):
+        return self._bits / self.serial.baudrate
+
+    def submit(self, function, payload=b"", slave=None):
+        """Queue a request; the Future resolves to the reply payload after the function code."""
+        future = Future()
+        if self._closed:
+            future.set_exception(ModbusError("client is closed"))
+            return future
+        self._queue.put((self.slave if slave is None else slave, function, bytes(payload), None, future))
+        return future
+
+    def submit_frame(self, frame):
+        """Queue a complete request frame (CRC included), e.g. from a FrameTemplate; like submit()."""
+        future = Future()
+        if self._closed:
+            future.set_exception(ModbusError("client is closed"))
+            return future
+        self._queue.put((frame[0], frame[1], frame[2:-2], frame, future))
+        return future
+
+    def execute(self, function, payload=b"", slave=None):
+        return self.submit(function, payload, slave).result()
+
+    def read_holding_registers(self, address, count, slave=None):
+        data = self.execute(READ_HOLDING_REGISTERS, struct.pack(">HH", address, count), slave)
+        return list(struct.unpack(f">{count}H", data[1:]))
+
+    def read_input_registers(self, address, count, slave=None):
+        data = self.execute(READ_INPUT_REGISTERS, struct.pack(">HH", address, count), slave)
+        return list(struct.unpack(f">{count}H", data[1:]))
+
+    def write_register(self, address, value, slave=None):
+        self.execute(WRITE_SINGLE_REGISTER, struct.pack(">HH", address, value & 0xFFFF), slave)
+
+    def write_registers(self, address, values, slave=None):
+        self.execute(WRITE_MULTIPLE_REGISTERS, write_registers_payload(address, values), slave)
+
+    def read_int32(self, address, count=1, slave=None):
+        """`count` signed 32-bit values from register pairs starting at `address`."""
+        return registers_to_int32(self.read_holding_registers(address, 2 * count, slave))
+
+    def write_int32(self, address, values, slave=None):
+        self.write_registers(address, int32_to_registers(values), slave)
+
+    def close(self, close_port=False):
+        """Finish the queued requests and stop the worker; optionally close the port too."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+        if close_port:
+            self.serial.close()
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                "transactions": self.transactions,
+                "timeouts": self.timeouts,
+                "frame_errors": self.frame_errors,
+                "exceptions": self.exceptions,
+                "retried": self.retried,
+                "last_rtt_ms": 1000.0 * self.last_rtt_s,
+                "max_rtt_ms": 1000.0 * self.max_rtt_s,
+            }
+
+    # -- worker thread ----------------------------------------------------
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            slave, function, payload, request, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = self._transact(slave, function, payload, request)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def _transact(self, slave, function, payload, request=None):
+        if request is None:
+            request = build_frame(slave, function, payload)
+        length = None if slave == 0 else expected_length(function, payload)
+        attempt = 0
+        while True:
+            try:
+                return self._exchange(request, slave, function, payload, length)
+            except (ModbusTimeout, ModbusFrameError):
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                with self._metrics_lock:
+                    self.retried += 1
+                self._discard()
+
+    def _exchange(self, request, slave, function, payload, length):
+        gap = frame_gap(self.serial.baudrate, self._bits)
+        wait = self._idle_at - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        t0 = time.perf_counter()
+        self.serial.write(request)
+        # Wait until the frame is on the wire, so the timeout covers only the slave's answer
+        self.serial.flush()
+        if length is None:
+            # Broadcast: nothing comes back
+            self._idle_at = time.perf_counter() + gap
+            return b""
+        t_sent = time.perf_counter()
+        head = self._read_until(2, t_sent + self.timeout)
+        if len(head) < 2:
+            self._count_timeout()
+            raise ModbusTimeout(f"slave {slave} function 0x{function:02X}: no reply")
+        if head[0] != slave:
+            self._count_frame_error()
+            raise ModbusFrameError(f"slave {slave} function 0x{function:02X}: reply from address {head[0]}")
+        rest = 3 if head[1] & 0x80 else length - 2
+        frame = head + self._read_until(rest, t_sent + self.timeout + length * self.char_time())
+        self._idle_at = time.perf_counter() + gap
+        self._record_rtt(time.perf_counter() - t0)
+        if len(frame) < 2 + rest:
+            self._count_timeout()
+            raise ModbusTimeout(f"slave {slave} function 0x{function:02X}: reply cut short "
+                                f"({len(frame)} of {2 + rest} bytes)")
+        if not check_crc(frame):
+            self._count_frame_error()
+            raise ModbusFrameError(f"slave {slave} function 0x{function:02X}: CRC mismatch")
+        if frame[1] == function | 0x80:
+            with self._metrics_lock:
+                self.exceptions += 1
+            raise ModbusExceptionResponse(slave, function, frame[2])
+        data = frame[2:-2]
+        if frame[1] != function or not self._answers(function, payload, data):
+            self._count_frame_error()
+            raise ModbusFrameError(f"slave {slave} function 0x{function:02X}: reply does not match the request")
+        return data
+
+    @staticmethod
+    def _answers(function, payload, data):
+        if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS, READ_WRITE_REGISTERS,
+                        READ_COILS, READ_DISCRETE_INPUTS):
+            return data[0] == len(data) - 1
+        # Single writes echo address and value, multiple writes address and quantity
+        return data == payload[:4]
+
+    def _read_until(self, n, deadline):
+        """Up to `n` bytes; reads until all have arrived or `deadline` (perf_counter) has passed."""
+        data = self.serial.read(n)
+        while len(data) < n and time.perf_counter() < deadline:
+            data += self.serial.read(n - len(data))
+        return data
+
+    def _discard(self):
+        # Let a late or partial reply finish, then drop it
+        time.sleep(frame_gap(self.serial.baudrate, self._bits) + self.latency_s)
+        self.serial.reset_input_buffer()
+        self._idle_at = time.perf_counter()
+
+    def _record_rtt(self, rtt):
+        with self._metrics_lock:
+            self.transactions += 1
+            self.last_rtt_s = rtt
+            if rtt > self.max_rtt_s:
+                self.max_rtt_s = rtt
+
+    def _count_timeout(self):
+        with self._metrics_lock:
+            self.timeouts += 1
+
+    def _count_frame_error(self):
+        with self._metrics_lock:
+            self.frame_errors += 1
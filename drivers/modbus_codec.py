@@ -0,0 +1,71 @@
+import struct
+
+
+def _make_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+# CRC-16/MODBUS (reflected 0x8005) remainder of every byte value
+CRC_TABLE = _make_table()
+CRC_INIT = 0xFFFF
+
+
+def crc16(data, crc=CRC_INIT):
+    """
+    Modbus CRC16 of `data`, one table lookup per byte. Pass the result of an
+    earlier call as `crc` to continue over more data, so the CRC of a
+    constant prefix is computed once.
+    """
+    table = CRC_TABLE
+    for b in data:
+        crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+    return crc
+
+
+class FrameTemplate(object):
+    """
+    RTU frame in which only one integer field changes between uses (e.g.
+    the target position of a move).
+
+    `adu` is the frame without CRC, built with any value in the field, which
+    starts at `offset` and is packed with the struct format `fmt`. The CRC is
+    linear, so the CRC of the frame with the field zeroed is computed once,
+    plus for every field byte position a table of how each byte value
+    changes it; render() then needs one lookup per field byte instead of a
+    pass over the whole frame.
+    """
+
+    def __init__(self, adu, offset, fmt=">i"):
+        self.fmt = fmt
+        self.offset = offset
+        size = struct.calcsize(fmt)
+        self.size = size
+        self.prefix = bytes(adu[:offset])
+        self.suffix = bytes(adu[offset + size:])
+        self._base = crc16(self.prefix + bytes(size) + self.suffix)
+        # Effect of byte value v at field byte i: its CRC from a zero state
+        # followed by the zero bytes that come after it in the frame
+        self._tables = []
+        for i in range(size):
+            trailing = size - 1 - i + len(self.suffix)
+            column = []
+            for v in range(256):
+                crc = CRC_TABLE[v]
+                for _ in range(trailing):
+                    crc = (crc >> 8) ^ CRC_TABLE[crc & 0xFF]
+                column.append(crc)
+            self._tables.append(tuple(column))
+
+    def render(self, value):
+        """Complete frame, CRC included, with `value` in the field."""
+        field = struct.pack(self.fmt, value)
+        crc = self._base
+        for table, b in zip(self._tables, field):
+            crc ^= table[b]
+        return self.prefix + field + self.suffix + crc.to_bytes(2, "little")
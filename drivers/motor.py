@@ -1,81 +1,333 @@
+import json
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import serial
 from PyQt5.QtCore import QThread, pyqtSignal
-import utils
+
+from drivers.device_cache import DEFAULT_CACHE_DIR
+from drivers.modbus import (READ_HOLDING_REGISTERS, READ_SLICE_S, WRITE_MULTIPLE_REGISTERS, ModbusClient,
+                            ModbusError, ModbusExceptionResponse, build_frame, int32_to_registers, plan_reads,
+                            registers_to_int32, write_registers_payload)
+from drivers.modbus_codec import FrameTemplate
 
 # Motor control constants for Oriental Motor AZ series (Modbus)
 TrackerSpeed = 10000       # Motor rotation speed (steps/s)
 TrackerCurrent = 1000      # Motor current limit (in 0.1% units, 1000 = 100.0%)
 SlaveID = 2                # Modbus slave address of the motor controller
 BaudRateList = [9600, 19200, 38400, 57600, 115200, 230400]
+FactoryBaud = 115200       # AZ driver default, tried first when nothing is cached
+ReplyTimeout = 0.05        # The AZ driver answers within a few ms; this is the wait for a missing reply
+LINK_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, "motor_link.json")
+
+# Direct data operation block (32-bit values, upper word first)
+DIRECT_DATA_ADDR = 0x0058
+TrackerAccel = 8000        # Starting/changing rate
+TrackerDecel = 8000        # Stopping deceleration
+MOVE_POSITION_OFFSET = 15  # Address, function, start, quantity, byte count, data No., operation type
+StepsPerDegree = 1         # send_move_command writes the angle as the target position
+
+# AZ monitor commands: telemetry channel -> (upper register of the 32-bit value, divisor)
+MOTOR_MONITOR = {
+    "MotorAlarmCode": (0x0080, 1),         # Present alarm
+    "MotorPos_steps": (0x00CC, 1),         # Feedback position [step]
+    "MotorSpeed_steps_s": (0x00D0, 1),     # Feedback speed [Hz]
+    "MotorCurrent_pct": (0x00D6, 10),     # Torque monitor [0.1 %]
+    "MotorTemp_C": (0x00FA, 10),          # Motor temperature [0.1 degC]
+}
+
+
+def open_motor_port(port_name, baud, timeout=READ_SLICE_S):
+    """Serial port in the AZ driver's framing (8E1), with ModbusClient's read slice as timeout."""
+    return serial.Serial(port_name, baudrate=baud, bytesize=serial.EIGHTBITS,
+                         parity=serial.PARITY_EVEN, stopbits=serial.STOPBITS_ONE, timeout=timeout)
+
+
+def probe_motor(client):
+    """
+    True if the motor gives a CRC-valid answer (data or exception) on this
+    port and baud. The probe is a Read Holding Registers (0x03) request, so
+    a device that is not the motor is never written to.
+    """
+    try:
+        client.read_holding_registers(DIRECT_DATA_ADDR, 2)
+    except ModbusExceptionResponse:
+        return True
+    except ModbusError:
+        return False
+    return True
+
+
+def baud_order(cache=None, bauds=BaudRateList):
+    """Baud rates most likely first: the cached one, then by past successes, then the factory default."""
+    cache = cache or {}
+    wins = cache.get("bauds", {})
+    preferred = cache.get("baud")
+    return sorted(bauds, key=lambda b: (b != preferred, -wins.get(str(b), 0), b != FactoryBaud))
+
+
+def load_link_cache(path=LINK_CACHE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_link_cache(port, baud, path=LINK_CACHE_PATH, cache=None):
+    """Remember the port and baud the motor answered on (written atomically)."""
+    cache = dict(cache if cache is not None else load_link_cache(path))
+    wins = dict(cache.get("bauds", {}))
+    wins[str(baud)] = wins.get(str(baud), 0) + 1
+    cache.update({"port": port, "baud": baud, "bauds": wins, "updated": time.time()})
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return cache
+
+
+def _probe_port(port, bauds, found, claim, timeout):
+    """Try `bauds` on one port until the motor answers or another port has won; returns (client, baud)."""
+    try:
+        ser = open_motor_port(port, bauds[0])
+    except (OSError, ValueError):
+        return None, 0
+    client = ModbusClient(ser, slave=SlaveID, timeout=timeout, retries=0, name=f"modbus-{port}")
+    for baud in bauds:
+        if found.is_set():
+            break
+        try:
+            if ser.baudrate != baud:
+                ser.baudrate = baud
+            ser.reset_input_buffer()
+        except (OSError, ValueError):
+            break
+        if probe_motor(client) and claim():
+            return client, baud
+    client.close(close_port=True)
+    return None, 0
+
+
+def discover_motor(ports, cache_path=LINK_CACHE_PATH, bauds=BaudRateList, timeout=ReplyTimeout):
+    """
+    Find the motor among `ports`; returns (client, port, baud) or (None, None, 0).
+
+    The cached port and baud are tried first with a single request. On a
+    miss every candidate port is probed on its own thread, each walking the
+    baud rates most likely first, and the search stops at the first
+    CRC-valid reply. The winner is written back to the cache.
+    """
+    cache = load_link_cache(cache_path) if cache_path else {}
+    order = baud_order(cache, bauds)
+    ports = list(dict.fromkeys(p for p in ports if p))
+    found = threading.Event()
+    lock = threading.Lock()
+
+    def claim():
+        with lock:
+            if found.is_set():
+                return False
+            found.set()
+            return True
+
+    result = (None, None, 0)
+    tried = None
+    cached_port = cache.get("port")
+    if cached_port in ports and cache.get("baud") in bauds:
+        tried = (cached_port, cache["baud"])
+        client, baud = _probe_port(cached_port, [cache["baud"]], found, claim, timeout)
+        if client is not None:
+            result = (client, cached_port, baud)
+    if result[0] is None and ports:
+        with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+            futures = {}
+            for port in ports:
+                port_bauds = [b for b in order if (port, b) != tried]
+                if port_bauds:
+                    futures[pool.submit(_probe_port, port, port_bauds, found, claim, timeout)] = port
+            for future in as_completed(futures):
+                client, baud = future.result()
+                if client is not None:
+                    result = (client, futures[future], baud)
+    client, port, baud = result
+    if client is not None:
+        client.retries = 1
+        if cache_path:
+            save_link_cache(port, baud, cache_path, cache)
+    return result
+
 
 class MotorConnectThread(QThread):
-    """Thread to attempt motor serial connection with baud auto-detection."""
-    result_signal = pyqtSignal(object, int, str)  # will emit (serial_obj or None, baud_rate, message)
-    def __init__(self, port_name, parent=None):
+    """Thread to find the motor (cached port/baud first, then all candidate ports in parallel)."""
+    result_signal = pyqtSignal(object, int, str)  # will emit (ModbusClient or None, baud_rate, message)
+    def __init__(self, port_name, parent=None, other_ports=(), cache_path=LINK_CACHE_PATH):
         super().__init__(parent)
         self.port_name = port_name
+        self.other_ports = list(other_ports)   # further candidates, searched if port_name has no motor
+        self.cache_path = cache_path
     def run(self):
-        found_serial = None
-        found_baud = None
-        message = ""
-        # Try each baud rate to find a responding motor
-        for baud in BaudRateList:
-            try:
-                ser = serial.Serial(
-                    self.port_name, baudrate=baud, bytesize=serial.EIGHTBITS,
-                    parity=serial.PARITY_EVEN, stopbits=serial.STOPBITS_ONE,
-                    timeout=0.5
-                )
-                # Example Modbus read command (function 0x03) at register 0x0058 (2 registers)
-                base_cmd = bytes([SlaveID, 0x03, 0x00, 0x58, 0x00, 0x02])
-                crc_val = utils.modbus_crc16(base_cmd)
-                crc_bytes = crc_val.to_bytes(2, 'little')
-                ser.write(base_cmd + crc_bytes)
-                # Read a few bytes to detect any response
-                response = ser.read(5)
-                if response:
-                    found_serial = ser
-                    found_baud = baud
-                    message = f"Motor connected on {self.port_name} at {baud} baud."
-                    break
-                ser.close()
-            except Exception:
-                # Ignore exceptions and try next baud
-                continue
-        if not found_serial:
-            message = f"No response from motor on {self.port_name}."
-        # Emit result (serial object if found, else None)
-        self.result_signal.emit(found_serial, found_baud if found_baud else 0, message)
+        t0 = time.perf_counter()
+        client, port, baud = discover_motor([self.port_name] + self.other_ports, self.cache_path)
+        if client is not None:
+            message = f"Motor connected on {port} at {baud} baud ({(time.perf_counter() - t0) * 1000:.0f} ms)."
+        else:
+            message = f"No response from motor on {', '.join([self.port_name] + self.other_ports)}."
+        # Emit result (client if found, else None)
+        self.result_signal.emit(client, baud, message)
+
+
+def move_registers(angle):
+    """Register values of a direct data operation to absolute position `angle`."""
+    # Clamp angle to 32-bit signed range if out of bounds
+    angle = max(min(angle, 0x7FFFFFFF), -0x80000000)
+    # Data No., operation type (absolute), position, speed, rates, current, trigger, forwarding
+    return int32_to_registers([1, 1, angle, TrackerSpeed, TrackerAccel, TrackerDecel, TrackerCurrent, 1, 1])
+
+
+_move_templates = {}
 
-def send_move_command(serial_obj, angle: int) -> bool:
+
+def move_template(slave=SlaveID):
+    """FrameTemplate of the move request to `slave`; only the position differs between moves."""
+    template = _move_templates.get(slave)
+    if template is None:
+        payload = write_registers_payload(DIRECT_DATA_ADDR, move_registers(0))
+        adu = build_frame(slave, WRITE_MULTIPLE_REGISTERS, payload)[:-2]
+        template = _move_templates[slave] = FrameTemplate(adu, MOVE_POSITION_OFFSET)
+    return template
+
+
+def submit_move_command(client, angle: int):
+    """Queue a move to `angle` on the client's port worker; returns its Future."""
+    angle = max(min(angle, 0x7FFFFFFF), -0x80000000)
+    return client.submit_frame(move_template(client.slave).render(angle))
+
+
+def send_move_command(client, angle: int) -> bool:
     """Send a move command to the motor to go to the specified angle (degrees). Returns True if ACK received."""
-    # Construct Modbus Write Multiple Registers command to move motor to target angle
-    base_cmd = bytes([SlaveID, 0x10, 0x00, 0x58, 0x00, 0x12, 0x24,
-                      0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01])
-    # Prepare data bytes for angle, speed, current
-    try:
-        angle_bytes = angle.to_bytes(4, 'big', signed=True)
-    except OverflowError:
-        # Clamp angle to 32-bit signed range if out of bounds
-        val = max(min(angle, 0x7FFFFFFF), -0x80000000)
-        angle_bytes = val.to_bytes(4, 'big', signed=True)
-    speed_bytes = TrackerSpeed.to_bytes(4, 'big', signed=True)
-    current_bytes = TrackerCurrent.to_bytes(4, 'big', signed=True)
-    # Mid and end bytes (acceleration/deceleration and execution parameters)
-    mid_bytes = bytes([0x00, 0x00, 0x1F, 0x40, 0x00, 0x00, 0x1F, 0x40])
-    end_bytes = bytes([0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01])
-    full_cmd = base_cmd + angle_bytes + speed_bytes + mid_bytes + current_bytes + end_bytes
-    # Append CRC16
-    crc_val = utils.modbus_crc16(full_cmd)
-    crc_bytes = crc_val.to_bytes(2, 'little')
     try:
-        serial_obj.reset_input_buffer()
-        serial_obj.write(full_cmd + crc_bytes)
-        # Response for function 0x10 (Write Multiple Registers) should be 8 bytes (including CRC)
-        response = serial_obj.read(8)
-        if response and len(response) >= 6 and response[1] == 0x10:
-            return True
-        else:
-            return False
-    except Exception:
+        # Write Multiple Registers; the client checks the CRC and the echoed address/count
+        submit_move_command(client, angle).result()
+        return True
+    except ModbusError:
         return False
+
+
+class MotorStatusPoller(object):
+    """
+    Reads the AZ monitor registers in the background and publishes them to
+    a TelemetryStore (MotorPos_steps, MotorSpeed_steps_s, MotorCurrent_pct,
+    MotorAlarmCode, MotorTemp_C and MotorAngle_deg).
+
+    The monitor fields are covered by 0x03 block reads that merge fields up
+    to `max_gap` unused registers apart, and the blocks of one poll are
+    queued on the client together so they go out back to back. Each poll is
+    published as one group, timestamped at the middle of its transactions.
+
+    The motor is polled every `moving_interval` seconds while it moves (speed
+    not zero, position changing, or less than `settle_s` after
+    notify_move()), otherwise every `idle_interval` seconds. While the port
+    itself fails (OSError, e.g. the adapter was unplugged) the poller keeps
+    running and retries at an interval that doubles up to `max_backoff`.
+    """
+
+    def __init__(self, client, store, idle_interval=1.0, moving_interval=0.1, settle_s=1.0,
+                 monitor=MOTOR_MONITOR, max_gap=16, max_backoff=30.0):
+        self.client = client
+        self.store = store
+        self.idle_interval = idle_interval
+        self.moving_interval = moving_interval
+        self.settle_s = settle_s
+        self.max_backoff = max_backoff
+        self.monitor = dict(monitor)
+        # One read of 0x0080-0x00FB (124 registers) would cover every field, but 108 of
+        # them are unused: 216 more reply bytes, 20.6 ms at 115200 baud 8E1 (247 ms at
+        # 9600). A transaction costs its 13 framing bytes plus two 1.75 ms frame gaps
+        # (4 ms each at 9600) and the driver's turnaround: about 5 ms at 115200, 23 ms
+        # at 9600. Reading through a gap pays only when it is shorter than that, about
+        # 26 registers at 115200. The gaps between the fields are 74, 2, 4 and 34
+        # registers, so the three blocks max_gap=16 gives (0x0080, 0x00CC-0x00D7,
+        # 0x00FA) beat the single read at every baud rate.
+        self.blocks = plan_reads([(address, 2) for address, _ in self.monitor.values()], max_gap)
+        self._requests = [struct.pack(">HH", start, count) for start, count in self.blocks]
+        self._wake = threading.Event()
+        self._stop = False
+        self._fast_until = 0.0
+        self._last_pos = None
+        self.moving = False
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+        self.port_errors = 0
+        self._thread = None
+
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="motor-status", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify_move(self):
+        """A move was commanded: poll fast from now until it has settled."""
+        self._fast_until = time.perf_counter() + self.settle_s
+        self._wake.set()
+
+    def poll_once(self):
+        """Read and publish one set of values; returns them as a dict."""
+        t_epoch, m0 = time.time(), time.perf_counter()
+        futures = [self.client.submit(READ_HOLDING_REGISTERS, request) for request in self._requests]
+        registers = {}
+        for (start, count), future in zip(self.blocks, futures):
+            data = future.result()
+            registers.update(zip(range(start, start + count), struct.unpack(f">{count}H", data[1:])))
+        m1 = time.perf_counter()
+        values = {}
+        for name, (address, divisor) in self.monitor.items():
+            raw = registers_to_int32([registers[address], registers[address + 1]])[0]
+            values[name] = raw / divisor if divisor != 1 else raw
+        if "MotorPos_steps" in values:
+            values["MotorAngle_deg"] = values["MotorPos_steps"] / StepsPerDegree
+        self.store.publish(values, t=t_epoch + (m1 - m0) / 2, t_mono=(m0 + m1) / 2)
+        self.polls += 1
+        return values
+
+    def _run(self):
+        failures = 0
+        while not self._stop:
+            try:
+                values = self.poll_once()
+                failures = 0
+            except ModbusError as e:
+                self.errors += 1
+                self.last_error = str(e)
+                values = {}
+            except OSError as e:
+                self.errors += 1
+                self.port_errors += 1
+                self.last_error = str(e)
+                failures += 1
+                self._wake.wait(min(self.idle_interval * 2 ** (failures - 1), self.max_backoff))
+                self._wake.clear()
+                continue
+            pos = values.get("MotorPos_steps")
+            self.moving = (time.perf_counter() < self._fast_until
+                           or values.get("MotorSpeed_steps_s", 0) != 0
+                           or (pos is not None and self._last_pos is not None and pos != self._last_pos))
+            if pos is not None:
+                self._last_pos = pos
+            self._wake.wait(self.moving_interval if self.moving else self.idle_interval)
+            self._wake.clear()
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from drivers.spectrometer import (
+    prepare_measurement,
+    AVS_MeasureCallback,
+    AVS_MeasureCallbackFunc,
+    AVS_GetScopeDataInto,
+    AVS_SetSyncMode,
+    AVS_StopMeasure,
+    ScopeBuffer,
+    TRIGGER_HARDWARE,
+    TRIGGER_SOURCE_SYNC,
+)
+from drivers.spectrum_ring import SpectrumRingBuffer
+
+# One time-aligned set of scans: seqs[i] indexes devices[i].ring
+AlignedRecord = namedtuple("AlignedRecord", "index t_host seqs")
+
+
+class SpectrometerDevice(object):
+    """One activated spectrometer with its own scan buffer and ring."""
+
+    def __init__(self, handle, wavelengths, num_pixels, serial, ring_capacity=256):
+        self.handle = handle
+        self.serial = serial
+        self.npix = num_pixels
+        self.wls = np.asarray(wavelengths, dtype=np.float64)[:num_pixels]
+        self.ring = SpectrumRingBuffer(ring_capacity, num_pixels)
+        self.scope = ScopeBuffer()
+        self.cb = None
+        self.errors = 0
+
+
+class ScanAligner(object):
+    """
+    Merges scans from several devices into AlignedRecords.
+
+    Scans are matched on host arrival time: the oldest pending scan of every
+    device forms a record when they all lie within `tolerance_s` of each other,
+    otherwise the oldest one has no partner and is dropped. Records are passed
+    to `on_record` and only counted here. Thread-safe; push() is called from
+    every device's callback thread.
+    """
+
+    def __init__(self, n_devices, tolerance_s, capacity=256, on_record=None):
+        self.tolerance_s = tolerance_s
+        self.on_record = on_record
+        self.unmatched = 0
+        self._pending = [deque(maxlen=capacity) for _ in range(n_devices)]
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def push(self, device_index, t_host, seq):
+        emitted = []
+        with self._lock:
+            self._pending[device_index].append((t_host, seq))
+            while all(self._pending):
+                heads = [q[0] for q in self._pending]
+                times = [h[0] for h in heads]
+                t_min = min(times)
+                if max(times) - t_min <= self.tolerance_s:
+                    for q in self._pending:
+                        q.popleft()
+                    record = AlignedRecord(self.count, sum(times) / len(times),
+                                           tuple(h[1] for h in heads))
+                    self.count += 1
+                    emitted.append(record)
+                else:
+                    self._pending[times.index(t_min)].popleft()
+                    self.unmatched += 1
+        if self.on_record is not None:
+            for record in emitted:
+                self.on_record(record)
+
+
+class MultiSpectrometerAcquisition(object):
+    """
+    Runs every SpectrometerDevice in parallel, each with its own library
+    callback and ring buffer, and merges their scans into time-aligned records.
+
+    With sync=True the first device is the master: AVS_SetSyncMode is enabled on
+    it, the slaves are prepared for a hardware trigger on their sync input and
+    started before it, so all detectors integrate on the master's trigger.
+    """
+
+    def __init__(self, devices, integration_ms, averages=1, sync=False, on_scan=None, on_record=None):
+        self.devices = devices
+        self.integration_ms = integration_ms
+        self.averages = averages
+        self.sync = sync
+        self.on_scan = on_scan   # called with (device_index, seq) for every stored scan
+        # Scans of one trigger arrive well within half an integration period of each other
+        tolerance_s = max(0.5 * integration_ms * averages, 1.0) / 1000.0
+        self.aligner = ScanAligner(len(devices), tolerance_s,
+                                   capacity=devices[0].ring.capacity, on_record=on_record)
+
+    def handles(self):
+        return [dev.handle for dev in self.devices]
+
+    def start(self):
+        """Prepare and start all devices. Returns the first non-zero AVS error code, or 0."""
+        for index, dev in enumerate(self.devices):
+            trigger = {}
+            if self.sync and index > 0:
+                trigger = {"trigger_mode": TRIGGER_HARDWARE, "trigger_source": TRIGGER_SOURCE_SYNC}
+            err = prepare_measurement(dev.handle, dev.npix, integration_time_ms=self.integration_ms,
+                                      averages=self.averages, **trigger)
+            if err != 0:
+                return err
+        master = self.devices[0]
+        if self.sync:
+            err = AVS_SetSyncMode(master.handle, 1)
+            if err != 0:
+                return err
+        # Slaves first so they are waiting when the master starts triggering
+        for index in list(range(1, len(self.devices))) + [0]:
+            dev = self.devices[index]
+            dev.cb = AVS_MeasureCallbackFunc(self._make_callback(index))
+            err = AVS_MeasureCallback(dev.handle, dev.cb, -1)
+            if err != 0:
+                self.stop()
+                return err
+        return 0
+
+    def stop(self):
+        for dev in self.devices:
+            AVS_StopMeasure(dev.handle)
+        self.finish()
+
+    def finish(self):
+        """Release sync mode after the devices have been stopped."""
+        if self.sync:
+            AVS_SetSyncMode(self.devices[0].handle, 0)
+
+    def _make_callback(self, index):
+        dev = self.devices[index]
+        aligner = self.aligner
+
+        def _cb(p_data, p_user):
+            if p_user[0] != 0 or AVS_GetScopeDataInto(dev.handle, dev.scope) != 0:
+                dev.errors += 1
+                return
+            t_host = time.perf_counter()
+            seq = dev.ring.push(dev.scope.spectrum, dev.scope.timelabel, self.integration_ms, self.averages)
+            if self.on_scan is not None:
+                self.on_scan(index, seq)
+            aligner.push(index, t_host, seq)
+        return _cb
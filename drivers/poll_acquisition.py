@@ -0,0 +1,124 @@
+import threading
+import time
+
+from drivers.spectrometer import (
+    AVS_Measure,
+    AVS_PollScan,
+    AVS_GetScopeDataInto,
+    AVS_StopMeasure,
+    ScopeBuffer,
+)
+from drivers.latency import LatencyMeter
+
+# Wait strategies between unsuccessful AVS_PollScan calls
+POLL_SPIN = "spin"      # poll back to back: lowest latency, one core busy
+POLL_SLEEP = "sleep"    # sleep `sleep_s` between polls: cheapest, latency up to sleep_s
+POLL_HYBRID = "hybrid"  # sleep until shortly before the next expected scan, then spin
+POLL_STRATEGIES = (POLL_SPIN, POLL_SLEEP, POLL_HYBRID)
+
+
+class PollingAcquisition(object):
+    """
+    Acquisition engine that polls the library instead of using its callback.
+
+    A dedicated worker thread calls AVS_PollScan and reads every new scan with
+    AVS_GetScopeDataInto into the ring buffer and passes each stored sequence
+    number to `on_scan`. Latency from scan-ready (device timelabel) to stored
+    is tracked in `latency`.
+    """
+
+    def __init__(self, handle, ring, integration_ms, averages=1, strategy=POLL_HYBRID,
+                 sleep_s=0.0005, spin_window_s=0.002, on_scan=None, latency=None):
+        if strategy not in POLL_STRATEGIES:
+            raise ValueError(f"Unknown poll strategy {strategy!r}")
+        self.handle = handle
+        self.ring = ring
+        self.integration_ms = integration_ms
+        self.averages = averages
+        self.strategy = strategy
+        self.sleep_s = sleep_s
+        self.spin_window_s = spin_window_s
+        self.on_scan = on_scan      # called on the worker thread with each stored sequence number
+        self.latency = latency if latency is not None else LatencyMeter()
+        self._scope = ScopeBuffer()
+        self._stop = threading.Event()
+        self._worker = None
+
+        self.scans_received = 0
+        self.read_errors = 0
+        self.polls = 0
+
+    def start(self):
+        """Start the measurement in polling mode and the worker. Returns the AVS error code."""
+        self._stop.clear()
+        err = AVS_Measure(self.handle, 0, -1)
+        if err != 0:
+            return err
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        return 0
+
+    def stop(self):
+        AVS_StopMeasure(self.handle)
+        self.shutdown()
+
+    def shutdown(self, timeout=2.0):
+        """Stop the worker; the measurement itself must be stopped separately."""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+
+    def stats(self):
+        st = {
+            "scans_received": self.scans_received,
+            "read_errors": self.read_errors,
+            "polls": self.polls,
+            "strategy": self.strategy,
+        }
+        st.update(self.latency.stats())
+        return st
+
+    # -- worker thread ----------------------------------------------------
+
+    def _run(self):
+        handle = self.handle
+        scope = self._scope
+        stop = self._stop
+        perf = time.perf_counter
+        # Expected scan period, refined from the observed scan intervals
+        period = self.integration_ms * self.averages / 1000.0
+        last_t = None
+        while not stop.is_set():
+            self.polls += 1
+            if not AVS_PollScan(handle):
+                self._wait(last_t, period)
+                continue
+            if AVS_GetScopeDataInto(handle, scope) != 0:
+                self.read_errors += 1
+                continue
+            seq = self.ring.push(scope.spectrum, scope.timelabel, self.integration_ms, self.averages)
+            t = perf()
+            self.latency.record(scope.timelabel, t)
+            self.scans_received += 1
+            if last_t is not None:
+                period = 0.8 * period + 0.2 * (t - last_t)
+            last_t = t
+            if self.on_scan is not None:
+                self.on_scan(seq)
+
+    def _wait(self, last_t, period):
+        if self.strategy == POLL_SPIN:
+            # Release the GIL for other Python threads but do not give up the core
+            time.sleep(0)
+        elif self.strategy == POLL_SLEEP or last_t is None:
+            time.sleep(self.sleep_s)
+        else:
+            remaining = last_t + period - self.spin_window_s - time.perf_counter()
+            if remaining > 0:
+                self._stop.wait(remaining)
+            elif remaining < -period:
+                # Long overdue (stalled or stopped device): stop spinning
+                time.sleep(self.sleep_s)
+            else:
+                time.sleep(0)
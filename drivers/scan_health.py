@@ -0,0 +1,110 @@
+import math
+import threading
+from collections import deque
+
+import drivers.spectrometer  # noqa: F401  (puts drivers/ on sys.path for the vendor modules)
+# The AvaSpec demo globals module, imported the way drivers/avaspec.py does
+import globals as avs_globals
+from drivers.latency import TIMELABEL_TICK_S, TIMELABEL_WRAP
+
+
+class ScanHealth(object):
+    """
+    Acquisition health from the timelabel of every stored scan.
+
+    Scan intervals are compared with the median of the recent intervals: an
+    interval of n medians means n - 1 scans were missed, a repeated timelabel
+    is a scan read twice. The running totals are mirrored into the
+    m_Measurements, m_Failures, m_PreviousTimeStamp and m_SummatedTimeStamps
+    globals of drivers/globals.py.
+    """
+
+    def __init__(self, window=32, gap_factor=1.5, min_reference=8):
+        self.gap_factor = gap_factor
+        self.min_reference = min_reference
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.scans = 0
+            self.missed = 0
+            self.duplicates = 0
+            self.errors = 0
+            # Scan intervals over which the rate is measured, in ticks
+            self._span_ticks = 0
+            self._span_scans = 0
+        self.new_run()
+        avs_globals.m_Measurements = 0
+        avs_globals.m_Failures = 0
+        avs_globals.m_PreviousTimeStamp = 0
+        avs_globals.m_SummatedTimeStamps = 0.0
+
+    def new_run(self):
+        """Forget the interval statistics, keeping the totals; call when the scan period changes."""
+        with self._lock:
+            self._recent.clear()
+            self._last_timelabel = None
+            self._wraps = 0
+            self._last_tick = None
+            # Welford accumulators for the interval mean / variance, in ticks
+            self._n = 0
+            self._mean = 0.0
+            self._m2 = 0.0
+
+    def record_scan(self, timelabel):
+        """Account for one stored scan; returns the number of scans missed before it."""
+        missed = 0
+        with self._lock:
+            if self._last_timelabel is not None:
+                if timelabel == self._last_timelabel:
+                    self.duplicates += 1
+                    return 0
+                if timelabel < self._last_timelabel - TIMELABEL_WRAP // 2:
+                    self._wraps += 1
+            self._last_timelabel = timelabel
+            tick = timelabel + self._wraps * TIMELABEL_WRAP
+            self.scans += 1
+            if self._last_tick is not None:
+                interval = tick - self._last_tick
+                if len(self._recent) >= self.min_reference:
+                    reference = sorted(self._recent)[len(self._recent) // 2]
+                    if interval > self.gap_factor * reference:
+                        missed = int(round(interval / reference)) - 1
+                        self.missed += missed
+                if not missed:
+                    # Gaps would inflate the jitter and the reference interval
+                    self._recent.append(interval)
+                    self._n += 1
+                    delta = interval - self._mean
+                    self._mean += delta / self._n
+                    self._m2 += delta * (interval - self._mean)
+                self._span_ticks += interval
+                self._span_scans += 1
+                avs_globals.m_SummatedTimeStamps += interval * TIMELABEL_TICK_S * 1000.0
+            self._last_tick = tick
+        avs_globals.m_Measurements = self.scans
+        avs_globals.m_PreviousTimeStamp = timelabel
+        return missed
+
+    def record_error(self):
+        """Account for a scan the library reported as failed or that could not be read."""
+        with self._lock:
+            self.errors += 1
+        avs_globals.m_Failures = self.errors
+
+    def metrics(self):
+        """Snapshot of the counters; rates are derived from the device clock."""
+        with self._lock:
+            span_s = self._span_ticks * TIMELABEL_TICK_S
+            jitter_ticks = math.sqrt(self._m2 / (self._n - 1)) if self._n > 1 else 0.0
+            return {
+                "scans": self.scans,
+                "missed": self.missed,
+                "duplicates": self.duplicates,
+                "errors": self.errors,
+                "scan_rate_hz": self._span_scans / span_s if span_s > 0 else 0.0,
+                "interval_ms": self._mean * TIMELABEL_TICK_S * 1000.0,
+                "jitter_us": jitter_ticks * TIMELABEL_TICK_S * 1e6,
+            }
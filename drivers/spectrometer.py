@@ -14,16 +14,28 @@ try:
 except ImportError as e:
     raise ImportError("AvaSpec SDK import failed. Make sure avaspec.pyd and avaspec DLL are in the same directory as main.py.") from e
 
+from drivers.device_cache import DeviceCache, config_hash
+
+# Wavelength calibration and parameters per serial number; None disables caching
+device_cache = DeviceCache()
+
+def set_device_cache(root):
+    """Use the device cache under `root`, or disable it with None."""
+    global device_cache
+    device_cache = DeviceCache(root) if root else None
+
 class StopMeasureThread(QThread):
     finished_signal = pyqtSignal()
     def __init__(self, spec_handle, parent=None):
         super().__init__(parent)
-        self.spec_handle = spec_handle
+        # A single handle or a list of handles to stop together
+        self.spec_handles = spec_handle if isinstance(spec_handle, (list, tuple)) else [spec_handle]
     def run(self):
-        AVS_StopMeasure(self.spec_handle)
+        for handle in self.spec_handles:
+            AVS_StopMeasure(handle)
         self.finished_signal.emit()
 
-def connect_spectrometer():
+def _init_library():
     try:
         print("[DEBUG] Calling AVS_Init(0)...")
         ret = AVS_Init(0)
@@ -47,8 +59,9 @@ def connect_spectrometer():
     if not id_list:
         AVS_Done()
         raise Exception("Failed to retrieve spectrometer list.")
+    return id_list
 
-    dev_id = id_list[0]
+def _activate_device(dev_id):
     serial_str = dev_id.SerialNumber.decode().strip() if hasattr(dev_id.SerialNumber, 'decode') else str(dev_id.SerialNumber)
 
     avs_id = AvsIdentityType()
@@ -65,6 +78,12 @@ def connect_spectrometer():
         AVS_Done()
         raise Exception("Failed to get spectrometer parameters.")
 
+    # Same EEPROM contents as last time: take the wavelength axis from the cache
+    digest = config_hash(device_data)
+    cached = device_cache.lookup(serial_str, digest) if device_cache is not None else None
+    if cached is not None:
+        return spec_handle, cached.wavelengths, cached.num_pixels, serial_str
+
     num_pixels = device_data.m_Detector_m_NrPixels
     start_pixel = getattr(device_data, 'm_StandAlone_m_Meas_m_StartPixel', 0)
     stop_pixel = getattr(device_data, 'm_StandAlone_m_Meas_m_StopPixel', num_pixels - 1)
@@ -74,14 +93,33 @@ def connect_spectrometer():
         stop_pixel = num_pixels - 1
 
     wavelengths = AVS_GetLambda(spec_handle)
-    if wavelengths:
-        wavelengths = np.ctypeslib.as_array(wavelengths)
-    else:
-        wavelengths = list(range(num_pixels))
+    if not wavelengths:
+        # No calibration: pixel index axis, not cached
+        return spec_handle, list(range(num_pixels)), num_pixels, serial_str
+    wavelengths = np.ctypeslib.as_array(wavelengths)
+    if device_cache is not None:
+        try:
+            cached = device_cache.store(serial_str, digest, device_data, wavelengths, num_pixels,
+                                        start_pixel, stop_pixel)
+            if cached is not None:
+                wavelengths = cached.wavelengths
+        except OSError as e:
+            print(f"[WARN] Device cache not written: {e}")
 
     return spec_handle, wavelengths, num_pixels, serial_str
 
-def prepare_measurement(spec_handle, num_pixels, integration_time_ms=50.0, averages=1):
+def connect_spectrometer():
+    """Activate the first spectrometer found; returns (handle, wavelengths, num_pixels, serial)."""
+    id_list = _init_library()
+    return _activate_device(id_list[0])
+
+def connect_spectrometers():
+    """Activate every spectrometer AVS_GetList reports; returns a list of connect_spectrometer() tuples."""
+    id_list = _init_library()
+    return [_activate_device(dev_id) for dev_id in id_list]
+
+def prepare_measurement(spec_handle, num_pixels, integration_time_ms=50.0, averages=1, saturation_detection=0,
+                        trigger_mode=TRIGGER_SOFTWARE, trigger_source=TRIGGER_SOURCE_EXTERNAL, trigger_source_type=0):
     meas_cfg = MeasConfigType()
     meas_cfg.m_StartPixel = 0
     meas_cfg.m_StopPixel = num_pixels - 1
@@ -92,10 +130,10 @@ def prepare_measurement(spec_handle, num_pixels, integration_time_ms=50.0, avera
     meas_cfg.m_CorDynDark_m_ForgetPercentage = 0
     meas_cfg.m_Smoothing_m_SmoothPix = 0
     meas_cfg.m_Smoothing_m_SmoothModel = 0
-    meas_cfg.m_SaturationDetection = 0
-    meas_cfg.m_Trigger_m_Mode = 0
-    meas_cfg.m_Trigger_m_Source = 0
-    meas_cfg.m_Trigger_m_SourceType = 0
+    meas_cfg.m_SaturationDetection = saturation_detection
+    meas_cfg.m_Trigger_m_Mode = trigger_mode
+    meas_cfg.m_Trigger_m_Source = trigger_source
+    meas_cfg.m_Trigger_m_SourceType = trigger_source_type
     meas_cfg.m_Control_m_StrobeControl = 0
     meas_cfg.m_Control_m_LaserDelay = 0
     meas_cfg.m_Control_m_LaserWidth = 0
@@ -0,0 +1,95 @@
+import threading
+import numpy as np
+
+
+class SpectrumRingBuffer(object):
+    """
+    Fixed-capacity store for the last `capacity` spectra of one spectrometer.
+
+    All pixel data lives in one preallocated (capacity x npix) float64 array and
+    every slot carries the scan sequence number, device timelabel (10 us ticks),
+    integration time and number of averages it was acquired with. push() copies
+    a scan into its slot without allocating; readers get read-only views.
+
+    A view stays valid until its slot is reused `capacity` scans later. Readers
+    that hold on to a view for longer should check is_valid(seq) afterwards.
+    """
+
+    def __init__(self, capacity, npix):
+        if capacity < 1 or npix < 1:
+            raise ValueError("capacity and npix must be positive")
+        self.capacity = int(capacity)
+        self.npix = int(npix)
+        self._data = np.zeros((self.capacity, self.npix), dtype=np.float64)
+        self._seq = np.full(self.capacity, -1, dtype=np.int64)
+        self._timelabel = np.zeros(self.capacity, dtype=np.uint32)
+        self._integration_ms = np.zeros(self.capacity, dtype=np.float32)
+        self._averages = np.zeros(self.capacity, dtype=np.uint32)
+        # Read-only alias handed out to consumers
+        self._view = self._data.view()
+        self._view.flags.writeable = False
+        self._write_lock = threading.Lock()
+        self.head = -1  # sequence number of the newest complete scan
+
+    def push(self, spectrum, timelabel=0, integration_ms=0.0, averages=1):
+        """Copy one scan into the next slot and return its sequence number."""
+        with self._write_lock:
+            seq = self.head + 1
+            slot = seq % self.capacity
+            # Invalidate the slot before overwriting so readers never pair the
+            # old sequence number with new pixel data
+            self._seq[slot] = -1
+            n = min(len(spectrum), self.npix)
+            self._data[slot, :n] = spectrum[:n]
+            if n < self.npix:
+                self._data[slot, n:] = 0.0
+            self._timelabel[slot] = timelabel
+            self._integration_ms[slot] = integration_ms
+            self._averages[slot] = averages
+            self._seq[slot] = seq
+            self.head = seq
+        return seq
+
+    def is_valid(self, seq):
+        """True while scan `seq` is still held in the buffer."""
+        return seq >= 0 and self._seq[seq % self.capacity] == seq
+
+    def get(self, seq):
+        """Read-only view of scan `seq`, or None if it was overwritten or never written."""
+        if not self.is_valid(seq):
+            return None
+        return self._view[seq % self.capacity]
+
+    def latest(self):
+        """(seq, read-only view) of the newest scan, or (-1, None) if empty."""
+        seq = self.head
+        if seq < 0:
+            return -1, None
+        return seq, self._view[seq % self.capacity]
+
+    def meta(self, seq):
+        """Timelabel and acquisition parameters recorded with scan `seq`, or None."""
+        if not self.is_valid(seq):
+            return None
+        slot = seq % self.capacity
+        return {
+            "seq": int(seq),
+            "timelabel": int(self._timelabel[slot]),
+            "integration_ms": float(self._integration_ms[slot]),
+            "averages": int(self._averages[slot]),
+        }
+
+    def timelabel(self, seq):
+        """Device timelabel of scan `seq`, or -1 if it is no longer held."""
+        if not self.is_valid(seq):
+            return -1
+        return int(self._timelabel[seq % self.capacity])
+
+    def oldest(self):
+        """Sequence number of the oldest scan still held, or -1 if empty."""
+        if self.head < 0:
+            return -1
+        return max(0, self.head - self.capacity + 1)
+
+    def __len__(self):
+        return min(self.head + 1, self.capacity)
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import numpy as np
+
+
+class Snapshot(object):
+    """
+    Immutable view of every telemetry channel at one instant.
+
+    values: channel name -> float; times: channel name -> epoch seconds of the
+    sample. A snapshot is never modified after it is published, so readers on
+    any thread can use it without locking.
+    """
+
+    __slots__ = ("version", "values", "times", "_rows")
+
+    def __init__(self, version, values, times):
+        self.version = version
+        self.values = values
+        self.times = times
+        self._rows = {}
+
+    def get(self, name, default=0.0):
+        return self.values.get(name, default)
+
+    def time(self, name):
+        """When `name` was last published (epoch seconds), or None."""
+        return self.times.get(name)
+
+    def age(self, name, now=None):
+        """Seconds since `name` was last published, or None if it never was."""
+        t = self.times.get(name)
+        if t is None:
+            return None
+        return (time.time() if now is None else now) - t
+
+    def row(self, names, default=0.0):
+        """Values of `names` (a tuple) as a tuple in that order; computed once per snapshot."""
+        row = self._rows.get(names)
+        if row is None:
+            values = self.values
+            row = tuple(values.get(name, default) for name in names)
+            self._rows[names] = row
+        return row
+
+
+class _History(object):
+    """Ring of the last `capacity` (perf_counter time, value) samples of one channel."""
+
+    def __init__(self, capacity):
+        self.t = np.zeros(capacity, dtype=np.float64)
+        self.v = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+
+    def append(self, t, v):
+        i = self.count % self.t.size
+        self.t[i] = t
+        self.v[i] = v
+        self.count += 1
+
+    def last_time(self):
+        return self.t[(self.count - 1) % self.t.size] if self.count else None
+
+    def copy(self):
+        if self.count <= self.t.size:
+            return self.t[:self.count].copy(), self.v[:self.count].copy()
+        i = self.count % self.t.size
+        return np.concatenate((self.t[i:], self.t[:i])), np.concatenate((self.v[i:], self.v[:i]))
+
+
+class TelemetryStore(object):
+    """
+    Latest value of every instrument channel, published by the threads that
+    read the instruments.
+
+    publish() merges a group of channels that were measured together into a
+    new Snapshot and swaps it in with one reference assignment; writers
+    serialise on a lock, readers never take it. snapshot() therefore always
+    returns a consistent state, and channels published together are always
+    seen together.
+
+    After keep_history(n) the last n samples of every channel are also kept
+    on the time.perf_counter() clock, for drivers.time_align.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = Snapshot(0, {}, {})
+        self._history = None
+
+    def keep_history(self, capacity):
+        """Keep the last `capacity` samples per channel (0 = none)."""
+        with self._lock:
+            self._history = {} if capacity > 0 else None
+            self._history_capacity = int(capacity)
+
+    def publish(self, values, t=None, t_mono=None):
+        """
+        Publish {channel: number} sampled at `t` (epoch seconds, default now);
+        `t_mono` is the same instant on the perf_counter() clock.
+        """
+        t = time.time() if t is None else t
+        update = {name: float(v) for name, v in values.items()}
+        with self._lock:
+            old = self._snapshot
+            merged = dict(old.values)
+            merged.update(update)
+            times = dict(old.times)
+            times.update(dict.fromkeys(update, t))
+            self._snapshot = Snapshot(old.version + 1, merged, times)
+            history = self._history
+            if history is not None:
+                t_mono = time.perf_counter() if t_mono is None else t_mono
+                for name, v in update.items():
+                    h = history.get(name)
+                    if h is None:
+                        h = history[name] = _History(self._history_capacity)
+                    h.append(t_mono, v)
+
+    def history(self, name):
+        """(perf_counter times, values) of the kept samples of `name`, oldest first; None if none."""
+        with self._lock:
+            h = self._history.get(name) if self._history is not None else None
+            return h.copy() if h is not None else None
+
+    def history_end(self, name):
+        """perf_counter time of the newest kept sample of `name`, or None."""
+        with self._lock:
+            h = self._history.get(name) if self._history is not None else None
+            return h.last_time() if h is not None else None
+
+    def snapshot(self):
+        return self._snapshot
+
+    def row(self, names, default=0.0):
+        """Shortcut for snapshot().row(names)."""
+        return self._snapshot.row(names, default)
+
+
+# Shared by the controllers, drivers and loggers of this process
+telemetry_store = TelemetryStore()
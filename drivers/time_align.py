@@ -0,0 +1,144 @@
+import numpy as np
+
+from drivers.latency import TIMELABEL_TICK_S, TIMELABEL_WRAP
+
+# Channels that are angles in degrees and wrap at +-180
+ANGLE_CHANNELS = frozenset(("Roll_deg", "Pitch_deg", "Yaw_deg"))
+# Discrete channels: a mean would be a state that never existed, so they take
+# the value in effect at the window end
+HOLD_CHANNELS = frozenset(("FilterPos", "MotorAlarmCode", "TempCtrl_set"))
+
+
+class DeviceClock(object):
+    """
+    Maps AvaSpec timelabels onto the host time.perf_counter() clock.
+
+    A scan reaches the host some transfer time after its timelabel, so
+    host - device is the clock offset plus a positive delay. The smallest
+    difference seen is the best offset estimate; it is allowed to rise by
+    `drift` seconds per second so that oscillator drift between the two
+    clocks is followed instead of accumulating.
+    """
+
+    def __init__(self, drift=1e-4):
+        self.drift = drift
+        self.offset = None
+        self._t_last = None
+        self._last_timelabel = None
+        self._wraps = 0
+
+    def reset(self):
+        self.offset = None
+        self._t_last = None
+        self._last_timelabel = None
+        self._wraps = 0
+
+    def observe(self, timelabel, t_host):
+        """Account for a scan that arrived at `t_host`; returns its timelabel on the host clock."""
+        if self._last_timelabel is not None and timelabel < self._last_timelabel - TIMELABEL_WRAP // 2:
+            self._wraps += 1
+        self._last_timelabel = timelabel
+        t_device = (timelabel + self._wraps * TIMELABEL_WRAP) * TIMELABEL_TICK_S
+        sample = t_host - t_device
+        if self.offset is None:
+            self.offset = sample
+        else:
+            self.offset = min(sample, self.offset + self.drift * (t_host - self._t_last))
+        self._t_last = t_host
+        return t_device + self.offset
+
+
+def scan_window(t_label_host, integration_ms, averages=1, scans=1):
+    """
+    Host-clock [start, end] of the light collected for a record: `scans`
+    consecutive scans of `averages` x `integration_ms`, the last of which
+    has its timelabel (end of integration) at `t_label_host`.
+    """
+    return t_label_host - scans * averages * integration_ms / 1000.0, t_label_host
+
+
+def _window_means(ts, vs, a, b):
+    """
+    Time average over [a, b] of the piecewise-linear signal through (ts, vs),
+    held constant outside the samples; the value at a where b <= a.
+    """
+    if ts.size == 1:
+        return np.full(a.shape, vs[0])
+    dt = np.diff(ts)
+    # Cumulative integral at every sample
+    cum = np.concatenate(([0.0], np.cumsum(0.5 * (vs[:-1] + vs[1:]) * dt)))
+    slope = np.divide(np.diff(vs), dt, out=np.zeros_like(dt), where=dt > 0)
+
+    def integral(q):
+        qc = np.clip(q, ts[0], ts[-1])
+        i = np.clip(np.searchsorted(ts, qc, side="right") - 1, 0, ts.size - 2)
+        d = qc - ts[i]
+        inside = cum[i] + vs[i] * d + 0.5 * slope[i] * d * d
+        return inside + np.where(q > ts[-1], vs[-1] * (q - ts[-1]), 0.0) + np.where(q < ts[0], vs[0] * (q - ts[0]), 0.0)
+
+    width = b - a
+    means = np.interp(a, ts, vs)
+    span = width > 0
+    if span.any():
+        means[span] = (integral(b[span]) - integral(a[span])) / width[span]
+    return means
+
+
+class TelemetryAligner(object):
+    """
+    Telemetry averaged over each record's integration window.
+
+    align() takes the window starts and ends of a batch of records (host
+    perf_counter clock) and, per channel, averages the linearly interpolated
+    samples kept by the TelemetryStore over every window in one vectorized
+    pass; a zero-length window gets the interpolated value. Windows beyond
+    the kept samples use the nearest sample, channels without history their
+    latest snapshot value. Angles are unwrapped before averaging; `hold`
+    channels are not averaged but take the last sample at or before the
+    window end.
+    """
+
+    def __init__(self, store, names, angles=ANGLE_CHANNELS, hold=HOLD_CHANNELS):
+        self.store = store
+        self.names = tuple(names)
+        self.angles = frozenset(angles)
+        self.hold = frozenset(hold)
+
+    def covered_until(self, since):
+        """
+        Time of the oldest newest-sample among the channels that published
+        after `since` (perf_counter clock): every such channel has a sample at
+        or after it. None if no channel has published since then.
+        """
+        ends = [t for t in map(self.store.history_end, self.names) if t is not None and t > since]
+        return min(ends) if ends else None
+
+    def align(self, starts, ends):
+        """(records x channels) array of window-averaged telemetry."""
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        out = np.empty((starts.size, len(self.names)))
+        snapshot = self.store.snapshot()
+        for j, name in enumerate(self.names):
+            history = self.store.history(name)
+            if history is None or history[0].size == 0:
+                out[:, j] = snapshot.get(name)
+                continue
+            ts, vs = history
+            if ts.size > 1 and np.any(np.diff(ts) < 0):
+                order = np.argsort(ts, kind="stable")
+                ts, vs = ts[order], vs[order]
+            if starts.size:
+                # Only the samples around the batch matter
+                lo = max(int(np.searchsorted(ts, starts.min(), side="right")) - 1, 0)
+                hi = int(np.searchsorted(ts, ends.max(), side="left")) + 1
+                ts, vs = ts[lo:hi], vs[lo:hi]
+            if name in self.hold:
+                i = np.searchsorted(ts, ends, side="right") - 1
+                out[:, j] = vs[np.clip(i, 0, ts.size - 1)]
+            elif name in self.angles:
+                means = _window_means(ts, np.unwrap(vs, period=360.0), starts, ends)
+                out[:, j] = (means + 180.0) % 360.0 - 180.0
+            else:
+                out[:, j] = _window_means(ts, vs, starts, ends)
+        return out
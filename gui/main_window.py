@@ -15,6 +15,27 @@ from controllers.imu_controller import IMUController
 from controllers.spectrometer_controller import SpectrometerController
 from controllers.temp_controller import TempController
 from controllers.thp_controller import THPController
+from drivers.telemetry import telemetry_store
+from drivers.time_align import DeviceClock, TelemetryAligner
+from storage.segments import SegmentCompressor, SegmentedLogSink, recover_directory
+from storage.log_writer import BackgroundWriter, DurabilityPolicy, TextLogSink
+from storage.recorder import AlignedTelemetrySink, SpectrumRecorder, RECORD_COLUMNS
+
+# Telemetry stored with every spectrum: (column name, CSV export format)
+TELEMETRY_COLUMNS = [
+    ("MotorPos_steps", ".0f"), ("MotorSpeed_steps_s", ".0f"),
+    ("MotorCurrent_pct", ".1f"), ("MotorAlarmCode", ".0f"), ("MotorTemp_C", "g"),
+    ("MotorAngle_deg", "g"), ("FilterPos", ".0f"),
+    ("Roll_deg", ".2f"), ("Pitch_deg", ".2f"), ("Yaw_deg", ".2f"),
+    ("AccelX_g", ".2f"), ("AccelY_g", ".2f"), ("AccelZ_g", ".2f"),
+    ("GyroX_dps", ".2f"), ("GyroY_dps", ".2f"), ("GyroZ_dps", ".2f"),
+    ("MagX_uT", ".2f"), ("MagY_uT", ".2f"), ("MagZ_uT", ".2f"),
+    ("Pressure_hPa", ".2f"), ("Temperature_C", ".2f"), ("TempCtrl_curr", ".2f"), ("TempCtrl_set", ".2f"),
+    ("Latitude_deg", ".6f"), ("Longitude_deg", ".6f"),
+    ("THP_Temp_C", ".2f"), ("THP_Humidity_pct", ".2f"), ("THP_Pressure_hPa", ".2f"),
+]
+TELEMETRY_NAMES = tuple(name for name, _ in TELEMETRY_COLUMNS)
+LOG_COLUMNS = RECORD_COLUMNS + TELEMETRY_COLUMNS
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -24,7 +45,7 @@ class MainWindow(QMainWindow):
 
         self.config = {}
         try:
-            config_path = os.path.join(os.path.dirname(__file__), "..", "hardware_config.json")
+            config_path = os.environ.get("HARDWARE_CONFIG") or os.path.join(os.path.dirname(__file__), "..", "hardware_config.json")
             with open(config_path, 'r') as cfg_file:
                 self.config = json.load(cfg_file)
         except Exception as e:
@@ -92,41 +113,109 @@ class MainWindow(QMainWindow):
         self.log_dir = "data"
         os.makedirs(self.csv_dir, exist_ok=True)
         os.makedirs(self.log_dir, exist_ok=True)
-        self.csv_file = None
+        self.data_log = None
         self.log_file = None
+        self.recorder = None
         self.continuous_saving = False
-
+        # Average this many consecutive scans into one logged spectrum (1 = log every scan)
+        self.record_coadd = int(self.config.get("record_coadd", 1))
+        # Average telemetry over each record's integration window instead of taking the latest
+        # values; telemetry_history samples per channel are kept for that
+        self.record_align_telemetry = bool(self.config.get("record_align_telemetry", True))
+        if self.record_align_telemetry:
+            telemetry_store.keep_history(int(self.config.get("telemetry_history", 4096)))
+        # Longest a record waits for telemetry samples after its window before it is written
+        self.record_align_wait_s = float(self.config.get("record_align_wait_s", 1.0))
+        self._recorded_scans = 0
+        # Records per appended chunk of the binary log
+        self.log_chunk_rows = int(self.config.get("log_chunk_rows", 30))
+        # Data log segments: new file every log_rotate_s seconds (on the hour by default) or
+        # log_rotate_mb, closed segments compressed with log_compression ("gzip", "zstd" or null)
+        self.log_rotate_s = float(self.config.get("log_rotate_s", 3600))
+        self.log_rotate_bytes = int(float(self.config.get("log_rotate_mb", 0)) * 1024 * 1024)
+        self.log_compression = self.config.get("log_compression", "gzip")
+        # "delta" stores spectra as lossless scaled integers (float64 in, float64 out), null as float32
+        self.log_pixel_codec = self.config.get("log_pixel_codec", "delta") or None
+        # Both logs are written on background threads; this decides when they are fsynced.
+        # Chunks carry checksums, so a crash costs at most the unsynced records: segments
+        # left open are truncated to their last intact chunk at the next start.
+        self.log_policy = DurabilityPolicy.from_config(self.config)
+        self._log_dropped = 0
+        self._recover_logs()
+
+        # Writes the text log summary
         self.save_data_timer = QTimer(self)
         self.save_data_timer.timeout.connect(self.save_continuous_data)
 
+    def _recover_logs(self):
+        # Segments still to be compressed are queued to a background compressor, not done here
+        compressor = SegmentCompressor(self.log_compression) if self.log_compression else None
+        try:
+            recovered = recover_directory(self.csv_dir, compressor)
+        except OSError as e:
+            print(f"[WARN] Log recovery failed: {e}")
+            return
+        finally:
+            if compressor is not None:
+                compressor.close()
+        if not recovered:
+            return
+        entries = [e for changed in recovered.values() for e in changed]
+        records = sum(e.get("records", 0) for e in entries if e.get("recovered"))
+        lost = sum(e.get("truncated_bytes", 0) for e in entries)
+        self.statusBar().showMessage(
+            f"Recovered {len(entries)} log segment(s) after an unclean shutdown: "
+            f"{records} records kept, {lost} torn bytes dropped")
+
     def toggle_data_saving(self):
         if not self.continuous_saving:
-            if self.csv_file:
-                self.csv_file.close()
+            if self.data_log:
+                self.data_log.close()
             if self.log_file:
                 self.log_file.close()
             ts = QDateTime.currentDateTime().toString("yyyyMMdd_hhmmss")
-            self.csv_file_path = os.path.join(self.csv_dir, f"log_{ts}.csv")
             self.log_file_path = os.path.join(self.log_dir, f"log_{ts}.txt")
+            devices = self.spec_ctrl.devices
+            serials = [dev.serial for dev in devices]
+            meta = {"serial": serials[0] if serials else ""}
+            # Several detectors: one record per trigger, their spectra side by side in device order
+            multi = self.spec_ctrl.multi is not None
+            wavelengths = self.spec_ctrl.wls
+            if multi:
+                wavelengths = np.concatenate([dev.wls for dev in devices])
+                meta["devices"] = [{"serial": dev.serial, "npix": dev.npix} for dev in devices]
             try:
-                self.csv_file = open(self.csv_file_path, "w", encoding="utf-8", newline="")
-                self.log_file = open(self.log_file_path, "w", encoding="utf-8")
+                data_sink = SegmentedLogSink(
+                    self.csv_dir, f"log_{ts}", LOG_COLUMNS, wavelengths,
+                    rotate_s=self.log_rotate_s, rotate_bytes=self.log_rotate_bytes,
+                    compression=self.log_compression, chunk_rows=self.log_chunk_rows,
+                    pixel_dtype="<f8" if self.log_pixel_codec else "<f4", pixel_codec=self.log_pixel_codec,
+                    meta=meta)
+                self.data_log_path = data_sink.manifest_path
+                if self.record_align_telemetry:
+                    data_sink = AlignedTelemetrySink(data_sink, TelemetryAligner(telemetry_store, TELEMETRY_NAMES),
+                                                     max_wait_s=self.record_align_wait_s)
+                text_sink = TextLogSink(self.log_file_path)
             except Exception as e:
                 self.statusBar().showMessage(f"Cannot open files: {e}")
                 return
-            headers = [
-                "Timestamp", "MotorPos_steps", "MotorSpeed_steps_s", "MotorCurrent_pct",
-                "MotorAlarmCode", "MotorTemp_C", "MotorAngle_deg", "FilterPos",
-                "Roll_deg", "Pitch_deg", "Yaw_deg", "AccelX_g", "AccelY_g", "AccelZ_g",
-                "GyroX_dps", "GyroY_dps", "GyroZ_dps", "MagX_uT", "MagY_uT", "MagZ_uT",
-                "Pressure_hPa", "Temperature_C", "TempCtrl_curr", "TempCtrl_set",
-                "Latitude_deg", "Longitude_deg", "IntegrationTime_us",
-                "THP_Temp_C", "THP_Humidity_pct", "THP_Pressure_hPa"
-            ]
-            headers += [f"Pixel_{i}" for i in range(len(self.spec_ctrl.intens))]
-            self.csv_file.write(",".join(headers) + "\n")
-            self.csv_file.flush()
-            os.fsync(self.csv_file.fileno())
+            # Fed from the acquisition thread, which must never wait: drop instead of blocking
+            self.data_log = BackgroundWriter(data_sink, self.log_policy, block_timeout_s=0,
+                                             name="data-log-writer")
+            self.log_file = BackgroundWriter(text_sink, self.log_policy, name="text-log-writer")
+            self._log_dropped = 0
+            self._recorded_scans = 0
+            if self.record_align_telemetry:
+                self.recorder = SpectrumRecorder(self.data_log, len(wavelengths), None,
+                                                 coadd=self.record_coadd, clock=DeviceClock())
+            else:
+                # Every record takes its telemetry from one published snapshot
+                self.recorder = SpectrumRecorder(self.data_log, len(wavelengths),
+                                                 lambda: telemetry_store.row(TELEMETRY_NAMES), coadd=self.record_coadd)
+            if multi:
+                self.spec_ctrl.add_record_listener(self.recorder.on_record)
+            else:
+                self.spec_ctrl.add_scan_listener(self.recorder.on_scan)
             self.save_data_timer.start(1000)
             self.continuous_saving = True
             self.spec_ctrl.toggle_btn.setText("Pause Saving")
@@ -135,74 +224,43 @@ class MainWindow(QMainWindow):
         else:
             self.continuous_saving = False
             self.save_data_timer.stop()
-            if self.csv_file:
-                self.csv_file.close()
+            self.handle_status_message("Saving stopped")
+            summary = "Saving stopped."
+            if self.recorder:
+                self.spec_ctrl.remove_scan_listener(self.recorder.on_scan)
+                self.spec_ctrl.remove_record_listener(self.recorder.on_record)
+                self.recorder.flush()
+                self.recorder = None
+            if self.data_log:
+                self.data_log.close()
+                m = self.data_log.metrics()
+                summary = (f"Saving stopped: {m['written']} records, {m['dropped']} dropped, "
+                           f"max queue {m['max_queue_depth']}, write latency max {m['max_latency_ms']:.0f} ms, fsync max {m['max_fsync_ms']:.0f} ms")
+                self.data_log = None
             if self.log_file:
                 self.log_file.close()
+                self.log_file = None
             self.spec_ctrl.toggle_btn.setText("Start Saving")
-            self.statusBar().showMessage("Saving stopped.")
-            self.handle_status_message("Saving stopped")
+            self.statusBar().showMessage(summary)
 
     def save_continuous_data(self):
-        if not (self.csv_file and self.log_file):
+        if not (self.data_log and self.log_file and self.recorder):
             return
         try:
-            now = QDateTime.currentDateTime()
-            ts_csv = now.toString("yyyy-MM-dd hh:mm:ss.zzz")
-            ts_txt = now.toString("yyyy-MM-dd hh:mm:ss")
-
-            motor_pos = getattr(self.motor_ctrl, "current_angle", 0)
-            motor_speed = getattr(self.motor_ctrl, "current_speed", 0)
-            motor_current_pct = getattr(self.motor_ctrl, "current_percent", 0)
-            motor_alarm = getattr(self.motor_ctrl, "alarm_code", 0)
-            motor_temp = getattr(self.motor_ctrl, "temperature", 0)
-            motor_angle = getattr(self.motor_ctrl, "current_angle_deg", 0)
-
-            filter_pos = self.filter_ctrl.get_position()
-            if filter_pos is None:
-                filter_pos = getattr(self.filter_ctrl, "current_position", 0)
-
-            imu = getattr(self.imu_ctrl, "latest", {})
-            r, p, y = imu.get("rpy", (0, 0, 0))
-            ax, ay, az = imu.get("accel", (0, 0, 0))
-            gx, gy, gz = imu.get("gyro", (0, 0, 0))
-            mx, my, mz = imu.get("mag", (0, 0, 0))
-            pres = imu.get("pressure", 0)
-            temp_env = imu.get("temperature", 0)
-            lat = imu.get("latitude", 0)
-            lon = imu.get("longitude", 0)
-
-            tc_curr = getattr(self.temp_ctrl, "current_temp", 0)
-            tc_set = getattr(self.temp_ctrl, "setpoint", 0)
-
-            intensities = self.spec_ctrl.intens  # Pixel counts
-            integ_us = getattr(self, "current_integration_time_us", 0)
-
-            thp = self.thp_ctrl.get_latest()
-            thp_temp = thp.get("temperature", 0)
-            thp_hum = thp.get("humidity", 0)
-            thp_pres = thp.get("pressure", 0)
-
-            row = [
-                ts_csv, str(motor_pos), str(motor_speed), f"{motor_current_pct:.1f}",
-                str(motor_alarm), str(motor_temp), str(motor_angle), str(filter_pos),
-                f"{r:.2f}", f"{p:.2f}", f"{y:.2f}", f"{ax:.2f}", f"{ay:.2f}", f"{az:.2f}",
-                f"{gx:.2f}", f"{gy:.2f}", f"{gz:.2f}", f"{mx:.2f}", f"{my:.2f}", f"{mz:.2f}",
-                f"{pres:.2f}", f"{temp_env:.2f}", f"{tc_curr:.2f}", f"{tc_set:.2f}",
-                f"{lat:.6f}", f"{lon:.6f}", str(integ_us), f"{thp_temp:.2f}",
-                f"{thp_hum:.2f}", f"{thp_pres:.2f}"
-            ]
-            row.extend([f"{val:.4f}" for val in intensities])
-            line = ",".join(row) + "\n"
-            self.csv_file.write(line)
-            self.csv_file.flush()
-            os.fsync(self.csv_file.fileno())
-
-            peak = max(intensities) if intensities else 0
-            txt_line = f"{ts_txt} | Peak {peak:.1f}\n"
-            self.log_file.write(txt_line)
-            self.log_file.flush()
-            os.fsync(self.log_file.fileno())
+            ts_txt = QDateTime.currentDateTime().toString("yyyy-MM-dd hh:mm:ss")
+            _, intensities, meta = self.spec_ctrl.latest()
+            integ_us = int(round(meta["integration_ms"] * 1000)) if meta else 0
+            peak = float(intensities.max()) if intensities.size else 0
+            scans = self.recorder.scans - self._recorded_scans
+            self._recorded_scans = self.recorder.scans
+            txt_line = (f"{ts_txt} | Peak {peak:.1f} | IntTime {integ_us / 1000:.2f} ms"
+                        f" | Scans {scans} | Records {self.recorder.records}\n")
+            self.log_file.submit(txt_line)
+
+            dropped = self.data_log.dropped + self.log_file.dropped
+            if dropped > self._log_dropped:
+                self._log_dropped = dropped
+                self.statusBar().showMessage(f"Disk too slow: {dropped} log records dropped")
         except Exception as e:
             print("save_continuous_data error:", e)
             self.statusBar().showMessage(f"Save error: {e}")
@@ -234,9 +292,4 @@ class MainWindow(QMainWindow):
             level = "INFO"
         ts = QDateTime.currentDateTime().toString("yyyy-MM-dd hh:mm:ss")
         log_line = f"{ts} [{level}] {message}\n"
-        try:
-            self.log_file.write(log_line)
-            self.log_file.flush()
-            os.fsync(self.log_file.fileno())
-        except Exception as e:
-            print(f"Log write error: {e}")
+        self.log_file.submit(log_line)
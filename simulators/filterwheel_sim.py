@@ -0,0 +1,67 @@
+"""
+filterwheel_sim.py  –  ASCII filter wheel
+
+Commands end with CR, as drivers/filterwheel.py sends them:
+
+    F<w>r   reset wheel <w> to position 1
+    F<w><n> move wheel <w> to position <n>
+    ?       reply with the current position, e.g. "5\\r\\n"
+
+A move takes `step_s` per position travelled (the driver waits 1 s before
+asking); a query during a move reports the position the wheel is passing.
+Unknown commands are answered with "ER\\r\\n".
+"""
+
+import time
+
+from simulators.pty_device import PtyDevice
+
+
+class FilterWheelSim(PtyDevice):
+    name = "filterwheel"
+
+    def __init__(self, positions=9, step_s=0.1, baud=4800, faults=None, link=None):
+        super().__init__(faults=faults, baud=baud, link=link)
+        self.positions = positions
+        self.step_s = step_s
+        self._from = 1
+        self._to = 1
+        self._t_move = 0.0
+        self._line = b""
+
+    def position(self, now=None):
+        now = time.perf_counter() if now is None else now
+        travelled = int((now - self._t_move) / self.step_s) if self.step_s > 0 else abs(self._to - self._from)
+        if travelled >= abs(self._to - self._from):
+            return self._to
+        return self._from + (travelled if self._to > self._from else -travelled)
+
+    def _move(self, target):
+        self._from = self.position()
+        self._to = target
+        self._t_move = time.perf_counter()
+
+    def handle(self, data):
+        if not self.baud_ok():
+            self.ignored += 1
+            return
+        self._line += data
+        while b"\r" in self._line:
+            raw, _, self._line = self._line.partition(b"\r")
+            command = raw.decode("ascii", errors="replace").strip()
+            if not command:
+                continue
+            if command == "?":
+                self.reply(f"{self.position()}\r\n".encode("ascii"))
+            elif len(command) >= 3 and command[0] == "F" and command[1].isdigit():
+                arg = command[2:]
+                if arg == "r":
+                    self._move(1)
+                    self.requests += 1
+                elif arg.isdigit() and 1 <= int(arg) <= self.positions:
+                    self._move(int(arg))
+                    self.requests += 1
+                else:
+                    self.reply(b"ER\r\n")
+            else:
+                self.reply(b"ER\r\n")
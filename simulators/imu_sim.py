@@ -0,0 +1,113 @@
+"""
+imu_sim.py  –  WitMotion IMU streaming 0x55 frames
+
+Streams 11-byte frames (0x55, type, 8 data bytes, sum checksum) the way a
+WitMotion module does, `rate_hz` times per second for each type in
+`packets`:
+
+    0x51 acceleration   0x52 angular rate   0x53 angle   0x54 magnetic field
+    0x56 pressure (int32 Pa) and altitude (int32 cm)
+    0x57 longitude and latitude (int32, ddmm.mmmmm x 1e5)
+
+The orientation swings slowly around `heading_deg`; the position is fixed
+at `latitude`, `longitude`. Host commands are accepted and ignored. With
+LinkFaults, corrupt_rate and noise_rate apply to each frame, so the
+driver's resynchronisation is exercised.
+"""
+
+import math
+import struct
+
+from simulators.pty_device import PtyDevice
+
+DEFAULT_PACKETS = (0x51, 0x52, 0x53, 0x54, 0x56, 0x57)
+
+
+def frame(packet_id, data):
+    """0x55 frame around 8 data bytes, with the WitMotion sum checksum."""
+    body = bytes((0x55, packet_id)) + data
+    return body + bytes((sum(body) & 0xFF,))
+
+
+def _i16(value, full_scale):
+    return max(-32768, min(32767, int(round(value / full_scale * 32768.0))))
+
+
+def _ddmm(degrees):
+    d = int(abs(degrees))
+    minutes = (abs(degrees) - d) * 60.0
+    return int(math.copysign(d * 10000000 + round(minutes * 100000), degrees))
+
+
+class IMUSim(PtyDevice):
+    name = "imu"
+
+    def __init__(self, rate_hz=10.0, packets=DEFAULT_PACKETS, baud=9600, faults=None, link=None,
+                 latitude=37.5665, longitude=126.9780, heading_deg=90.0, pressure_hpa=1013.25,
+                 temperature_c=25.0):
+        super().__init__(faults=faults, baud=baud, link=link, period_s=1.0 / rate_hz)
+        self.packets = tuple(packets)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.heading_deg = heading_deg
+        self.pressure_hpa = pressure_hpa
+        self.temperature_c = temperature_c
+        self.frames = 0
+        self._t0 = None
+
+    def handle(self, data):
+        # Configuration commands from the host are not emulated
+        pass
+
+    def attitude(self, t):
+        roll = 2.0 * math.sin(2 * math.pi * t / 7.0)
+        pitch = 1.5 * math.sin(2 * math.pi * t / 11.0)
+        yaw = (self.heading_deg + 10.0 * math.sin(2 * math.pi * t / 30.0) + 180.0) % 360.0 - 180.0
+        return roll, pitch, yaw
+
+    def frames_at(self, t):
+        """The frames of one output period at `t` seconds since start."""
+        roll, pitch, yaw = self.attitude(t)
+        temp = int(round(self.temperature_c * 100))
+        out = []
+        for packet_id in self.packets:
+            if packet_id == 0x51:
+                g = (math.sin(math.radians(pitch)), -math.sin(math.radians(roll)), 1.0)
+                data = struct.pack("<hhhh", *(_i16(v, 16.0) for v in g), temp)
+            elif packet_id == 0x52:
+                rates = (2 * math.pi / 7.0 * 2.0 * math.cos(2 * math.pi * t / 7.0),
+                         2 * math.pi / 11.0 * 1.5 * math.cos(2 * math.pi * t / 11.0),
+                         2 * math.pi / 30.0 * 10.0 * math.cos(2 * math.pi * t / 30.0))
+                data = struct.pack("<hhhh", *(_i16(v, 2000.0) for v in rates), 0)
+            elif packet_id == 0x53:
+                data = struct.pack("<hhhH", _i16(roll, 180.0), _i16(pitch, 180.0), _i16(yaw, 180.0), 0)
+            elif packet_id == 0x54:
+                h = math.radians(yaw)
+                field = (30.0 * math.cos(h), -30.0 * math.sin(h), -40.0)
+                data = struct.pack("<hhhh", *(_i16(v, 1000.0) for v in field), temp)
+            elif packet_id == 0x56:
+                data = struct.pack("<ii", int(round(self.pressure_hpa * 100)), 0)
+            elif packet_id == 0x57:
+                data = struct.pack("<ii", _ddmm(self.longitude), _ddmm(self.latitude))
+            else:
+                continue
+            out.append(frame(packet_id, data))
+        return out
+
+    def tick(self, now):
+        if self._t0 is None:
+            self._t0 = now
+        if not self.baud_ok():
+            # Port closed or set to another speed: nothing readable arrives
+            self.ignored += 1
+            return
+        out = []
+        for f in self.frames_at(now - self._t0):
+            data = self.faults.apply(f)
+            if data is None:
+                self.dropped += 1
+                continue
+            out.append(data)
+        # Streamed: frames the host does not read in time are lost
+        self.write(b"".join(out), wait_s=0.0)
+        self.frames += len(out)
@@ -0,0 +1,152 @@
+"""
+motor_sim.py  –  Oriental Motor AZ series driver on Modbus RTU
+
+Answers Read Holding Registers (0x03/0x04), Write Single Register (0x06)
+and Write Multiple Registers (0x10) for one slave address, with CRC
+checking and exception responses (illegal function / address / value).
+Requests with a bad CRC, for another address or at the wrong baud are
+ignored, as on a real RS-485 bus; broadcasts are executed silently.
+
+A direct data operation written at 0x0058 (drivers.motor.move_registers)
+starts an absolute move at the given speed; the monitor registers of
+drivers.motor.MOTOR_MONITOR (alarm, feedback position and speed, torque,
+motor temperature) follow the simulated motion. Set `alarm_code` to
+inject an alarm.
+"""
+
+import struct
+
+from drivers.modbus import check_crc, crc_bytes, int32_to_registers, registers_to_int32
+from drivers.motor import DIRECT_DATA_ADDR, MOTOR_MONITOR, SlaveID
+from simulators.pty_device import PtyDevice
+
+REGISTER_LIMIT = 0x2000      # addresses at or above answer "illegal data address"
+POSITION_REG = DIRECT_DATA_ADDR + 4
+SPEED_REG = DIRECT_DATA_ADDR + 6
+TRIGGER_REG = DIRECT_DATA_ADDR + 14
+
+
+class AZMotorSim(PtyDevice):
+    name = "motor"
+
+    def __init__(self, slave=SlaveID, baud=115200, faults=None, link=None, ambient_c=25.0):
+        super().__init__(faults=faults, baud=baud, link=link, period_s=0.01)
+        self.slave = slave
+        self.registers = [0] * REGISTER_LIMIT
+        self.position = 0.0
+        self.target = 0.0
+        self.speed = 0.0
+        self.temperature = ambient_c
+        self.ambient_c = ambient_c
+        self.alarm_code = 0
+        self.moves = 0
+        self._buffer = b""
+        self._last_tick = None
+        self._update_monitor()
+
+    # -- motion -------------------------------------------------------------
+
+    def _int32(self, address):
+        return registers_to_int32(self.registers[address:address + 2])[0]
+
+    def _set_int32(self, address, value):
+        self.registers[address:address + 2] = int32_to_registers([int(value)])
+
+    def _start_move(self):
+        self.target = float(self._int32(POSITION_REG))
+        self.speed = float(abs(self._int32(SPEED_REG))) or 1.0
+        self.moves += 1
+
+    def tick(self, now):
+        dt = 0.0 if self._last_tick is None else now - self._last_tick
+        self._last_tick = now
+        moving = self.position != self.target
+        if moving:
+            step = self.speed * dt
+            if abs(self.target - self.position) <= step:
+                self.position = self.target
+            else:
+                self.position += step if self.target > self.position else -step
+        # First-order warming while driving, cooling to ambient at rest
+        goal = self.ambient_c + (15.0 if moving else 3.0)
+        self.temperature += (goal - self.temperature) * min(dt / 60.0, 1.0)
+        self._update_monitor()
+
+    def _update_monitor(self):
+        moving = self.position != self.target
+        values = {
+            "MotorAlarmCode": self.alarm_code,
+            "MotorPos_steps": round(self.position),
+            "MotorSpeed_steps_s": (self.speed if self.target > self.position else -self.speed) if moving else 0,
+            "MotorCurrent_pct": 350 if moving else 100,
+            "MotorTemp_C": round(self.temperature * 10),
+        }
+        for name, (address, _) in MOTOR_MONITOR.items():
+            self._set_int32(address, values.get(name, 0))
+
+    # -- protocol -----------------------------------------------------------
+
+    def handle(self, data):
+        if not self.baud_ok():
+            self.ignored += 1
+            self._buffer = b""
+            return
+        self._buffer += data
+        while len(self._buffer) >= 8:
+            length = self._frame_length(self._buffer)
+            if length is None or len(self._buffer) < length:
+                if length is None or length > 256:
+                    self._buffer = b""
+                return
+            frame, self._buffer = self._buffer[:length], self._buffer[length:]
+            if not check_crc(frame) or frame[0] not in (self.slave, 0):
+                # Noise or another slave's traffic: resynchronise on the next chunk
+                self.ignored += 1
+                self._buffer = b""
+                return
+            response = self._execute(frame[1], frame[2:-2])
+            if frame[0] == 0:
+                continue
+            self.reply(response + crc_bytes(response))
+
+    @staticmethod
+    def _frame_length(buf):
+        function = buf[1]
+        if function in (0x03, 0x04, 0x05, 0x06):
+            return 8
+        if function in (0x0F, 0x10):
+            return 9 + buf[6] if len(buf) > 6 else 256
+        return len(buf)   # unknown function: the whole chunk, answered with an exception
+
+    def _exception(self, function, code):
+        return bytes((self.slave, function | 0x80, code))
+
+    def _execute(self, function, payload):
+        if function in (0x03, 0x04):
+            address, count = struct.unpack(">HH", payload[:4])
+            if not 1 <= count <= 125:
+                return self._exception(function, 0x03)
+            if address + count > REGISTER_LIMIT:
+                return self._exception(function, 0x02)
+            regs = self.registers[address:address + count]
+            return bytes((self.slave, function, 2 * count)) + struct.pack(f">{count}H", *regs)
+        if function == 0x06:
+            address, value = struct.unpack(">HH", payload[:4])
+            if address >= REGISTER_LIMIT:
+                return self._exception(function, 0x02)
+            self._write(address, [value])
+            return bytes((self.slave, function)) + payload[:4]
+        if function == 0x10:
+            address, count, nbytes = struct.unpack(">HHB", payload[:5])
+            if not 1 <= count <= 123 or nbytes != 2 * count or len(payload) != 5 + nbytes:
+                return self._exception(function, 0x03)
+            if address + count > REGISTER_LIMIT:
+                return self._exception(function, 0x02)
+            self._write(address, list(struct.unpack(f">{count}H", payload[5:])))
+            return bytes((self.slave, function)) + payload[:4]
+        return self._exception(function, 0x01)
+
+    def _write(self, address, values):
+        self.registers[address:address + len(values)] = values
+        if address <= TRIGGER_REG + 1 < address + len(values) and self._int32(TRIGGER_REG) != 0:
+            self._start_move()
@@ -0,0 +1,225 @@
+"""
+pty_device.py  –  base class of the serial-device simulators
+
+A PtyDevice opens a Linux pseudo-terminal pair. The application opens the
+slave side (`device.port`, e.g. /dev/pts/7, or a stable symlink such as
+/tmp/sim_motor) exactly like a COM port; the simulator reads requests from
+the master side on its own thread and writes replies back. The slave side
+is held open by the simulator too, so drivers can close and reopen the
+port (the THP driver does this on every read) without hanging up the link.
+
+Every device takes a LinkFaults for latency and fault injection, and an
+optional `baud`: requests are then ignored unless the application has set
+the port to that speed, as a real device would see line noise. A pty
+moves bytes as fast as both sides can, so the baud rate does not pace the
+traffic: a simulated link can carry more than the real line would.
+"""
+
+import os
+import random
+import select
+import termios
+import threading
+import time
+import tty
+
+
+# termios speed constant -> bits/s
+_BAUD_BY_SPEED = {getattr(termios, name): int(name[1:]) for name in dir(termios)
+                  if name.startswith("B") and name[1:].isdigit()}
+
+
+class LinkFaults(object):
+    """
+    What the simulated link does to replies.
+
+    latency_s, jitter_s: delay before a reply (plus uniform 0..jitter_s)
+    drop_rate: probability a request gets no reply
+    corrupt_rate: probability one byte of a reply is flipped
+    truncate_rate: probability a reply is cut short
+    noise_rate: probability of stray bytes before a reply
+    """
+
+    def __init__(self, latency_s=0.0, jitter_s=0.0, drop_rate=0.0, corrupt_rate=0.0, truncate_rate=0.0,
+                 noise_rate=0.0, seed=None):
+        self.latency_s = float(latency_s)
+        self.jitter_s = float(jitter_s)
+        self.drop_rate = float(drop_rate)
+        self.corrupt_rate = float(corrupt_rate)
+        self.truncate_rate = float(truncate_rate)
+        self.noise_rate = float(noise_rate)
+        self.rng = random.Random(seed)
+
+    def delay(self):
+        return self.latency_s + (self.rng.uniform(0.0, self.jitter_s) if self.jitter_s else 0.0)
+
+    def apply(self, reply):
+        """The bytes that actually arrive for `reply` (None = dropped)."""
+        rng = self.rng
+        if self.drop_rate and rng.random() < self.drop_rate:
+            return None
+        reply = bytearray(reply)
+        if self.corrupt_rate and reply and rng.random() < self.corrupt_rate:
+            reply[rng.randrange(len(reply))] ^= 1 << rng.randrange(8)
+        if self.truncate_rate and len(reply) > 1 and rng.random() < self.truncate_rate:
+            reply = reply[:rng.randrange(1, len(reply))]
+        if self.noise_rate and rng.random() < self.noise_rate:
+            reply = bytearray(rng.getrandbits(8) for _ in range(rng.randint(1, 4))) + reply
+        return bytes(reply)
+
+
+class PtyDevice(object):
+    """
+    One simulated instrument on a pty pair.
+
+    Subclasses implement handle(data), called with every chunk of bytes the
+    application writes, and answer with reply(). Devices that talk on their
+    own (the IMU) set `period_s` and implement tick(now), called on the
+    device thread every period.
+    """
+
+    name = "device"
+
+    def __init__(self, faults=None, baud=None, link=None, period_s=None):
+        self.faults = faults or LinkFaults()
+        self.baud = baud
+        self.link = link
+        self.period_s = period_s
+        self.master, self._slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self._slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self._slave)
+        if link:
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(self.port, link)
+            self.port = link
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._app_baud = None
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self.requests = 0
+        self.replies = 0
+        self.dropped = 0
+        self.ignored = 0
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"sim-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self.master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if self.link and os.path.islink(self.link):
+            os.remove(self.link)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def stats(self):
+        return {"port": self.port, "rx_bytes": self.rx_bytes, "tx_bytes": self.tx_bytes,
+                "requests": self.requests, "replies": self.replies, "dropped": self.dropped,
+                "ignored": self.ignored}
+
+    # -- for subclasses -----------------------------------------------------
+
+    def handle(self, data):
+        raise NotImplementedError
+
+    def tick(self, now):
+        pass
+
+    def line_baud(self):
+        """Speed the application has set on the port (bits/s), or None if unknown."""
+        # Linux rejects a tcsetattr on a pty that changes only what the pty
+        # cannot honour (parity), so reopening an 8E1 port at an unchanged
+        # speed fails. Latch the application's speed and park the line at B0:
+        # every open by the application is then a speed change.
+        try:
+            attrs = termios.tcgetattr(self._slave)
+            if attrs[4] != termios.B0:
+                self._app_baud = _BAUD_BY_SPEED.get(attrs[4])
+                attrs[4] = attrs[5] = termios.B0
+                termios.tcsetattr(self._slave, termios.TCSANOW, attrs)
+        except termios.error:
+            pass
+        return self._app_baud
+
+    def baud_ok(self):
+        return self.baud is None or self.line_baud() == self.baud
+
+    def reply(self, data, count=True):
+        """Send `data` after the configured latency, through fault injection."""
+        if count:
+            self.requests += 1
+        delay = self.faults.delay()
+        if delay > 0:
+            time.sleep(delay)
+        data = self.faults.apply(data)
+        if data is None:
+            self.dropped += 1
+            return
+        self.write(data)
+        self.replies += 1
+
+    def write(self, data, wait_s=0.1):
+        """Put bytes on the line; like a UART, what nobody reads within `wait_s` is lost."""
+        with self._lock:
+            view = memoryview(data)
+            while view:
+                try:
+                    n = os.write(self.master, view)
+                except BlockingIOError:
+                    if wait_s <= 0 or not select.select([], [self.master], [], wait_s)[1]:
+                        return
+                    continue
+                except OSError:
+                    return
+                self.tx_bytes += n
+                view = view[n:]
+
+    # -- device thread ------------------------------------------------------
+
+    def _run(self):
+        next_tick = time.perf_counter() + self.period_s if self.period_s else None
+        while not self._stop.is_set():
+            timeout = 0.1
+            if next_tick is not None:
+                timeout = max(0.0, min(timeout, next_tick - time.perf_counter()))
+            try:
+                ready, _, _ = select.select([self.master], [], [], timeout)
+            except (OSError, ValueError):
+                return
+            if ready:
+                try:
+                    data = os.read(self.master, 4096)
+                except OSError:
+                    # No reader on the slave side at the moment; the fd stays valid
+                    time.sleep(0.01)
+                    continue
+                self.rx_bytes += len(data)
+                self.handle(data)
+            if next_tick is not None:
+                now = time.perf_counter()
+                if now >= next_tick:
+                    self.tick(now)
+                    # Keep the average rate; skip ticks only if far behind
+                    next_tick += self.period_s
+                    if next_tick < now - self.period_s:
+                        next_tick = now
@@ -0,0 +1,117 @@
+"""
+run.py  –  start every serial-device simulator and point the GUI at them
+
+Creates one pty per instrument (motor, filter wheel, IMU, TC-36-25, THP
+sensor), with stable symlinks in --links, and writes a hardware config
+that maps each instrument to its port. Run the application against it,
+with the software spectrometer as well:
+
+    python -m simulators.run [--latency-ms 2] [--drop 0.01] [--imu-rate 50] [--gui]
+    HARDWARE_CONFIG=/tmp/sim_ports/hardware_config.json AVASPEC_BACKEND=sim python main.py
+
+Linux only (ptys). Stop with Ctrl+C; the port statistics are printed on exit.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from simulators.filterwheel_sim import FilterWheelSim
+from simulators.imu_sim import IMUSim
+from simulators.motor_sim import AZMotorSim
+from simulators.pty_device import LinkFaults
+from simulators.tc36_sim import TC36Sim
+from simulators.thp_sim import THPSim
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def start_all(link_dir=None, faults=None, imu_rate_hz=10.0, motor_baud=115200, seed=None):
+    """Start all simulators; returns {config key: device}. `faults` holds LinkFaults keyword arguments."""
+    faults = faults or {}
+
+    def link(name):
+        return os.path.join(link_dir, name) if link_dir else None
+
+    def make_faults(i):
+        return LinkFaults(seed=None if seed is None else seed + i, **faults)
+
+    devices = {
+        "motor": AZMotorSim(baud=motor_baud, faults=make_faults(0), link=link("motor")),
+        "filterwheel": FilterWheelSim(faults=make_faults(1), link=link("filterwheel")),
+        "imu": IMUSim(rate_hz=imu_rate_hz, faults=make_faults(2), link=link("imu")),
+        "temp_controller": TC36Sim(faults=make_faults(3), link=link("temp_controller")),
+        "thp_sensor": THPSim(faults=make_faults(4), link=link("thp_sensor")),
+    }
+    for device in devices.values():
+        device.start()
+    return devices
+
+
+def write_config(devices, path, base_path=os.path.join(ROOT, "hardware_config.json")):
+    """hardware_config.json with the instrument ports replaced by the simulators'."""
+    try:
+        with open(base_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    config.update({key: device.port for key, device in devices.items()})
+    config["imu_baud"] = devices["imu"].baud
+    # The simulated ports are the only candidates worth probing for the motor
+    config["motor_scan_ports"] = False
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pty simulators of the serial instruments")
+    parser.add_argument("--links", default="/tmp/sim_ports", help="directory for stable port symlinks")
+    parser.add_argument("--config", help="hardware config to write (default: <links>/hardware_config.json)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--drop", type=float, default=0.0, help="probability a reply is lost")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="probability a reply has a flipped bit")
+    parser.add_argument("--truncate", type=float, default=0.0, help="probability a reply is cut short")
+    parser.add_argument("--noise", type=float, default=0.0, help="probability of stray bytes before a reply")
+    parser.add_argument("--imu-rate", type=float, default=10.0, help="IMU output rate (Hz)")
+    parser.add_argument("--motor-baud", type=int, default=115200)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--gui", action="store_true", help="also start main.py with the simulated spectrometer")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.links, exist_ok=True)
+    config_path = args.config or os.path.join(args.links, "hardware_config.json")
+    faults = {"latency_s": args.latency_ms / 1000.0, "jitter_s": args.jitter_ms / 1000.0,
+              "drop_rate": args.drop, "corrupt_rate": args.corrupt, "truncate_rate": args.truncate,
+              "noise_rate": args.noise}
+    devices = start_all(args.links, faults, args.imu_rate, args.motor_baud, args.seed)
+    write_config(devices, config_path)
+    for key, device in devices.items():
+        print(f"{key:<16} {device.port}")
+    print(f"config: {config_path}")
+    env = dict(os.environ, HARDWARE_CONFIG=os.path.abspath(config_path), AVASPEC_BACKEND="sim")
+    gui = None
+    if args.gui:
+        gui = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env)
+    else:
+        print(f"HARDWARE_CONFIG={env['HARDWARE_CONFIG']} AVASPEC_BACKEND=sim python main.py")
+    try:
+        while gui is None or gui.poll() is None:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if gui is not None and gui.poll() is None:
+            gui.terminate()
+        for key, device in devices.items():
+            device.stop()
+            print(f"{key:<16} {device.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+tc36_sim.py  –  TE Technology TC-36-25-RS232 temperature controller
+
+Requests are "*" + address "00" + 2-char command + 8 hex digits + 2-char
+checksum + CR (drivers/tc36_25_driver.py sends them one byte at a time);
+replies are "*" + 8 hex digits + checksum + "^". A request with a bad
+checksum gets the controller's "*XXXXXXXXc0^".
+
+    01  input 1 temperature (x100)         03  desired control value (x100)
+    1c  fixed desired setting (set-point)  29  set-type define
+    2d  output power on/off
+
+The temperature follows the set-point with a first-order lag of `tau_s`
+while the output is on and relaxes to `ambient_c` when it is off.
+"""
+
+import time
+
+from simulators.pty_device import PtyDevice
+
+BAD_CHECKSUM_REPLY = b"*XXXXXXXXc0^"
+
+
+def checksum(text):
+    return f"{sum(text.encode('ascii')) & 0xFF:02x}"
+
+
+def _to_hex32(value):
+    return f"{int(value) & 0xFFFFFFFF:08x}"
+
+
+def _from_hex32(text):
+    value = int(text, 16)
+    return value - (1 << 32) if value & 0x80000000 else value
+
+
+class TC36Sim(PtyDevice):
+    name = "temp_controller"
+
+    def __init__(self, ambient_c=25.0, tau_s=20.0, baud=9600, faults=None, link=None):
+        super().__init__(faults=faults, baud=baud, link=link)
+        self.ambient_c = ambient_c
+        self.tau_s = tau_s
+        self.temperature = ambient_c
+        self.setpoint = ambient_c
+        self.power = False
+        self.set_type = 1
+        self._t = time.perf_counter()
+        self._line = b""
+
+    def _advance(self):
+        now = time.perf_counter()
+        dt, self._t = now - self._t, now
+        goal = self.setpoint if self.power else self.ambient_c
+        self.temperature += (goal - self.temperature) * min(dt / self.tau_s, 1.0)
+
+    def handle(self, data):
+        if not self.baud_ok():
+            self.ignored += 1
+            self._line = b""
+            return
+        self._line += data
+        while b"\r" in self._line:
+            raw, _, self._line = self._line.partition(b"\r")
+            start = raw.rfind(b"*")
+            if start < 0:
+                continue
+            text = raw[start + 1:].decode("ascii", errors="replace")
+            if len(text) != 14 or checksum(text[:12]) != text[12:].lower():
+                self.reply(BAD_CHECKSUM_REPLY)
+                continue
+            command, value = text[2:4].lower(), text[4:12]
+            body = _to_hex32(self._execute(command, _from_hex32(value)))
+            self.reply(f"*{body}{checksum(body)}^".encode("ascii"))
+
+    def _execute(self, command, value):
+        self._advance()
+        if command == "01":
+            return round(self.temperature * 100)
+        if command == "03":
+            return round((self.setpoint if self.set_type == 0 else self.ambient_c) * 100)
+        if command == "1c":
+            self.setpoint = value / 100.0
+            return value
+        if command == "29":
+            self.set_type = value
+            return value
+        if command == "2d":
+            self.power = bool(value)
+            return value
+        # Other registers: echo writes, read as zero
+        return value
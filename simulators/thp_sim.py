@@ -0,0 +1,51 @@
+"""
+thp_sim.py  –  THP (temperature, humidity, pressure) sensor box
+
+On "p" + line end it answers with one JSON line, as
+drivers/thp_sensor.py expects:
+
+    {"Sensors": [{"ID": "THP-SIM-1", "Temperature": 24.81, "Humidity": 41.3, "Pressure": 1012.9}]}
+
+Values drift slowly around the configured means.
+"""
+
+import json
+import math
+import time
+
+from simulators.pty_device import PtyDevice
+
+
+class THPSim(PtyDevice):
+    name = "thp_sensor"
+
+    def __init__(self, temperature_c=25.0, humidity_pct=40.0, pressure_hpa=1013.0, sensor_id="THP-SIM-1",
+                 baud=9600, faults=None, link=None):
+        super().__init__(faults=faults, baud=baud, link=link)
+        self.temperature_c = temperature_c
+        self.humidity_pct = humidity_pct
+        self.pressure_hpa = pressure_hpa
+        self.sensor_id = sensor_id
+        self._t0 = time.perf_counter()
+        self._line = b""
+
+    def reading(self):
+        t = time.perf_counter() - self._t0
+        return {
+            "ID": self.sensor_id,
+            "Temperature": round(self.temperature_c + 0.5 * math.sin(2 * math.pi * t / 600.0), 2),
+            "Humidity": round(self.humidity_pct + 2.0 * math.sin(2 * math.pi * t / 900.0), 2),
+            "Pressure": round(self.pressure_hpa + 0.3 * math.sin(2 * math.pi * t / 1200.0), 2),
+        }
+
+    def handle(self, data):
+        if not self.baud_ok():
+            self.ignored += 1
+            self._line = b""
+            return
+        self._line += data
+        while b"\n" in self._line or b"\r" in self._line:
+            cut = min(i for i in (self._line.find(b"\r"), self._line.find(b"\n")) if i >= 0)
+            command, self._line = self._line[:cut].strip(), self._line[cut + 1:]
+            if command == b"p":
+                self.reply((json.dumps({"Sensors": [self.reading()]}) + "\r\n").encode("ascii"))
@@ -0,0 +1,399 @@
+"""
+columnar_log.py  –  append-only binary log of telemetry and spectra
+
+Layout (little endian, every block 8-byte aligned):
+
+    b"SGCLOG01"                   magic
+    uint32                        length of the JSON header
+    JSON header                   npix, pixel dtype, columns [[name, fmt], ...], meta
+    padding to 8 bytes
+    float64[npix]                 wavelength axis, stored once
+    chunk*                        see below
+
+    chunk:
+    b"CHKC", uint32 nrows, uint64 payload length,
+    uint32 payload CRC-32, uint32 CRC-32 of the preceding 20 header bytes
+    float64[nrows] per telemetry column, in header order
+    pixel_dtype[nrows, npix]      spectra, one row per record
+                                  (with "pixel_codec": "delta": one
+                                  storage.spectrum_codec block instead)
+    padding to 8 bytes            (part of the payload)
+
+Chunks are only ever appended, so a reader can map a file that is still being
+written; an incomplete trailing chunk is ignored. After a crash,
+storage.log_index.recover_log() checks every chunk, truncates a torn tail and
+rebuilds the index. CSV is an export format:
+
+    python -m storage.columnar_log export data/log_20250101_000000.sgl [out.csv]
+    python -m storage.columnar_log info data/log_20250101_000000_0000.sgl.gz
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from storage import spectrum_codec
+from storage.compression import compression_of, read_file
+
+MAGIC = b"SGCLOG01"
+FORMAT_VERSION = 3
+PIXEL_CODECS = (None, "delta")
+CHUNK_MAGIC = b"CHKC"
+CHUNK_HEADER = struct.Struct("<4sIQII")
+LOG_SUFFIX = ".sgl"
+# Column format that marks an epoch-seconds timestamp; exported as text
+TIME_FMT = "time"
+
+
+def _pad8(n):
+    return (-n) % 8
+
+
+def _parse_header(buf, path):
+    """Validated JSON header and the offset of the wavelength axis."""
+    if len(buf) < 12 or bytes(buf[:8]) != MAGIC:
+        raise ValueError(f"{path}: not a columnar log")
+    (hlen,) = struct.unpack("<I", bytes(buf[8:12]))
+    header = json.loads(bytes(buf[12:12 + hlen]).decode("utf-8"))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported log version {header.get('version')}")
+    if header.get("pixel_codec") not in PIXEL_CODECS:
+        raise ValueError(f"{path}: unsupported pixel codec {header.get('pixel_codec')!r}")
+    off = 12 + hlen
+    return header, off + _pad8(off)
+
+
+def parse_chunk_header(buf, off):
+    """
+    (nrows, payload offset, payload length, payload CRC) of the chunk header
+    at `off`, or None if there is no complete, intact header there.
+    """
+    if off + CHUNK_HEADER.size > len(buf):
+        return None
+    raw = bytes(buf[off:off + CHUNK_HEADER.size])
+    magic, nrows, payload, crc, header_crc = CHUNK_HEADER.unpack(raw)
+    if magic != CHUNK_MAGIC or zlib.crc32(raw[:-4]) != header_crc:
+        return None
+    return nrows, off + CHUNK_HEADER.size, payload, crc
+
+
+def read_header(path):
+    """Header of an uncompressed log, reading only the header bytes."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if len(head) < 12:
+            raise ValueError(f"{path}: not a columnar log")
+        (hlen,) = struct.unpack("<I", head[8:12])
+        return _parse_header(head + f.read(hlen), path)[0]
+
+
+def chunk_arrays(buf, body, nrows, header):
+    """
+    Telemetry dict and (nrows x npix) pixel matrix of the chunk whose payload
+    starts at `body` in `buf` (a uint8 array or bytes). Plain columns and
+    pixels are views into `buf`; coded pixels are decoded.
+    """
+    names = [c[0] for c in header["columns"]]
+    npix = int(header["npix"])
+    pixel_dtype = np.dtype(header["pixel_dtype"])
+    cols = {}
+    for i, name in enumerate(names):
+        cols[name] = np.frombuffer(buf, dtype="<f8", count=nrows, offset=body + i * nrows * 8)
+    off = body + len(names) * nrows * 8
+    if header.get("pixel_codec"):
+        pix = spectrum_codec.decode(buf, off).astype(pixel_dtype, copy=False)
+    else:
+        pix = np.frombuffer(buf, dtype=pixel_dtype, count=nrows * npix, offset=off).reshape(nrows, npix)
+    return cols, pix
+
+
+class ColumnarLogWriter(object):
+    """
+    Buffers records in preallocated chunk arrays and appends one chunk to the
+    file every `chunk_rows` records (or on flush()/close()). Records that are
+    still buffered are lost if the process dies; flush() bounds that.
+
+    columns: sequence of (name, fmt) for the telemetry values, fmt being a
+    format spec used by the CSV export ("time" for epoch-second timestamps).
+    pixel_codec: None stores spectra as plain pixel_dtype arrays; "delta"
+    stores each chunk's spectra losslessly as scaled, delta-coded integers.
+    """
+
+    def __init__(self, path, columns, wavelengths, chunk_rows=60, pixel_dtype="<f4", meta=None,
+                 pixel_codec=None):
+        if pixel_codec not in PIXEL_CODECS:
+            raise ValueError(f"unknown pixel codec {pixel_codec!r}")
+        self.path = path
+        self.columns = [(str(name), str(fmt)) for name, fmt in columns]
+        wls = np.ascontiguousarray(wavelengths, dtype="<f8")
+        self.npix = wls.size
+        self.pixel_dtype = np.dtype(pixel_dtype)
+        self.chunk_rows = int(chunk_rows)
+        self.pixel_codec = pixel_codec
+        self._cols = np.zeros((len(self.columns), self.chunk_rows), dtype="<f8")
+        self._pix = np.zeros((self.chunk_rows, self.npix), dtype=self.pixel_dtype)
+        self._n = 0
+        self.rows_written = 0
+        self.chunks_written = 0
+
+        header = {
+            "version": FORMAT_VERSION,
+            "npix": self.npix,
+            "pixel_dtype": self.pixel_dtype.str,
+            "columns": self.columns,
+            "meta": meta or {},
+        }
+        if pixel_codec:
+            header["pixel_codec"] = pixel_codec
+        blob = json.dumps(header).encode("utf-8")
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + struct.pack("<I", len(blob)) + blob)
+        self._file.write(b"\0" * _pad8(len(MAGIC) + 4 + len(blob)))
+        self._file.write(wls.tobytes())
+        self._file.flush()
+
+    def append(self, values, spectrum):
+        """Add one record: telemetry values in column order and one spectrum."""
+        i = self._n
+        self._cols[:, i] = values
+        n = min(len(spectrum), self.npix)
+        self._pix[i, :n] = spectrum[:n]
+        if n < self.npix:
+            self._pix[i, n:] = 0
+        self._n += 1
+        if self._n == self.chunk_rows:
+            self._write_chunk()
+
+    def write_batch(self, records):
+        """BackgroundWriter sink interface; records are (values, spectrum) pairs."""
+        for values, spectrum in records:
+            self.append(values, spectrum)
+
+    @property
+    def pending(self):
+        """Records buffered but not yet written to the file."""
+        return self._n
+
+    def fileno(self):
+        return self._file.fileno()
+
+    @property
+    def size(self):
+        """Bytes in the file, counting buffered records at their uncoded size."""
+        record = len(self.columns) * 8 + self.npix * self.pixel_dtype.itemsize
+        return self._file.tell() + self._n * record
+
+    def flush(self):
+        """Write buffered records as a (short) chunk and flush the file object."""
+        if self._n:
+            self._write_chunk()
+        self._file.flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def _write_chunk(self):
+        n = self._n
+        if self.pixel_codec:
+            pixels = spectrum_codec.encode(self._pix[:n])
+        else:
+            pixels = memoryview(self._pix[:n]).cast("B")
+        parts = [memoryview(col[:n]) for col in self._cols]
+        parts.append(pixels)
+        payload = len(self.columns) * n * 8 + len(pixels)
+        pad = _pad8(payload)
+        parts.append(b"\0" * pad)
+        crc = 0
+        for part in parts:
+            crc = zlib.crc32(part, crc)
+        head = CHUNK_HEADER.pack(CHUNK_MAGIC, n, payload + pad, crc, 0)[:-4]
+        f = self._file
+        f.write(head + struct.pack("<I", zlib.crc32(head)))
+        for part in parts:
+            f.write(part)
+        self._n = 0
+        self.rows_written += n
+        self.chunks_written += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ColumnarLogReader(object):
+    """
+    Memory-mapped reader. Column and pixel arrays of a single chunk are views
+    into the map; reads that span chunks are concatenated. Compressed segments
+    (.sgl.gz / .sgl.zst) are decompressed into memory instead, and delta-coded
+    spectra are decoded chunk by chunk as they are read.
+
+    Chunks are found by walking their headers. With verify=True every
+    payload is also checked against its CRC and the scan stops at the first
+    damaged chunk; valid_end is the end of the last good chunk.
+    """
+
+    def __init__(self, path, verify=False):
+        self.path = path
+        if compression_of(path):
+            self._map = np.frombuffer(read_file(path), dtype=np.uint8)
+        else:
+            self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        buf = self._map
+        header, off = _parse_header(buf, path)
+        self.version = header["version"]
+        self.pixel_codec = header.get("pixel_codec")
+        self.header = header
+        self.meta = header.get("meta", {})
+        self.npix = int(header["npix"])
+        self.pixel_dtype = np.dtype(header["pixel_dtype"])
+        self.columns = [tuple(c) for c in header["columns"]]
+        self.column_names = [c[0] for c in self.columns]
+        self.wavelengths = np.frombuffer(buf, dtype="<f8", count=self.npix, offset=off)
+        off += self.npix * 8
+        self._chunks = []   # (first row, nrows, payload offset, chunk offset, chunk length)
+        self.rows = 0
+        self.data_offset = off
+        self._scan(off, verify)
+
+    def _scan(self, off, verify):
+        buf = self._map
+        size = buf.size
+        ncols = len(self.columns)
+        # Coded spectra have no fixed size; the payload must at least hold the columns
+        pixel_bytes = 0 if self.pixel_codec else self.npix * self.pixel_dtype.itemsize
+        while True:
+            chunk = parse_chunk_header(buf, off)
+            if chunk is None:
+                break  # end of file, chunk still being written, or a torn header
+            nrows, body, payload, crc = chunk
+            if body + payload > size or payload < nrows * (ncols * 8 + pixel_bytes):
+                break
+            if verify and zlib.crc32(buf[body:body + payload]) != crc:
+                break
+            self._chunks.append((self.rows, nrows, body, off, body - off + payload))
+            self.rows += nrows
+            off = body + payload
+        self.valid_end = off
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def chunk_count(self):
+        return len(self._chunks)
+
+    def chunks(self):
+        """Yield (telemetry dict of column views, pixel matrix) per chunk."""
+        for _, nrows, body, _, _ in self._chunks:
+            yield chunk_arrays(self._map, body, nrows, self.header)
+
+    def chunk_layout(self):
+        """(first row, nrows, byte offset, byte length) of every complete chunk."""
+        return [(first, nrows, off, length) for first, nrows, _, off, length in self._chunks]
+
+    def column_chunks(self, name):
+        """Yield the values of one telemetry column per chunk, without touching spectra."""
+        i = self.column_names.index(name)
+        for _, nrows, body, _, _ in self._chunks:
+            yield np.frombuffer(self._map, dtype="<f8", count=nrows, offset=body + i * nrows * 8)
+
+    def column(self, name):
+        """All values of one telemetry column."""
+        parts = list(self.column_chunks(name))
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def telemetry(self):
+        """Dict of every telemetry column."""
+        return {name: self.column(name) for name in self.column_names}
+
+    def pixels(self, start=0, stop=None):
+        """Spectra of records [start, stop) as a (rows x npix) array."""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        parts = []
+        for first, nrows, body, _, _ in self._chunks:
+            lo, hi = max(start - first, 0), min(stop - first, nrows)
+            if lo < hi:
+                parts.append(chunk_arrays(self._map, body, nrows, self.header)[1][lo:hi])
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty((0, self.npix), dtype=self.pixel_dtype)
+
+    def close(self):
+        self._map = None
+        self._chunks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def format_value(value, fmt):
+    if fmt == TIME_FMT:
+        return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return format(value, fmt)
+
+
+def export_csv(log_path, csv_path=None, pixel_fmt=".4f"):
+    """
+    Write a columnar log as CSV; returns the CSV path. One line per record:
+    the log's columns in header order (for application logs Timestamp,
+    ScanSeq, Timelabel, CoaddedScans, IntegrationTime_us, then the telemetry
+    columns), followed by Pixel_0 ... Pixel_<npix-1>.
+    """
+    if csv_path is None:
+        base = os.path.splitext(log_path)[0] if compression_of(log_path) else log_path
+        csv_path = os.path.splitext(base)[0] + ".csv"
+    with ColumnarLogReader(log_path) as log, open(csv_path, "w", encoding="utf-8", newline="") as out:
+        headers = list(log.column_names) + [f"Pixel_{i}" for i in range(log.npix)]
+        out.write(",".join(headers) + "\n")
+        fmts = [fmt for _, fmt in log.columns]
+        pix_fmt = "{:" + pixel_fmt + "}"
+        for cols, pix in log.chunks():
+            col_arrays = [cols[name] for name in log.column_names]
+            for r in range(pix.shape[0]):
+                row = [format_value(float(a[r]), fmt) for a, fmt in zip(col_arrays, fmts)]
+                row.extend(map(pix_fmt.format, pix[r].tolist()))
+                out.write(",".join(row) + "\n")
+    return csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar spectrometer log tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_exp = sub.add_parser("export", help="export a log as CSV")
+    p_exp.add_argument("log")
+    p_exp.add_argument("csv", nargs="?")
+    p_info = sub.add_parser("info", help="print header and size of a log")
+    p_info.add_argument("log")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "export":
+        print(export_csv(args.log, args.csv))
+    else:
+        with ColumnarLogReader(args.log) as log:
+            codec = f", {log.pixel_codec} coded" if log.pixel_codec else ""
+            print(f"{args.log}: {len(log)} records, {log.npix} pixels ({log.pixel_dtype}{codec}), "
+                  f"{log.chunk_count} chunks")
+            print("columns:", ", ".join(log.column_names))
+            if log.meta:
+                print("meta:", json.dumps(log.meta))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import gzip
+import os
+import shutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+BLOCK_SIZE = 1 << 20
+
+
+def available(compression):
+    """True if `compression` ("gzip", "zstd" or None) can be used here."""
+    if compression == "zstd":
+        return zstandard is not None
+    return compression in (None, "gzip")
+
+
+def compression_of(path):
+    """Compression implied by the file suffix, or None."""
+    for name, suffix in SUFFIXES.items():
+        if path.endswith(suffix):
+            return name
+    return None
+
+
+def compress_file(src, compression="gzip", level=3, remove_source=True):
+    """
+    Stream `src` into `src` + suffix block by block and return the new path.
+    The output appears under its final name only once it is complete.
+    """
+    dst = src + SUFFIXES[compression]
+    tmp = dst + ".tmp"
+    with open(src, "rb") as fin, open(tmp, "wb") as raw:
+        if compression == "zstd":
+            with zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=False) as fout:
+                shutil.copyfileobj(fin, fout, BLOCK_SIZE)
+        else:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level) as fout:
+                shutil.copyfileobj(fin, fout, BLOCK_SIZE)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, dst)
+    if remove_source:
+        os.remove(src)
+    return dst
+
+
+def read_file(path):
+    """Whole content of a plain, gzip or zstd file as bytes."""
+    compression = compression_of(path)
+    if compression == "gzip":
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError(f"{path}: reading zstd files needs the 'zstandard' package")
+        with open(path, "rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as f:
+            return f.read()
+    with open(path, "rb") as f:
+        return f.read()
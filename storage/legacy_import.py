@@ -0,0 +1,202 @@
+"""
+legacy_import.py  –  convert legacy log_*.csv archives to columnar logs
+
+The old wide CSV (Timestamp, telemetry columns, Pixel_0..Pixel_N, one row per
+second) is read line by line and written chunk by chunk, so memory stays at
+one chunk regardless of file size. Each file becomes <name>.sgl with
+delta-coded spectra plus a sidecar time index (storage.log_index). Files are
+converted in parallel, one per worker process:
+
+    python -m storage.legacy_import data/ [more.csv ...] [-o OUTDIR] [-j JOBS]
+
+Legacy files carry no wavelength calibration; the wavelength axis is the
+pixel index and meta["wavelengths"] says so.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from storage.columnar_log import ColumnarLogWriter, LOG_SUFFIX, TIME_FMT
+from storage.log_index import build_index
+
+PIXEL_PREFIX = "Pixel_"
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S")
+
+
+def _parse_timestamp(text):
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"bad timestamp {text!r}")
+
+
+def _column_format(text):
+    # Keep the number of decimals the legacy writer used, so an export looks the same
+    text = text.strip()
+    if "." in text and "e" not in text.lower():
+        return f".{len(text) - text.index('.') - 1}f"
+    if text.lstrip("-").isdigit():
+        return ".0f"
+    return "g"
+
+
+def _parse_rows(lines, nfields):
+    """(timestamps, values) of the well-formed lines in a batch, and the number skipped."""
+    stamps, rests = [], []
+    bad = 0
+    for line in lines:
+        stamp, _, rest = line.rstrip("\r\n").partition(",")
+        try:
+            stamps.append(_parse_timestamp(stamp))
+        except ValueError:
+            bad += 1
+            continue
+        rests.append(rest)
+    # One parse for the whole batch; fall back to line by line if any row is malformed
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            values = np.fromstring(",".join(rests), dtype=np.float64, sep=",") if rests else np.empty(0)
+    except (ValueError, DeprecationWarning):
+        values = None
+    if values is not None and values.size == len(rests) * nfields:
+        return np.array(stamps), values.reshape(len(rests), nfields), bad
+    good_stamps, good_rows = [], []
+    for stamp, rest in zip(stamps, rests):
+        try:
+            row = np.array(rest.split(","), dtype=np.float64)
+        except ValueError:
+            row = None
+        if row is None or row.size != nfields:
+            bad += 1
+            continue
+        good_stamps.append(stamp)
+        good_rows.append(row)
+    if not good_rows:
+        return np.empty(0), np.empty((0, nfields)), bad
+    return np.array(good_stamps), np.stack(good_rows), bad
+
+
+def convert_file(csv_path, out_dir=None, chunk_rows=60, pixel_codec="delta"):
+    """Convert one legacy CSV; returns a summary dict."""
+    t0 = time.perf_counter()
+    out_dir = out_dir or os.path.dirname(csv_path)
+    out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(csv_path))[0] + LOG_SUFFIX)
+    tmp_path = out_path + ".tmp"
+    rows = bad = 0
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        names = f.readline().rstrip("\r\n").split(",")
+        if not names or names[0] != "Timestamp":
+            raise ValueError(f"{csv_path}: not a legacy log (no Timestamp column)")
+        npix = sum(1 for n in names if n.startswith(PIXEL_PREFIX))
+        ntel = len(names) - 1 - npix
+        nfields = ntel + npix
+
+        first = f.readline()
+        fmts = [_column_format(v) for v in first.split(",")[1:1 + ntel]]
+        if len(fmts) < ntel:
+            fmts += ["g"] * (ntel - len(fmts))
+        columns = [("Timestamp", TIME_FMT)] + list(zip(names[1:1 + ntel], fmts))
+        meta = {"source": os.path.basename(csv_path), "wavelengths": "pixel index"}
+        writer = ColumnarLogWriter(tmp_path, columns, np.arange(npix, dtype=np.float64), chunk_rows=chunk_rows,
+                                   pixel_dtype="<f8" if pixel_codec else "<f4", meta=meta,
+                                   pixel_codec=pixel_codec)
+        try:
+            batch = [first] if first.strip() else []
+            for line in f:
+                if line.strip():
+                    batch.append(line)
+                if len(batch) == chunk_rows:
+                    rows, bad = _write_rows(writer, batch, nfields, ntel, rows, bad)
+                    batch = []
+            if batch:
+                rows, bad = _write_rows(writer, batch, nfields, ntel, rows, bad)
+        finally:
+            writer.close()
+    os.replace(tmp_path, out_path)
+    build_index(out_path)
+    return {
+        "source": csv_path,
+        "log": out_path,
+        "rows": rows,
+        "skipped": bad,
+        "csv_bytes": os.path.getsize(csv_path),
+        "log_bytes": os.path.getsize(out_path),
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def _write_rows(writer, lines, nfields, ntel, rows, bad):
+    stamps, values, skipped = _parse_rows(lines, nfields)
+    for t, row in zip(stamps.tolist(), values):
+        writer.append([t] + row[:ntel].tolist(), row[ntel:])
+    return rows + len(stamps), bad + skipped
+
+
+def find_sources(paths):
+    """Legacy CSV files named directly or found as log_*.csv in directories."""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(glob.glob(os.path.join(path, "log_*.csv"))))
+        else:
+            sources.append(path)
+    return sources
+
+
+def convert_all(sources, out_dir=None, jobs=None, chunk_rows=60, pixel_codec="delta"):
+    """Convert files in a process pool; yields summaries (or exceptions) as files finish."""
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(convert_file, src, out_dir, chunk_rows, pixel_codec): src for src in sources}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except (OSError, ValueError) as e:
+                yield ValueError(f"{futures[future]}: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert legacy log_*.csv files to columnar logs")
+    parser.add_argument("paths", nargs="+", help="CSV files or directories containing log_*.csv")
+    parser.add_argument("-o", "--out-dir", help="output directory (default: next to each CSV)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=60)
+    parser.add_argument("--no-codec", action="store_true", help="store spectra as plain float32")
+    args = parser.parse_args(argv)
+
+    sources = find_sources(args.paths)
+    if not sources:
+        print("No legacy CSV files found")
+        return 1
+    failed = 0
+    csv_total = log_total = 0
+    t0 = time.perf_counter()
+    for result in convert_all(sources, args.out_dir, args.jobs, args.chunk_rows, None if args.no_codec else "delta"):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"[ERROR] {result}")
+            continue
+        csv_total += result["csv_bytes"]
+        log_total += result["log_bytes"]
+        skipped = f", {result['skipped']} bad rows skipped" if result["skipped"] else ""
+        print(f"{result['log']}: {result['rows']} rows, {result['csv_bytes'] / 1e6:.1f} MB -> "
+              f"{result['log_bytes'] / 1e6:.1f} MB in {result['seconds']:.1f} s{skipped}")
+    print(f"{len(sources) - failed}/{len(sources)} files, {csv_total / 1e6:.1f} MB -> {log_total / 1e6:.1f} MB "
+          f"in {time.perf_counter() - t0:.1f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
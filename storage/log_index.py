@@ -0,0 +1,225 @@
+"""
+log_index.py  –  sidecar time index for columnar logs
+
+<log>.sgl.idx.npy holds one row per chunk: its time range (from the log's
+"time" column), first row, row count and byte range in the file. A
+time-range query loads the index, reads only the chunks that overlap the
+range with plain seeks and trims the rows at both ends:
+
+    python -m storage.log_index build data/log_20250101_000000.sgl
+    python -m storage.log_index query data/log_20250101_000000.sgl "2025-01-01 10:00" "2025-01-01 10:05" [out.csv]
+
+Compressed segments have no byte-addressable chunks; they are queried by
+decompressing the whole segment.
+
+recover_log() is the startup check for a log that may have been cut short by
+a crash: one sequential pass verifies every chunk checksum, truncates the
+file after the last intact chunk and rewrites the index.
+
+    python -m storage.log_index recover data/log_20250101_000000_0003.sgl
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from storage.columnar_log import (ColumnarLogReader, TIME_FMT, chunk_arrays, format_value, parse_chunk_header,
+                                  read_header)
+from storage.compression import compression_of
+
+INDEX_SUFFIX = ".idx.npy"
+INDEX_DTYPE = np.dtype([
+    ("t_start", "<f8"), ("t_end", "<f8"),
+    ("first_row", "<u8"), ("rows", "<u4"),
+    ("offset", "<u8"), ("length", "<u8"),
+])
+
+
+def index_path(log_path):
+    return log_path + INDEX_SUFFIX
+
+
+def time_column(columns):
+    """Name of the first epoch-seconds column."""
+    for name, fmt in columns:
+        if fmt == TIME_FMT:
+            return name
+    raise ValueError("log has no time column")
+
+
+def _chunk_index(log):
+    index = np.zeros(log.chunk_count, dtype=INDEX_DTYPE)
+    times = log.column_chunks(time_column(log.columns))
+    for i, ((first, nrows, off, length), t) in enumerate(zip(log.chunk_layout(), times)):
+        index[i] = (t.min(), t.max(), first, nrows, off, length)
+    return index
+
+
+def _write_index(log_path, index):
+    path = index_path(log_path)
+    tmp = path + ".tmp.npy"
+    np.save(tmp, index)
+    os.replace(tmp, path)
+
+
+def build_index(log_path):
+    """Write the sidecar index of an uncompressed log and return it."""
+    if compression_of(log_path):
+        raise ValueError(f"{log_path}: compressed logs cannot be indexed")
+    with ColumnarLogReader(log_path) as log:
+        index = _chunk_index(log)
+    _write_index(log_path, index)
+    return index
+
+
+def recover_log(log_path, index=True):
+    """
+    Make a possibly torn log consistent: verify every chunk in one pass,
+    truncate after the last intact one and (optionally) rewrite the index.
+    Returns a summary dict. Raises ValueError if even the file header is
+    damaged. Records still buffered by the writer at the crash are lost;
+    with a DurabilityPolicy that is at most the last unsynced batch.
+    """
+    if compression_of(log_path):
+        raise ValueError(f"{log_path}: compressed logs are complete by construction")
+    size = os.path.getsize(log_path)
+    with ColumnarLogReader(log_path, verify=True) as log:
+        chunks = _chunk_index(log)
+        valid_end = log.valid_end
+        rows = len(log)
+    if valid_end < size:
+        with open(log_path, "r+b") as f:
+            f.truncate(valid_end)
+            f.flush()
+            os.fsync(f.fileno())
+    if index:
+        _write_index(log_path, chunks)
+    return {
+        "rows": rows,
+        "chunks": len(chunks),
+        "bytes": valid_end,
+        "truncated_bytes": size - valid_end,
+        "t_start": float(chunks["t_start"].min()) if len(chunks) else None,
+        "t_end": float(chunks["t_end"].max()) if len(chunks) else None,
+    }
+
+
+def load_index(log_path):
+    """Sidecar index of a log, rebuilt if it is missing or older than the log."""
+    path = index_path(log_path)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(log_path):
+            return np.load(path)
+    except OSError:
+        pass
+    return build_index(log_path)
+
+
+def _empty(header):
+    cols = {c[0]: np.empty(0) for c in header["columns"]}
+    return cols, np.empty((0, int(header["npix"])), dtype=np.dtype(header["pixel_dtype"]))
+
+
+def _join(parts, header):
+    if not parts:
+        return _empty(header)
+    cols = {name: np.concatenate([p[0][name] for p in parts]) for name in parts[0][0]}
+    return cols, np.concatenate([p[1] for p in parts])
+
+
+def read_range(log_path, t_start=None, t_end=None):
+    """
+    Telemetry dict and pixel matrix of the records with t_start <= time <= t_end
+    (epoch seconds, None = open ended).
+    """
+    lo = -np.inf if t_start is None else t_start
+    hi = np.inf if t_end is None else t_end
+    if compression_of(log_path):
+        with ColumnarLogReader(log_path) as log:
+            tname = time_column(log.columns)
+            parts = []
+            for cols, pix in log.chunks():
+                keep = (cols[tname] >= lo) & (cols[tname] <= hi)
+                if keep.any():
+                    parts.append(({k: v[keep] for k, v in cols.items()}, pix[keep]))
+            return _join(parts, log.header)
+
+    header = read_header(log_path)
+    tname = time_column(header["columns"])
+    index = load_index(log_path)
+    hits = index[(index["t_end"] >= lo) & (index["t_start"] <= hi)]
+    parts = []
+    with open(log_path, "rb") as f:
+        for entry in hits:
+            f.seek(int(entry["offset"]))
+            data = np.frombuffer(f.read(int(entry["length"])), dtype=np.uint8)
+            chunk = parse_chunk_header(data, 0)
+            if chunk is None or chunk[0] != entry["rows"]:
+                raise ValueError(f"{log_path}: index does not match the log, rebuild it")
+            nrows, body, _, _ = chunk
+            cols, pix = chunk_arrays(data, body, nrows, header)
+            keep = (cols[tname] >= lo) & (cols[tname] <= hi)
+            parts.append(({k: v[keep] for k, v in cols.items()}, pix[keep]))
+    return _join(parts, header)
+
+
+def parse_time(text):
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    return float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time index for columnar spectrometer logs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="(re)build the sidecar index of logs")
+    p_build.add_argument("logs", nargs="+")
+    p_recover = sub.add_parser("recover", help="truncate torn chunks after a crash and rebuild the index")
+    p_recover.add_argument("logs", nargs="+")
+    p_query = sub.add_parser("query", help="records in a local time range, optionally as CSV")
+    p_query.add_argument("log")
+    p_query.add_argument("start", help='"YYYY-MM-DD HH:MM[:SS]" local time or epoch seconds')
+    p_query.add_argument("end")
+    p_query.add_argument("csv", nargs="?")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        for path in args.logs:
+            index = build_index(path)
+            print(f"{index_path(path)}: {len(index)} chunks")
+        return 0
+    if args.cmd == "recover":
+        for path in args.logs:
+            result = recover_log(path)
+            print(f"{path}: {result['rows']} records in {result['chunks']} chunks, "
+                  f"{result['truncated_bytes']} bytes truncated")
+        return 0
+
+    cols, pix = read_range(args.log, parse_time(args.start), parse_time(args.end))
+    if compression_of(args.log):
+        with ColumnarLogReader(args.log) as log:
+            header = log.header
+    else:
+        header = read_header(args.log)
+    print(f"{args.log}: {len(pix)} records in range")
+    if args.csv:
+        names = [c[0] for c in header["columns"]]
+        fmts = [c[1] for c in header["columns"]]
+        with open(args.csv, "w", encoding="utf-8", newline="") as out:
+            out.write(",".join(names + [f"Pixel_{i}" for i in range(pix.shape[1])]) + "\n")
+            for r in range(len(pix)):
+                row = [format_value(float(cols[n][r]), fmt) for n, fmt in zip(names, fmts)]
+                row.extend(f"{v:.4f}" for v in pix[r].tolist())
+                out.write(",".join(row) + "\n")
+        print(args.csv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
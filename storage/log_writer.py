@@ -0,0 +1,206 @@
+import os
+import queue
+import threading
+import time
+
+
+class DurabilityPolicy(object):
+    """
+    When buffered records are forced to disk (flush + fsync).
+
+    fsync_records: after this many records (0 = not by count)
+    fsync_interval_s: at most this long after the first unsynced record (0 = not by time)
+    Closing the writer always syncs. With both set to 0 data is only synced on close.
+    """
+
+    def __init__(self, fsync_records=0, fsync_interval_s=5.0):
+        self.fsync_records = int(fsync_records)
+        self.fsync_interval_s = float(fsync_interval_s)
+
+    @classmethod
+    def from_config(cls, config, prefix="log_"):
+        return cls(fsync_records=config.get(prefix + "fsync_records", 0),
+                   fsync_interval_s=config.get(prefix + "fsync_interval_s", 5.0))
+
+
+class TextLogSink(object):
+    """Line-oriented text file for BackgroundWriter; records are str lines."""
+
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write_batch(self, lines):
+        self._file.write("".join(lines))
+
+    def flush(self):
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+class BackgroundWriter(object):
+    """
+    Writes records to a sink on its own thread, so the GUI and acquisition
+    threads never wait on the disk.
+
+    submit() puts a record on a bounded queue. The worker takes everything that
+    is queued, hands it to sink.write_batch() in one call and syncs according to
+    the DurabilityPolicy (group commit). When the queue is full, submit() waits
+    up to `block_timeout_s` for room (backpressure) and then drops the record;
+    drops are counted in metrics().
+
+    A sink provides write_batch(records), flush(), fileno() and close().
+    """
+
+    def __init__(self, sink, policy=None, max_queue=1024, block_timeout_s=0.05, max_batch=256,
+                 name="log-writer"):
+        self.sink = sink
+        self.policy = policy or DurabilityPolicy()
+        self.block_timeout_s = block_timeout_s
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._metrics_lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_queue_depth = 0
+        self._latency_sum = 0.0
+        self.max_latency_s = 0.0
+        self.last_fsync_s = 0.0
+        self.max_fsync_s = 0.0
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, record):
+        """Queue a record; returns False if it was dropped because the queue stayed full."""
+        if self._closed:
+            return False
+        try:
+            if self.block_timeout_s > 0:
+                self._queue.put((time.perf_counter(), record), timeout=self.block_timeout_s)
+            else:
+                self._queue.put_nowait((time.perf_counter(), record))
+        except queue.Full:
+            with self._metrics_lock:
+                self.dropped += 1
+            return False
+        with self._metrics_lock:
+            self.submitted += 1
+            depth = self._queue.qsize()
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+        return True
+
+    def close(self, timeout=None):
+        """Write everything still queued, sync and close the sink."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((None, None))
+        self._worker.join(timeout)
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "fsyncs": self.fsyncs,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "mean_latency_ms": 1000.0 * self._latency_sum / self.written if self.written else 0.0,
+                "max_latency_ms": 1000.0 * self.max_latency_s,
+                "last_fsync_ms": 1000.0 * self.last_fsync_s,
+                "max_fsync_ms": 1000.0 * self.max_fsync_s,
+            }
+
+    # -- worker thread ----------------------------------------------------
+
+    def _run(self):
+        policy = self.policy
+        unsynced = 0
+        first_unsynced = None
+        stopping = False
+        while not stopping:
+            timeout = None
+            if unsynced and policy.fsync_interval_s > 0:
+                timeout = max(first_unsynced + policy.fsync_interval_s - time.perf_counter(), 0.0)
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [item for item in batch if item[0] is not None]
+            if len(records) != len(batch):
+                stopping = True
+                batch = records
+            if batch:
+                self._write(batch)
+                if not unsynced:
+                    first_unsynced = time.perf_counter()
+                unsynced += len(batch)
+            due = stopping or (
+                unsynced and (
+                    (policy.fsync_records and unsynced >= policy.fsync_records) or
+                    (policy.fsync_interval_s and time.perf_counter() - first_unsynced >= policy.fsync_interval_s)))
+            if due:
+                self._sync()
+                unsynced = 0
+        try:
+            self.sink.close()
+        except OSError as e:
+            self._error(e)
+
+    def _write(self, batch):
+        try:
+            self.sink.write_batch([record for _, record in batch])
+        except (OSError, ValueError) as e:
+            self._error(e)
+            with self._metrics_lock:
+                self.dropped += len(batch)
+            return
+        now = time.perf_counter()
+        with self._metrics_lock:
+            self.written += len(batch)
+            self.batches += 1
+            for t_submit, _ in batch:
+                latency = now - t_submit
+                self._latency_sum += latency
+                if latency > self.max_latency_s:
+                    self.max_latency_s = latency
+
+    def _sync(self):
+        t = time.perf_counter()
+        try:
+            self.sink.flush()
+            os.fsync(self.sink.fileno())
+        except (OSError, ValueError) as e:
+            self._error(e)
+            return
+        dt = time.perf_counter() - t
+        with self._metrics_lock:
+            self.fsyncs += 1
+            self.last_fsync_s = dt
+            if dt > self.max_fsync_s:
+                self.max_fsync_s = dt
+
+    def _error(self, e):
+        with self._metrics_lock:
+            self.errors += 1
+            self.last_error = str(e)
@@ -0,0 +1,287 @@
+"""
+pixel_archive.py  –  pixel-major archive of closed log segments
+
+Columnar logs are row per record, so a single-wavelength time series touches
+every pixel of every record. Compaction transposes each closed segment into
+one time tile stored pixel-major:
+
+    <archive>/meta.json                 npix, tile width, pixel dtype, columns, tile list
+    <archive>/wavelengths.npy           calibration taken from the logs
+    <archive>/tile_NNNNN.npy            dtype [pixel tile, record, pixel in tile]
+    <archive>/tile_NNNNN_time.npy       float64 [record], epoch seconds
+    <archive>/tile_NNNNN_telemetry.npy  float64 [column, record]
+
+Tiles keep the logs' pixel dtype ("<f8" for delta-coded logs, whose values
+are exact), so a pixel series read from the archive equals the one read
+from the logs. Within a tile the records of one pixel tile are contiguous,
+so a band query reads (band width rounded up to tiles) x records values per
+tile and maps nothing else. Segments already compacted are recorded by file name, so the
+job can be rerun on a growing manifest:
+
+    python -m storage.pixel_archive compact data/log_20250101_000000.manifest.json [-o ARCHIVE]
+    python -m storage.pixel_archive query ARCHIVE 310 320 ["2025-01-01 10:00" "2025-01-02 10:00"]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from storage.columnar_log import ColumnarLogReader
+from storage.compression import compression_of
+from storage.log_index import parse_time, time_column
+from storage.segments import MANIFEST_SUFFIX, segment_paths
+
+ARCHIVE_SUFFIX = ".pxa"
+ARCHIVE_VERSION = 1
+
+
+def archive_dir_for(source):
+    """Default archive directory for a manifest or log path."""
+    if source.endswith(MANIFEST_SUFFIX):
+        return source[:-len(MANIFEST_SUFFIX)] + ARCHIVE_SUFFIX
+    return os.path.join(os.path.dirname(source), os.path.splitext(_plain_name(source))[0] + ARCHIVE_SUFFIX)
+
+
+class PixelArchive(object):
+    """
+    Pixel-major archive. Tiles are memory-mapped on demand.
+
+    wavelengths: calibration to query by (e.g. SpectrometerController.wls);
+    defaults to the axis stored from the logs. It must have npix entries.
+    """
+
+    def __init__(self, directory, wavelengths=None):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"{directory}: unsupported archive version {self.meta.get('version')}")
+        self.npix = int(self.meta["npix"])
+        self.tile_pix = int(self.meta["tile_pix"])
+        self.dtype = np.dtype(self.meta.get("dtype", "<f4"))
+        self.columns = [tuple(c) for c in self.meta["columns"]]
+        self.tiles = self.meta["tiles"]
+        if wavelengths is None:
+            wavelengths = np.load(os.path.join(directory, "wavelengths.npy"))
+        wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        if wavelengths.size != self.npix:
+            raise ValueError(f"{wavelengths.size} wavelengths for {self.npix} pixels")
+        self.wavelengths = wavelengths
+
+    def __len__(self):
+        return sum(t["rows"] for t in self.tiles)
+
+    def pixel_range(self, wl_min, wl_max):
+        """[start, stop) of the pixels with wl_min <= wavelength <= wl_max."""
+        inside = np.nonzero((self.wavelengths >= wl_min) & (self.wavelengths <= wl_max))[0]
+        if inside.size == 0:
+            return 0, 0
+        return int(inside[0]), int(inside[-1]) + 1
+
+    def _tiles_in(self, t_start, t_end):
+        for tile in self.tiles:
+            if t_start is not None and tile["t_end"] < t_start:
+                continue
+            if t_end is not None and tile["t_start"] > t_end:
+                continue
+            yield tile
+
+    def _load(self, tile, suffix=""):
+        return np.load(os.path.join(self.directory, tile["file"] + suffix + ".npy"), mmap_mode="r")
+
+    def pixels(self, start, stop, t_start=None, t_end=None):
+        """
+        (times, data) for pixels [start, stop) of the records with
+        t_start <= time <= t_end; data is (records x pixels) of the archive dtype.
+        """
+        p0, p1 = start // self.tile_pix, -(-stop // self.tile_pix)
+        lo, hi = start - p0 * self.tile_pix, stop - p0 * self.tile_pix
+        times, parts = [], []
+        for tile in self._tiles_in(t_start, t_end):
+            t = self._load(tile, "_time")
+            keep = np.ones(t.size, dtype=bool)
+            if t_start is not None:
+                keep &= t >= t_start
+            if t_end is not None:
+                keep &= t <= t_end
+            rows = np.nonzero(keep)[0]
+            if rows.size == 0:
+                continue
+            r0, r1 = int(rows[0]), int(rows[-1]) + 1
+            block = self._load(tile)[p0:p1, r0:r1, :]             # only these pages are read
+            block = np.ascontiguousarray(block.transpose(1, 0, 2)).reshape(r1 - r0, -1)[:, lo:hi]
+            span = keep[r0:r1]
+            times.append(np.array(t[r0:r1])[span])
+            parts.append(block[span])
+        if not parts:
+            return np.empty(0), np.empty((0, stop - start), dtype=self.dtype)
+        return np.concatenate(times), np.concatenate(parts)
+
+    def band(self, wl_min, wl_max, t_start=None, t_end=None):
+        """(times, wavelengths, data) of the band [wl_min, wl_max] in the time window."""
+        start, stop = self.pixel_range(wl_min, wl_max)
+        times, data = self.pixels(start, stop, t_start, t_end)
+        return times, self.wavelengths[start:stop], data
+
+    def series(self, wavelength, t_start=None, t_end=None):
+        """(times, values) of the pixel nearest to `wavelength`."""
+        pixel = int(np.argmin(np.abs(self.wavelengths - wavelength)))
+        times, data = self.pixels(pixel, pixel + 1, t_start, t_end)
+        return times, data[:, 0]
+
+    def telemetry(self, name, t_start=None, t_end=None):
+        """(times, values) of one telemetry column."""
+        col = [c[0] for c in self.columns].index(name)
+        times, values = [], []
+        for tile in self._tiles_in(t_start, t_end):
+            t = np.array(self._load(tile, "_time"))
+            keep = np.ones(t.size, dtype=bool)
+            if t_start is not None:
+                keep &= t >= t_start
+            if t_end is not None:
+                keep &= t <= t_end
+            times.append(t[keep])
+            values.append(np.array(self._load(tile, "_telemetry")[col])[keep])
+        if not times:
+            return np.empty(0), np.empty(0)
+        return np.concatenate(times), np.concatenate(values)
+
+
+def _write_npy(path, array):
+    tmp = path + ".tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def _write_meta(directory, meta):
+    tmp = os.path.join(directory, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(directory, "meta.json"))
+
+
+def _plain_name(path):
+    # A segment may be compressed after it was compacted; it is the same log
+    name = os.path.basename(path)
+    return os.path.splitext(name)[0] if compression_of(name) else name
+
+
+def _compact_log(log_path, directory, meta):
+    """Transpose one log into the next time tile; returns its tile entry (None if empty)."""
+    index = len(meta["tiles"])
+    name = f"tile_{index:05d}"
+    tile_pix = meta["tile_pix"]
+    dtype = np.dtype(meta.get("dtype", "<f4"))
+    with ColumnarLogReader(log_path) as log:
+        if log.npix != meta["npix"] or [list(c) for c in log.columns] != meta["columns"]:
+            raise ValueError(f"{log_path}: layout differs from the archive")
+        if not np.can_cast(log.pixel_dtype, dtype, "safe"):
+            raise ValueError(f"{log_path}: {log.pixel_dtype} pixels do not fit the archive's {dtype}")
+        tname = time_column(log.columns)
+        rows = len(log)
+        if not rows:
+            return None
+        nptiles = -(-log.npix // tile_pix)
+        tmp = os.path.join(directory, name + ".tmp.npy")
+        tile = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=(nptiles, rows, tile_pix))
+        times = np.empty(rows)
+        telemetry = np.empty((len(log.columns), rows))
+        r = 0
+        # One chunk at a time keeps memory at a chunk plus the mapped tile pages
+        padded = np.zeros((0, nptiles * tile_pix), dtype=dtype)
+        for cols, pix in log.chunks():
+            n = pix.shape[0]
+            if padded.shape[0] != n:
+                padded = np.zeros((n, nptiles * tile_pix), dtype=dtype)
+            padded[:, :log.npix] = pix
+            tile[:, r:r + n, :] = padded.reshape(n, nptiles, tile_pix).transpose(1, 0, 2)
+            times[r:r + n] = cols[tname]
+            for i, (cname, _) in enumerate(log.columns):
+                telemetry[i, r:r + n] = cols[cname]
+            r += n
+        tile.flush()
+        del tile
+    os.replace(tmp, os.path.join(directory, name + ".npy"))
+    _write_npy(os.path.join(directory, name + "_time.npy"), times)
+    _write_npy(os.path.join(directory, name + "_telemetry.npy"), telemetry)
+    return {"file": name, "source": _plain_name(log_path), "rows": rows,
+            "t_start": float(times.min()), "t_end": float(times.max())}
+
+
+def compact(sources, directory, tile_pix=16):
+    """
+    Add logs to the archive at `directory` (created if needed). `sources` are
+    .sgl paths or segment manifests, whose closed and compressed segments
+    are used. Logs compacted before are skipped. Returns the new tile entries.
+    """
+    logs = []
+    for source in sources:
+        if source.endswith(MANIFEST_SUFFIX):
+            logs.extend(segment_paths(source))
+        else:
+            logs.append(source)
+    os.makedirs(directory, exist_ok=True)
+    meta_path = os.path.join(directory, "meta.json")
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    done = {t["source"] for t in meta["tiles"]} if meta else set()
+    added = []
+    for path in logs:
+        if _plain_name(path) in done:
+            continue
+        if meta is None:
+            with ColumnarLogReader(path) as log:
+                meta = {"version": ARCHIVE_VERSION, "npix": log.npix, "tile_pix": int(tile_pix),
+                        "dtype": log.pixel_dtype.str, "columns": [list(c) for c in log.columns], "tiles": []}
+                _write_npy(os.path.join(directory, "wavelengths.npy"), np.array(log.wavelengths))
+        entry = _compact_log(path, directory, meta)
+        if entry is None:
+            continue
+        meta["tiles"].append(entry)
+        meta["tiles"].sort(key=lambda t: t["t_start"])
+        done.add(entry["source"])
+        _write_meta(directory, meta)
+        added.append(entry)
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pixel-major archive of spectrometer logs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_comp = sub.add_parser("compact", help="add closed segments / logs to an archive")
+    p_comp.add_argument("sources", nargs="+", help="segment manifests or .sgl logs")
+    p_comp.add_argument("-o", "--archive", help="archive directory (default: <first source>.pxa)")
+    p_comp.add_argument("--tile-pix", type=int, default=16)
+    p_query = sub.add_parser("query", help="band statistics for a wavelength range")
+    p_query.add_argument("archive")
+    p_query.add_argument("wl_min", type=float)
+    p_query.add_argument("wl_max", type=float)
+    p_query.add_argument("start", nargs="?")
+    p_query.add_argument("end", nargs="?")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "compact":
+        directory = args.archive or archive_dir_for(args.sources[0])
+        added = compact(args.sources, directory, args.tile_pix)
+        for entry in added:
+            print(f"{entry['source']} -> {entry['file']} ({entry['rows']} records)")
+        print(f"{directory}: {len(added)} new tiles")
+        return 0
+
+    archive = PixelArchive(args.archive)
+    t_start = parse_time(args.start) if args.start else None
+    t_end = parse_time(args.end) if args.end else None
+    times, wls, data = archive.band(args.wl_min, args.wl_max, t_start, t_end)
+    print(f"{len(times)} records x {len(wls)} pixels")
+    if len(times) and len(wls):
+        print(f"  {wls[0]:.2f}-{wls[-1]:.2f} nm, mean {data.mean():.2f}, min {data.min():.2f}, max {data.max():.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
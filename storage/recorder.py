@@ -0,0 +1,185 @@
+import threading
+import time
+
+import numpy as np
+
+from drivers.time_align import scan_window
+from storage.columnar_log import TIME_FMT
+
+# Columns the recorder fills itself; telemetry columns follow
+RECORD_COLUMNS = [
+    ("Timestamp", TIME_FMT),
+    ("ScanSeq", ".0f"),            # ring sequence number of the (first co-added) scan
+    ("Timelabel", ".0f"),          # device timelabel of that scan, 10 us ticks
+    ("CoaddedScans", ".0f"),
+    ("IntegrationTime_us", ".0f"),
+]
+
+
+class SpectrumRecorder(object):
+    """
+    Records every stored scan exactly once, driven by scan arrival.
+
+    on_scan(ring, seq) is registered as a SpectrometerController scan listener
+    and runs on the acquisition thread. Each record holds the host time, ring
+    sequence number, device timelabel and integration time of the scan plus
+    the latest telemetry values (`telemetry()` must be cheap and thread-safe,
+    e.g. TelemetryStore.row() for a fixed tuple of channel names).
+
+    With several spectrometers, on_record(rings, seqs) is registered as a
+    record listener instead: each aligned record (one trigger) becomes one
+    record whose spectrum is the devices' spectra side by side in device
+    order (`npix` is their total); sequence number, timelabel and
+    integration time are those of the first device.
+
+    With coadd > 1 that many consecutive scans are averaged into one record;
+    a group is closed early when the integration time changes.
+    Records are (values, float64 spectrum) pairs for a BackgroundWriter.
+
+    With a drivers.time_align.DeviceClock the recorder instead leaves the
+    telemetry out (telemetry may be None) and submits (values, spectrum,
+    (window start, window end)) on the perf_counter clock, for an
+    AlignedTelemetrySink to fill in.
+    """
+
+    def __init__(self, writer, npix, telemetry, coadd=1, clock=None):
+        self.writer = writer
+        self.telemetry = telemetry
+        self.coadd = max(int(coadd), 1)
+        self.clock = clock
+        self._acc = np.zeros(npix, dtype=np.float64)
+        self._row = np.empty(npix, dtype=np.float64)
+        self._n = 0
+        self._first = None      # (timestamp, seq, timelabel, integration_ms, window start) of the open group
+        self._window_end = None
+        self._lock = threading.Lock()
+        self.scans = 0
+        self.records = 0
+        self.last_seq = -1
+
+    def on_scan(self, ring, seq):
+        spectrum = ring.get(seq)
+        if spectrum is None:
+            return
+        with self._lock:
+            self._add(seq, ring.meta(seq), spectrum)
+
+    def on_record(self, rings, seqs):
+        spectra = [ring.get(seq) for ring, seq in zip(rings, seqs)]
+        if any(spectrum is None for spectrum in spectra):
+            return
+        with self._lock:
+            np.concatenate(spectra, out=self._row)
+            self._add(seqs[0], rings[0].meta(seqs[0]), self._row)
+
+    def _add(self, seq, meta, spectrum):
+        # Holding self._lock
+        t = time.time()
+        t_mono = time.perf_counter()
+        self.scans += 1
+        self.last_seq = seq
+        window = None
+        if self.clock is not None:
+            window = scan_window(self.clock.observe(meta["timelabel"], t_mono),
+                                 meta["integration_ms"], meta["averages"])
+        if self.coadd == 1:
+            self._submit(t, seq, meta["timelabel"], 1, meta["integration_ms"], spectrum, window)
+            return
+        if self._n and meta["integration_ms"] != self._first[3]:
+            self._close_group()
+        if not self._n:
+            self._first = (t, seq, meta["timelabel"], meta["integration_ms"],
+                           window[0] if window else None)
+            self._acc[:] = spectrum
+        else:
+            self._acc += spectrum
+        self._n += 1
+        self._window_end = window[1] if window else None
+        if self._n == self.coadd:
+            self._close_group()
+
+    def flush(self):
+        """Write a partially filled co-add group."""
+        with self._lock:
+            if self._n:
+                self._close_group()
+
+    def _close_group(self):
+        t, seq, timelabel, integration_ms, start = self._first
+        self._acc /= self._n
+        window = (start, self._window_end) if self.clock is not None else None
+        self._submit(t, seq, timelabel, self._n, integration_ms, self._acc, window)
+        self._n = 0
+
+    def _submit(self, t, seq, timelabel, n, integration_ms, spectrum, window=None):
+        values = [t, seq, timelabel, n, round(integration_ms * 1000)]
+        # The copy decouples the record from the ring slot / accumulator
+        spectrum = np.array(spectrum, dtype=np.float64)
+        if window is not None:
+            record = (values, spectrum, window)
+        else:
+            values.extend(self.telemetry())
+            record = (values, spectrum)
+        if self.writer.submit(record):
+            self.records += 1
+
+
+class AlignedTelemetrySink(object):
+    """
+    BackgroundWriter sink that completes SpectrumRecorder records made with a
+    DeviceClock: the telemetry of a batch is averaged over each record's
+    integration window by a drivers.time_align.TelemetryAligner in one
+    vectorized call, appended to the values and passed on to `sink`.
+
+    Records reach the writer right after their scan, usually before any
+    telemetry sample that follows the window. They are therefore held here
+    until every channel that is still publishing has a sample at or after the
+    window end, or for at most `max_wait_s`. Held records are checked on every
+    write_batch() and flush() (on the writer thread), and all written out on
+    close(); a crash loses at most `max_wait_s` of them.
+    """
+
+    def __init__(self, sink, aligner, max_wait_s=1.0):
+        self.sink = sink
+        self.aligner = aligner
+        self.max_wait_s = max_wait_s
+        self._pending = []
+
+    def write_batch(self, records):
+        self._pending.extend(records)
+        self._release()
+
+    def _release(self, force=False):
+        pending = self._pending
+        if not pending:
+            return
+        n = len(pending)
+        if not force:
+            now = time.perf_counter()
+            timed_out = now - self.max_wait_s
+            covered = self.aligner.covered_until(timed_out)
+            ready = covered if covered is not None else now
+            n = 0
+            for _, _, (_, end) in pending:
+                if end > ready and end > timed_out:
+                    break
+                n += 1
+            if not n:
+                return
+        batch, self._pending = pending[:n], pending[n:]
+        windows = np.array([r[2] for r in batch], dtype=np.float64).reshape(-1, 2)
+        telemetry = self.aligner.align(windows[:, 0], windows[:, 1]).tolist()
+        self.sink.write_batch([(values + row, spectrum) for (values, spectrum, _), row in zip(batch, telemetry)])
+
+    def flush(self):
+        self._release()
+        self.sink.flush()
+
+    def fileno(self):
+        return self.sink.fileno()
+
+    def close(self):
+        try:
+            self._release(force=True)
+        finally:
+            self.sink.close()
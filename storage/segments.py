@@ -0,0 +1,308 @@
+import json
+import math
+import os
+import queue
+import threading
+
+from storage.columnar_log import ColumnarLogWriter, LOG_SUFFIX
+from storage.compression import SUFFIXES, available, compress_file
+from storage.log_index import recover_log
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+class SegmentCompressor(object):
+    """
+    Compresses closed segments one at a time on a background thread.
+
+    submit(path, on_done) queues a plain segment; once the compressed file is
+    complete, on_done(compressed path, compression) runs on the compressor
+    thread. An interrupted compression leaves the plain segment in place.
+    """
+
+    def __init__(self, compression="gzip", level=3):
+        if not available(compression):
+            print(f"[WARN] {compression} compression not available, using gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.level = level
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="log-compressor", daemon=True)
+        self._thread.start()
+
+    def submit(self, path, on_done, compression=None):
+        self._queue.put((path, on_done, compression or self.compression))
+
+    def close(self):
+        """Finish the queued segments, then let the thread exit."""
+        self._queue.put(None)
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            src, on_done, compression = item
+            try:
+                dst = compress_file(src, compression, self.level)
+            except OSError as e:
+                print(f"[WARN] Compressing {src} failed: {e}")
+                continue
+            on_done(dst, compression)
+
+
+class SegmentedLogSink(object):
+    """
+    BackgroundWriter sink that splits a columnar log into segments.
+
+    A new segment <base>_NNNN.sgl starts when a record's timestamp (first
+    column, epoch seconds) crosses a multiple of `rotate_s` (3600 = on the
+    hour, UTC-aligned) or the segment reaches `rotate_bytes`. Closed segments
+    are fsynced and then compressed block by block on a separate thread, so
+    they can be shipped while recording continues.
+
+    <base>.manifest.json lists every segment with its file, time range,
+    record count, size and state ("open", "closed", "compressed"); it is
+    rewritten atomically on every change. A segment still "open" after a
+    crash is repaired by recover_segments().
+    """
+
+    def __init__(self, directory, base_name, columns, wavelengths, rotate_s=3600.0, rotate_bytes=0,
+                 compression="gzip", level=3, chunk_rows=60, pixel_dtype="<f4", meta=None,
+                 pixel_codec=None):
+        if compression and not available(compression):
+            print(f"[WARN] {compression} compression not available, using gzip")
+            compression = "gzip"
+        self.directory = directory
+        self.base_name = base_name
+        self.columns = list(columns)
+        self.wavelengths = wavelengths
+        self.rotate_s = float(rotate_s)
+        self.rotate_bytes = int(rotate_bytes)
+        self.compression = compression or None
+        self.level = level
+        self.chunk_rows = chunk_rows
+        self.pixel_dtype = pixel_dtype
+        self.pixel_codec = pixel_codec
+        self.meta = dict(meta or {})
+        self.manifest_path = os.path.join(directory, base_name + MANIFEST_SUFFIX)
+        self.segments = []
+        self._writer = None
+        self._entry = None
+        self._deadline = math.inf
+        self._manifest_lock = threading.Lock()
+        self._compressor = SegmentCompressor(self.compression, level) if self.compression else None
+        self._write_manifest()
+
+    # -- sink interface ---------------------------------------------------
+
+    def write_batch(self, records):
+        for values, spectrum in records:
+            t = float(values[0])
+            if self._writer is not None and (
+                    t >= self._deadline or (self.rotate_bytes and self._writer.size >= self.rotate_bytes)):
+                self._close_segment()
+            if self._writer is None:
+                self._open_segment(t)
+            self._writer.append(values, spectrum)
+            entry = self._entry
+            entry["records"] += 1
+            entry["t_start"] = min(entry["t_start"], t)
+            entry["t_end"] = max(entry["t_end"], t)
+
+    def flush(self):
+        if self._writer is not None:
+            self._writer.flush()
+            self._entry["bytes"] = self._writer.size
+            self._write_manifest()
+
+    def fileno(self):
+        if self._writer is None:
+            raise OSError("no open segment")
+        return self._writer.fileno()
+
+    def close(self):
+        if self._writer is not None:
+            self._close_segment()
+        if self._compressor is not None:
+            self._compressor.close()
+
+    def wait_compressed(self, timeout=None):
+        """Block until every closed segment has been compressed (after close())."""
+        if self._compressor is not None:
+            self._compressor.join(timeout)
+
+    # -- segments ---------------------------------------------------------
+
+    def _open_segment(self, t):
+        index = len(self.segments)
+        name = f"{self.base_name}_{index:04d}{LOG_SUFFIX}"
+        meta = dict(self.meta, segment=index, base=self.base_name)
+        self._writer = ColumnarLogWriter(os.path.join(self.directory, name), self.columns, self.wavelengths,
+                                         chunk_rows=self.chunk_rows, pixel_dtype=self.pixel_dtype, meta=meta,
+                                         pixel_codec=self.pixel_codec)
+        self._deadline = (math.floor(t / self.rotate_s) + 1) * self.rotate_s if self.rotate_s > 0 else math.inf
+        self._entry = {"index": index, "file": name, "state": "open", "t_start": t, "t_end": t,
+                       "records": 0, "bytes": 0}
+        with self._manifest_lock:
+            self.segments.append(self._entry)
+        self._write_manifest()
+
+    def _close_segment(self):
+        writer, entry = self._writer, self._entry
+        self._writer = None
+        self._entry = None
+        writer.flush()
+        os.fsync(writer.fileno())
+        entry["bytes"] = writer.size
+        writer.close()
+        with self._manifest_lock:
+            entry["state"] = "closed"
+        self._write_manifest()
+        if self._compressor is not None:
+            self._compressor.submit(os.path.join(self.directory, entry["file"]),
+                                    lambda dst, compression: self._compressed(entry, dst, compression))
+
+    def _compressed(self, entry, dst, compression):
+        # Compressor thread
+        with self._manifest_lock:
+            _mark_compressed(entry, dst, compression)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        with self._manifest_lock:
+            manifest = {
+                "version": 1,
+                "base": self.base_name,
+                "rotate_s": self.rotate_s,
+                "rotate_bytes": self.rotate_bytes,
+                "compression": self.compression,
+                "pixel_codec": self.pixel_codec,
+                "columns": self.columns,
+                "npix": len(self.wavelengths),
+                "segments": [dict(e) for e in self.segments],
+            }
+            _save_manifest(self.manifest_path, manifest)
+
+
+def _mark_compressed(entry, dst, compression):
+    entry.update(file=os.path.basename(dst), state="compressed", compression=compression,
+                 compressed_bytes=os.path.getsize(dst))
+
+
+def load_manifest(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def recover_segments(manifest_path, compressor=None):
+    """
+    Startup repair of a recording that did not shut down cleanly.
+
+    Segments left "open" are checked chunk by chunk (checksums), truncated
+    after the last intact chunk and marked "closed" with their recovered
+    record count and time range. Segments whose compression finished after
+    the last manifest update are marked "compressed", and leftover temporary
+    files are removed. If the recording was compressed, every segment that is
+    still "closed" (recovered, or left uncompressed by a crash during
+    compression) is queued to `compressor`, which updates the manifest as
+    each one is done. Returns the list of segment entries that changed.
+    """
+    manifest = load_manifest(manifest_path)
+    directory = os.path.dirname(manifest_path)
+    compression = manifest.get("compression") if compressor is not None else None
+    if compression and not available(compression):
+        compression = compressor.compression
+    changed = []
+    for entry in manifest["segments"]:
+        path = os.path.join(directory, entry["file"])
+        for suffix in SUFFIXES.values():
+            if os.path.exists(path + suffix + ".tmp"):
+                os.remove(path + suffix + ".tmp")
+        if entry["state"] == "closed":
+            for name, suffix in SUFFIXES.items():
+                if os.path.exists(path + suffix):
+                    # Complete (it only appears once written); the crash came before the manifest update
+                    if os.path.exists(path):
+                        os.remove(path)
+                    _mark_compressed(entry, path + suffix, name)
+                    changed.append(entry)
+                    break
+            continue
+        if entry["state"] != "open":
+            continue
+        if not os.path.exists(path):
+            entry.update(state="lost", records=0, bytes=0)
+            changed.append(entry)
+            continue
+        try:
+            result = recover_log(path, index=not compression)
+        except ValueError as e:
+            print(f"[WARN] {path}: cannot recover ({e})")
+            entry["state"] = "damaged"
+            changed.append(entry)
+            continue
+        entry.update(state="closed", recovered=True, records=result["rows"], bytes=result["bytes"],
+                     truncated_bytes=result["truncated_bytes"])
+        if result["rows"]:
+            entry.update(t_start=result["t_start"], t_end=result["t_end"])
+        changed.append(entry)
+    if changed:
+        _save_manifest(manifest_path, manifest)
+    if compression:
+        for index, entry in enumerate(manifest["segments"]):
+            path = os.path.join(directory, entry["file"])
+            if entry["state"] == "closed" and os.path.exists(path):
+                compressor.submit(path, lambda dst, name, index=index: _manifest_compressed(
+                    manifest_path, index, dst, name), compression)
+    return changed
+
+
+def _manifest_compressed(manifest_path, index, dst, compression):
+    # Compressor thread; it is the only writer of a recovered manifest
+    manifest = load_manifest(manifest_path)
+    _mark_compressed(manifest["segments"][index], dst, compression)
+    _save_manifest(manifest_path, manifest)
+
+
+def recover_directory(directory, compressor=None):
+    """recover_segments() for every manifest in `directory`; returns {manifest path: changed entries}."""
+    results = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(MANIFEST_SUFFIX):
+            path = os.path.join(directory, name)
+            try:
+                changed = recover_segments(path, compressor)
+            except (OSError, ValueError) as e:
+                print(f"[WARN] {path}: recovery failed ({e})")
+                continue
+            if changed:
+                results[path] = changed
+    return results
+
+
+def segment_paths(manifest_path, t_start=None, t_end=None, states=("closed", "compressed")):
+    """Paths of the segments overlapping [t_start, t_end] (epoch seconds) in the given states."""
+    manifest = load_manifest(manifest_path)
+    directory = os.path.dirname(manifest_path)
+    paths = []
+    for entry in manifest["segments"]:
+        if entry["state"] not in states:
+            continue
+        if t_start is not None and entry["t_end"] < t_start:
+            continue
+        if t_end is not None and entry["t_start"] > t_end:
+            continue
+        paths.append(os.path.join(directory, entry["file"]))
+    return paths
+
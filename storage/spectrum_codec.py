@@ -0,0 +1,142 @@
+"""
+spectrum_codec.py  –  lossless integer/delta coding of spectrum blocks
+
+AvaSpec counts are integers, or multiples of 1/N after averaging N scans. A
+block of spectra (nscans x npix) is encoded as:
+
+    1. find a scale q so that every value * q is an integer, and check that
+       ints / q reproduces the input exactly (otherwise store raw floats)
+    2. delta-code the integers along pixels, along scans, or both, whichever
+       gives the smallest range
+    3. zigzag to unsigned and store in the narrowest of uint8/16/32/64
+    4. optionally zlib the result
+
+decode(encode(x)) is bit-identical to x for float64 and float32 input.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"SPC1"
+# magic, mode, int dtype code, flags, reserved, nscans, npix, scale, body length
+HEADER = struct.Struct("<4sBBBBIIdI")
+
+MODE_RAW = 0
+MODE_PIXEL = 1      # differences between adjacent pixels
+MODE_SCAN = 2       # differences between consecutive scans
+MODE_BOTH = 3       # scan differences, then pixel differences
+
+FLAG_ZLIB = 1
+FLAG_FLOAT32 = 2    # source dtype was float32 (else float64)
+
+_UINT_TYPES = [np.dtype("<u1"), np.dtype("<u2"), np.dtype("<u4"), np.dtype("<u8")]
+# Powers of two cover raw and half counts; small integers cover averaged scans
+SCALE_CANDIDATES = (1, 2, 4, 8, 16, 32, 64, 128, 256, 3, 5, 6, 7, 9, 10, 12, 15, 20, 25, 50, 100)
+
+
+def _integral(scaled):
+    # k / q * q is not always exactly k in floating point; encode() checks exactness
+    return np.allclose(scaled, np.rint(scaled), rtol=1e-12, atol=1e-6)
+
+
+def detect_scale(block, candidates=SCALE_CANDIDATES):
+    """Smallest candidate q with block * q (nearly) integral everywhere, or None."""
+    flat = np.asarray(block, dtype=np.float64).ravel()
+    if not np.all(np.isfinite(flat)):
+        return None
+    probe = flat[:min(flat.size, 4096)]
+    for q in candidates:
+        if _integral(probe * q) and _integral(flat * q):
+            return q
+    return None
+
+
+def _zigzag(v):
+    return ((v << 1) ^ (v >> 63)).view(np.uint64)
+
+
+def _unzigzag(u):
+    u = u.astype(np.uint64, copy=False)
+    return (u >> np.uint64(1)).view(np.int64) ^ -(u & np.uint64(1)).view(np.int64)
+
+
+def _delta(ints, mode):
+    if mode in (MODE_SCAN, MODE_BOTH):
+        ints = np.diff(ints, axis=0, prepend=0)
+    if mode in (MODE_PIXEL, MODE_BOTH):
+        ints = np.diff(ints, axis=1, prepend=0)
+    return ints
+
+
+def _undelta(d, mode):
+    if mode in (MODE_PIXEL, MODE_BOTH):
+        d = np.cumsum(d, axis=1)
+    if mode in (MODE_SCAN, MODE_BOTH):
+        d = np.cumsum(d, axis=0)
+    return d
+
+
+def encode(block, mode=None, compress=True, level=1):
+    """
+    Encode a (nscans x npix) float block (a 1-D spectrum is one scan).
+    mode: MODE_PIXEL / MODE_SCAN / MODE_BOTH, or None to pick the smallest.
+    """
+    block = np.asarray(block)
+    if block.ndim == 1:
+        block = block[np.newaxis, :]
+    src_f32 = block.dtype == np.float32
+    flags = FLAG_FLOAT32 if src_f32 else 0
+    nscans, npix = block.shape
+
+    q = detect_scale(block)
+    ints = None
+    if q is not None:
+        ints = np.rint(block.astype(np.float64) * q).astype(np.int64)
+        back = ints / q
+        if src_f32:
+            back = back.astype(np.float32)
+        if not np.array_equal(back, block):
+            ints = None
+    if ints is None:
+        body = np.ascontiguousarray(block, dtype=np.float32 if src_f32 else np.float64).tobytes()
+        mode, code, q = MODE_RAW, 0, 0.0
+    else:
+        modes = [mode] if mode is not None else [MODE_PIXEL, MODE_SCAN, MODE_BOTH]
+        best = None
+        for m in modes:
+            z = _zigzag(_delta(ints, m))
+            top = int(z.max()) if z.size else 0
+            if best is None or top < best[0]:
+                best = (top, m, z)
+        top, mode, z = best
+        code = next(i for i, t in enumerate(_UINT_TYPES) if top <= np.iinfo(t).max)
+        body = z.astype(_UINT_TYPES[code]).tobytes()
+    if compress:
+        body = zlib.compress(body, level)
+        flags |= FLAG_ZLIB
+    return HEADER.pack(MAGIC, mode, code, flags, 0, nscans, npix, float(q), len(body)) + body
+
+
+def encoded_size(buf, offset=0):
+    """Total length of the encoded block starting at `offset`."""
+    return HEADER.size + HEADER.unpack_from(buf, offset)[-1]
+
+
+def decode(buf, offset=0):
+    """Decode one block; returns a (nscans x npix) float64 or float32 array."""
+    magic, mode, code, flags, _, nscans, npix, q, length = HEADER.unpack_from(buf, offset)
+    if magic != MAGIC:
+        raise ValueError("not an encoded spectrum block")
+    start = offset + HEADER.size
+    body = bytes(buf[start:start + length]) if not isinstance(buf, bytes) else buf[start:start + length]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    out_dtype = np.float32 if flags & FLAG_FLOAT32 else np.float64
+    if mode == MODE_RAW:
+        return np.frombuffer(body, dtype=out_dtype).reshape(nscans, npix).copy()
+    z = np.frombuffer(body, dtype=_UINT_TYPES[code]).reshape(nscans, npix)
+    ints = _undelta(_unzigzag(z), mode)
+    out = ints / q
+    return out.astype(np.float32) if out_dtype is np.float32 else out
@@ -27,13 +27,4 @@ try:
     def modbus_crc16(data: bytes) -> int:
         return libscrc.modbus(data)
 except ImportError:
-    def modbus_crc16(data: bytes) -> int:
-        crc = 0xFFFF
-        for b in data:
-            crc ^= b
-            for _ in range(8):
-                if crc & 1:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
-        return crc & 0xFFFF
\ No newline at end of file
+    from drivers.modbus_codec import crc16 as modbus_crc16  # 256-entry table, one lookup per byte
\ No newline at end of file